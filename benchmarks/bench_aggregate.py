@@ -0,0 +1,76 @@
+"""
+Bulk aggregations over a flattened tree versus the equivalent Count style visitor.
+
+Uses NumPy if it is installed, the pure Python fallback otherwise.
+"""
+
+from gentry import aggregate
+from gentry.aggregate import depths, flatten, subtree_reduce, subtree_sizes
+from gentry.tree import Count, Reducer
+
+from .common import deep_tree, report, timeit
+
+
+class Sizes(Reducer):
+    """Subtree sizes for all nodes, stored in a dict keyed by node id."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.sizes = {}
+
+    def _do_sizes(self, tree, results):
+        size = self.sizes[id(tree)] = 1 + sum(results)
+        return size
+
+
+class Weights(Reducer):
+    """The sum of the "w" property over each subtree."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.sums = {}
+
+    def _do_weights(self, tree, results):
+        total = self.sums[id(tree)] = tree.properties.get("w", 0) + sum(results)
+        return total
+
+
+def per_node_counts(nodes):
+    # what we'd do with Count to get the size of every subtree
+    return [Count(node).count() for node in nodes]
+
+
+def main():
+    depth = 20
+    root = deep_tree(depth)
+    for i, (node, _, _) in enumerate(root.iter_preorder()):
+        if i % 7 == 0:
+            node.properties["w"] = i % 13
+
+    flatten_time = timeit(flatten, root, repeat=1)
+    arena, _ = flatten(root)
+    n = len(arena)
+    backend = "numpy" if aggregate.np is not None else "python"
+
+    rows = [("metric", "nodes", "visitor s", f"bulk ({backend}) s", "speedup")]
+    for name, visitor, bulk in (
+        ("subtree sizes", lambda: Sizes(root).visit(), lambda: subtree_sizes(arena)),
+        ("subtree sum of w", lambda: Weights(root).visit(), lambda: subtree_reduce(arena, "w")),
+    ):
+        before = timeit(visitor, repeat=1)
+        after = timeit(bulk)
+        rows.append((name, n, f"{before:.3f}", f"{after:.3f}", f"{before / after:.0f}x"))
+    rows.append(("depths", n, "-", f"{timeit(depths, arena):.3f}", "-"))
+    report(f"Bulk aggregations (flattening took {flatten_time:.2f}s once)", rows)
+
+    small = deep_tree(12)
+    small_arena, small_nodes = flatten(small)
+    before = timeit(per_node_counts, small_nodes, repeat=1)
+    after = timeit(subtree_sizes, small_arena)
+    rows = [("metric", "nodes", "Count per node s", "bulk s", "speedup")]
+    rows.append(("subtree sizes", len(small_nodes), f"{before:.3f}", f"{after:.4f}", f"{before / after:.0f}x"))
+    report("Subtree sizes with a Count per node", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Locating nodes: parent pointers of observable nodes and an AncestorIndex, compared with searching from the root.
+
+The tree is a complete binary tree with about a million nodes. "search" finds the path of each node with a
+walk from the root (what was needed before nodes knew their parent), path() follows the parent pointers.
+The lowest common ancestor of random pairs is found by walking up from both nodes, and with an AncestorIndex.
+"""
+
+import random
+import tracemalloc
+
+from gentry.ancestors import AncestorIndex
+from gentry.tree import Tree
+
+from .common import report, timeit
+
+DEPTH = 20
+SAMPLES = 1000
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+def build(depth):
+    level = [Observed(f"leaf{i}") for i in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        level = [Observed("node", left=[level[i]], right=[level[i + 1]]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def search(root, target):
+    """The path of a node, found by walking the tree from the root."""
+    stack = [(root, [])]
+    while stack:
+        node, path = stack.pop()
+        if node is target:
+            return path
+        for group, children in node._children.items():
+            for index, child in enumerate(children):
+                stack.append((child, path + [(group, index)]))
+    return None
+
+
+def walk_up_lca(a, b):
+    seen = {id(a)}
+    seen.update(id(node) for node in a.ancestors())
+    node = b
+    while id(node) not in seen:
+        node = node.parent
+    return node
+
+
+def main():
+    root = build(DEPTH)
+    nodes = [node for node, _, _ in root.iter_preorder()]
+    rng = random.Random(42)
+    targets = rng.sample(nodes, SAMPLES)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(SAMPLES)]
+
+    rows = [("question", "seconds", "per node or pair")]
+    few = targets[:10]  # searching is too slow for all samples
+    elapsed = timeit(lambda: [search(root, node) for node in few], repeat=1)
+    rows.append((f"search from the root ({len(few)} nodes)", f"{elapsed:.3f}", f"{elapsed / len(few):.6f}"))
+    elapsed = timeit(lambda: [node.path() for node in targets])
+    rows.append((f"path() ({SAMPLES} nodes)", f"{elapsed:.4f}", f"{elapsed / SAMPLES:.7f}"))
+    elapsed = timeit(lambda: [node.depth for node in targets])
+    rows.append((f"depth ({SAMPLES} nodes)", f"{elapsed:.4f}", f"{elapsed / SAMPLES:.7f}"))
+    elapsed = timeit(lambda: [walk_up_lca(a, b) for a, b in pairs])
+    rows.append((f"lca by walking up ({SAMPLES} pairs)", f"{elapsed:.4f}", f"{elapsed / SAMPLES:.7f}"))
+
+    index = AncestorIndex(root)
+    tracemalloc.start()
+    index.rebuild()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del index
+    index = AncestorIndex(root)
+    elapsed = timeit(index.rebuild, repeat=1)
+    rows.append(("AncestorIndex build", f"{elapsed:.2f}", f"{memory / 2**20:.0f} MB"))
+    elapsed = timeit(lambda: [index.lca(a, b) for a, b in pairs])
+    rows.append((f"AncestorIndex.lca() ({SAMPLES} pairs)", f"{elapsed:.4f}", f"{elapsed / SAMPLES:.7f}"))
+    assert all(index.lca(a, b) is walk_up_lca(a, b) for a, b in pairs)
+    report(f"Locating nodes in a tree of {len(nodes)} observable nodes", rows)
+
+
+if __name__ == "__main__":
+    main()
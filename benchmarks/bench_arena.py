@@ -0,0 +1,64 @@
+"""
+Build time, traversal time and memory of a complete binary tree stored as
+Tree objects versus stored in an Arena.
+"""
+
+import tracemalloc
+from time import perf_counter
+
+from gentry.arena import Arena
+from gentry.tree import Count
+
+from .common import Leaf, Node, deep_tree, report, timeit
+
+
+def build_arena(depth: int) -> Arena:
+    """The same complete binary tree as deep_tree(), built directly in an arena (breadth first)."""
+    arena = Arena()
+    add = arena.add
+    add(Node, "node")
+    level = [0]
+    for d in range(1, depth):
+        cls, label = (Leaf, "leaf") if d == depth - 1 else (Node, "node")
+        level = [
+            add(cls, label, parent, group) for parent in level for group in ("left", "right")
+        ]
+    arena.children(0)  # include building the index of children
+    return arena
+
+
+def measure_build(func, *args):
+    tracemalloc.start()
+    start = perf_counter()
+    result = func(*args)
+    elapsed = perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def walk_arena(arena):
+    return sum(1 for _ in arena.iter_preorder())
+
+
+def main():
+    depth = 20
+    n = 2**depth - 1
+
+    _, tree_time, tree_size = measure_build(deep_tree, depth)
+    arena, arena_time, arena_size = measure_build(build_arena, depth)
+    rows = [("storage", "nodes", "build s (traced)", "bytes/node")]
+    rows.append(("Tree objects", n, f"{tree_time:.2f}", f"{tree_size / n:.0f}"))
+    rows.append(("Arena", n, f"{arena_time:.2f}", f"{arena_size / n:.0f}"))
+    report("Building", rows)
+
+    tree = deep_tree(depth)
+    rows = [("traversal", "nodes", "seconds")]
+    rows.append(("Count over Tree objects", n, f"{timeit(Count(tree).count, repeat=1):.2f}"))
+    rows.append(("Count over Arena proxies", n, f"{timeit(Count(arena.root).count, repeat=1):.2f}"))
+    rows.append(("Arena.iter_preorder()", n, f"{timeit(walk_arena, arena, repeat=1):.2f}"))
+    report("Traversal", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+AsyncVisitor with a fake I/O bound lookup per node, for different concurrency limits.
+
+With a latency of L seconds per lookup the sequential time is about n * L, the concurrent
+time is bounded below by the height of the tree times L.
+"""
+
+import asyncio
+
+from gentry.tree import AsyncVisitor
+
+from .common import deep_tree, report, timeit
+
+LATENCY = 0.001
+
+
+class Lookup(AsyncVisitor):
+    async def _do_lookup(self, tree):
+        await asyncio.sleep(LATENCY)
+        return tree.label
+
+
+def main():
+    root = deep_tree(11)
+    rows = [("nodes", "concurrency", "seconds", "lookups/s")]
+    for concurrency in (1, 10, 100, 1000):
+        elapsed = timeit(
+            lambda concurrency=concurrency: asyncio.run(Lookup(root, concurrency=concurrency).visit()), repeat=1
+        )
+        rows.append((2**11 - 1, concurrency, f"{elapsed:.3f}", f"{(2**11 - 1) / elapsed:.0f}"))
+    report(f"AsyncVisitor with {LATENCY * 1000:.0f} ms latency per node", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time to render a tree again after editing a single leaf, with and without a RenderCache.
+
+Without a cache every render costs O(n), with a cache only the ancestors of the edited
+leaf (and their direct children) have to be visited. What remains is copying the cached
+pieces into the output, which is proportional to its size but very cheap per byte.
+"""
+
+import io
+
+from gentry.cache import RenderCache
+from gentry.html import HTMLLayout
+from gentry.mermaid import Mermaid
+from gentry.tree import Tree
+
+from .common import report, timeit
+
+
+class Plain(Tree, Mermaid, HTMLLayout):
+    _groups = {"left", "right"}
+
+
+class Cached(Tree, Mermaid, HTMLLayout, observable=True):
+    _groups = {"left", "right"}
+    _render_cache = RenderCache(maxsize=1_000_000)
+
+
+def complete(cls, depth):
+    level = [cls(f"leaf{i}") for i in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        level = [cls("node", left=[level[i]], right=[level[i + 1]]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def edit_and_render(root, leaf, render, edits=10):
+    for i in range(edits):
+        leaf.label = f"edit{i}"
+        render(root)
+
+
+def mermaid(root):
+    root.write_mermaid(io.StringIO())
+
+
+def html(root):
+    root._box()
+
+
+def main():
+    rows = [("renderer", "nodes", "plain s/render", "cached s/render", "speedup")]
+    for depth in (12, 14, 16):
+        trees = {cls: complete(cls, depth) for cls in (Plain, Cached)}
+        for name, render in (("mermaid", mermaid), ("html", html)):
+            times = []
+            for cls, root in trees.items():
+                leaf = root
+                while not leaf.is_leaf():
+                    leaf = leaf.left[0]
+                render(root)  # fill the cache
+                times.append(timeit(edit_and_render, root, leaf, render) / 10)
+            rows.append(
+                (name, 2**depth - 1, f"{times[0]:.5f}", f"{times[1]:.5f}", f"{times[0] / times[1]:.0f}x")
+            )
+    report("Render after a single leaf edit", rows)
+    print(Cached._render_cache.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Copying a complete binary tree of about 33 thousand nodes with copy.deepcopy() and with gentry.clone.clone(),
+and keeping many slightly different versions of it: 100 versions, each with one leaf changed, made with
+clone() and with PersistentTree, which only copies the path from the root to the changed leaf.
+
+A quarter of the leaves have properties. Memory is the size of the copies (the growth measured by
+tracemalloc while they are kept alive).
+"""
+
+import copy
+import gc
+import tracemalloc
+
+from gentry.clone import PersistentTree, clone
+from gentry.tree import Tree
+
+from .common import Leaf, Node, report, timeit
+
+DEPTH = 15
+VERSIONS = 100
+
+
+class CompactNode(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+def build(cls=Node, leaf=Leaf):
+    level = [leaf(f"leaf{i}") for i in range(2 ** (DEPTH - 1))]
+    for i in range(0, len(level), 4):
+        level[i].properties.update(weight=i * 0.5, kind="even" if i % 8 == 0 else "odd")
+    while len(level) > 1:
+        level = [cls("node", left=[level[i]], right=[level[i + 1]]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def leaf_path(i):
+    return [("left" if (i >> level) & 1 else "right", 0) for level in range(DEPTH - 1)]
+
+
+def clone_versions(root):
+    versions = []
+    for i in range(VERSIONS):
+        version = clone(root)
+        node = version
+        for group, index in leaf_path(i):
+            node = node._children[group][index]
+        node.label = f"changed{i}"
+        versions.append(version)
+    return versions
+
+
+def persistent_versions(root):
+    base = PersistentTree(root)
+    versions = []
+    for i in range(VERSIONS):
+        version = base.fork()
+        version.edit(leaf_path(i)).label = f"changed{i}"
+        versions.append(version)
+    return versions
+
+
+def memory(function, *args):
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 2**20
+
+
+def main():
+    rows = [("", "s", "MB")]
+    for name, cls in (("Tree", Node), ("compact Tree", CompactNode)):
+        root = build(cls, cls)
+        for label, function in (
+            ("copy.deepcopy", copy.deepcopy),
+            ("clone", clone),
+            ("clone, shared properties", lambda root: clone(root, share_properties=True)),
+        ):
+            rows.append((f"{name}: {label}", f"{timeit(function, root):.3f}", f"{memory(function, root):.1f}"))
+    root = build()
+    for label, function in (
+        (f"{VERSIONS} versions with PersistentTree", persistent_versions),
+        (f"{VERSIONS} versions with clone", clone_versions),
+    ):
+        rows.append((label, f"{timeit(function, root, repeat=1):.3f}", f"{memory(function, root):.1f}"))
+    report(f"Copying a tree of {2**DEPTH - 1} nodes", rows)
+
+
+if __name__ == "__main__":
+    main()
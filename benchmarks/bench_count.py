@@ -0,0 +1,29 @@
+"""
+Count.count() in a single pass versus the original visit() followed by Count._sum().
+"""
+
+from gentry.tree import Count
+
+from .common import deep_tree, report, timeit, wide_tree
+
+
+def two_pass_count(counter):
+    return Count._sum(counter.visit())
+
+
+def main():
+    rows = [("tree", "nodes", "two pass s", "single pass s", "with breakdowns s", "speedup")]
+    for name, root in (("wide", wide_tree(500_000)), ("deep", deep_tree(19))):
+        counter = Count(root)
+        n = counter.count()
+        before = timeit(two_pass_count, counter)
+        after = timeit(counter.count)
+        breakdowns = timeit(counter.count, True, True)
+        rows.append(
+            (name, n, f"{before:.3f}", f"{after:.3f}", f"{breakdowns:.3f}", f"{before / after:.1f}x")
+        )
+    report("Count.count()", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Per node cost of finding the visitor method, before and after caching the dispatch.
+
+The uncached version is the original implementation of Visitor._get_visitor that
+searches the visitor MRO with f-strings and hasattr() for every node.
+"""
+
+from gentry.tree import Visitor
+
+from .common import deep_tree, nodes, report, timeit, wide_tree
+
+
+class Base(Visitor):
+    def _do_base(self, tree):
+        return 1
+
+
+class Level1(Base): ...
+
+
+class Level2(Level1): ...
+
+
+class Level3(Level2): ...
+
+
+class Deep(Level3):
+    """A visitor five levels deep in its hierarchy that only has a generic method at the bottom."""
+
+
+def uncached_get_visitor(self, tree):
+    typename = tree.__class__.__name__
+    for klass in self.__class__.__mro__:
+        generic_visitor = f"_do_{klass.__name__.lower()}"
+        visitor = f"{generic_visitor}_{typename}"
+        if hasattr(self, visitor):
+            return getattr(self, visitor)
+        elif not self.strict and hasattr(self, generic_visitor):
+            return getattr(self, generic_visitor)
+    raise NotImplementedError
+
+
+def dispatch_uncached(visitor, all_nodes):
+    for node in all_nodes:
+        uncached_get_visitor(visitor, node)
+
+
+def dispatch_cached(visitor, all_nodes):
+    get_visitor = visitor._get_visitor
+    for node in all_nodes:
+        get_visitor(node)
+
+
+def main():
+    rows = [("tree", "nodes", "uncached ns/node", "cached ns/node", "speedup")]
+    for name, root in (("wide", wide_tree(200_000)), ("deep", deep_tree(18))):
+        all_nodes = nodes(root)
+        visitor = Deep(root)
+        before = timeit(dispatch_uncached, visitor, all_nodes)
+        after = timeit(dispatch_cached, visitor, all_nodes)
+        n = len(all_nodes)
+        rows.append(
+            (name, n, f"{before / n * 1e9:.0f}", f"{after / n * 1e9:.0f}", f"{before / after:.1f}x")
+        )
+    report("Visitor method dispatch", rows)
+
+
+if __name__ == "__main__":
+    main()
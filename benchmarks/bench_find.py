@@ -0,0 +1,39 @@
+"""
+Early exit searches: the cost of Tree.find() depends on where the match is, not on the size of the tree.
+
+The target node is put at different positions (in preorder) of a tree with a million nodes, and
+compared with a full bottom-up Visitor pass that checks every node.
+"""
+
+from gentry.tree import Visitor
+
+from .common import Leaf, Node, report, timeit
+
+
+def build():
+    root = Node("root")
+    root.left = [Node(f"branch{b}", left=[Leaf(f"leaf{b}.{i}") for i in range(999)]) for b in range(1000)]
+    return root
+
+
+class Search(Visitor):
+    def _do_search(self, tree):
+        return tree.label == "target"
+
+
+def main():
+    root = build()
+    order = [node for node, _, _ in root.iter_preorder()]
+    full = timeit(lambda: Search(root).visit(), repeat=1)
+    rows = [("match at", "find() seconds", "full Visitor seconds")]
+    for position in (10, 1_000, 10_000, 100_000, len(order) - 1):
+        target = order[position]
+        label, target.label = target.label, "target"
+        elapsed = timeit(root.find, lambda node: node.label == "target")
+        target.label = label
+        rows.append((position, f"{elapsed:.5f}", f"{full:.3f}"))
+    report(f"Tree.find() in a tree of {len(order)} nodes", rows)
+
+
+if __name__ == "__main__":
+    main()
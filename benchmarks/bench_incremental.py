@@ -0,0 +1,57 @@
+"""
+Full visit versus incremental visit after modifying a single leaf.
+
+An IncrementalVisitor only visits the modified leaf and its ancestors, the results of all
+other subtrees are reused from the previous visit.
+"""
+
+from gentry.tree import IncrementalVisitor, Tree, Visitor
+
+from .common import report, timeit
+
+
+class Node(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+def complete(depth):
+    level = [Node(f"leaf{i}") for i in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        level = [Node("node", left=[level[i]], right=[level[i + 1]]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+class Lint(Visitor):
+    def _do_lint(self, tree):
+        return len(tree.label) > 10
+
+
+class IncrementalLint(IncrementalVisitor):
+    def _do_incrementallint(self, tree):
+        return len(tree.label) > 10
+
+
+def edit_and_visit(visitor, leaf):
+    leaf.label = leaf.label[::-1]
+    return visitor.visit()
+
+
+def main():
+    rows = [("nodes", "full visit", "incremental", "nodes visited", "speedup")]
+    for depth in (15, 17, 19):
+        root = complete(depth)
+        leaf = root
+        while not leaf.is_leaf():
+            leaf = leaf.right[0]
+        full = timeit(edit_and_visit, Lint(root), leaf)
+        incremental = IncrementalLint(root)
+        incremental.visit()
+        fast = timeit(edit_and_visit, incremental, leaf)
+        rows.append(
+            (2**depth - 1, f"{full:.3f}", f"{fast:.6f}", incremental.visited, f"{full / fast:.0f}x")
+        )
+    report("Visit after a single leaf modification (seconds)", rows)
+
+
+if __name__ == "__main__":
+    main()
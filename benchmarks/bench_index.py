@@ -0,0 +1,96 @@
+"""
+Secondary indexes: the cost of building a TreeIndex for a million nodes, and of queries compared to full walks.
+
+Memory is measured with tracemalloc as the growth of allocated memory while building the index
+(the tree itself is not counted), so the times in the memory rows include the tracing overhead.
+The incremental index also keeps a memo entry per node, and catches up after a single edit
+by looking at the changed node and its ancestors only.
+"""
+
+import tracemalloc
+
+from gentry.index import TreeIndex
+from gentry.tree import Tree
+
+from .common import Leaf, Node, report, timeit
+
+KINDS = ("loop", "block", "call", "return")
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class ObservedLeaf(Observed): ...
+
+
+def build(node_cls=Node, leaf_cls=Leaf):
+    root = node_cls("root")
+    root.left = [
+        node_cls(f"branch{b}", left=[leaf_cls(f"leaf{i}", properties={"kind": KINDS[i % 4]}) for i in range(999)])
+        for b in range(1000)
+    ]
+    return root
+
+
+def memory(func) -> int:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main():
+    root = build()
+    size = sum(1 for _ in root.iter_preorder())
+    rows = [("index", "build seconds", "MB", "bytes/node")]
+    for title, kwargs in (("classes and labels", {}), ("+ properties['kind']", {"properties": ("kind",)})):
+        elapsed = timeit(lambda kwargs=kwargs: TreeIndex(root, **kwargs), repeat=1)
+        used = memory(lambda kwargs=kwargs: TreeIndex(root, **kwargs))
+        rows.append((title, f"{elapsed:.2f}", f"{used / 2**20:.0f}", f"{used / size:.0f}"))
+    report(f"Building a TreeIndex for {size} nodes", rows)
+
+    index = TreeIndex(root, properties=("kind",))
+    rows = [("query", "index seconds", "walk seconds", "matches")]
+    queries = (
+        ("by_class(Leaf)", lambda: index.by_class(Leaf), lambda node: isinstance(node, Leaf)),
+        ("by_label('leaf7')", lambda: index.by_label("leaf7"), lambda node: node.label == "leaf7"),
+        ("by_label('branch7')", lambda: index.by_label("branch7"), lambda node: node.label == "branch7"),
+        (
+            "by_property('kind', 'loop')",
+            lambda: index.by_property("kind", "loop"),
+            lambda node: node.properties.get("kind") == "loop",
+        ),
+    )
+    for title, query, predicate in queries:
+        indexed = timeit(query)
+        walked = timeit(
+            lambda predicate=predicate: [node for node, _, _ in root.iter_preorder() if predicate(node)], repeat=1
+        )
+        rows.append((title, f"{indexed:.5f}", f"{walked:.3f}", len(query())))
+    report("Queries, compared to a walk over the whole tree", rows)
+
+    observed = build(Observed, ObservedLeaf)
+    rows = [("incremental index", "seconds", "MB")]
+    elapsed = timeit(lambda: TreeIndex(observed, properties=("kind",), incremental=True), repeat=1)
+    used = memory(lambda: TreeIndex(observed, properties=("kind",), incremental=True))
+    rows.append(("build", f"{elapsed:.2f}", f"{used / 2**20:.0f}"))
+    index = TreeIndex(observed, properties=("kind",), incremental=True)
+    leaf = observed.left[500].left[500]
+
+    def edit():
+        leaf.properties["kind"] = "call" if leaf.properties["kind"] == "loop" else "loop"
+        index.by_property("kind", "loop")
+
+    rows.append(("edit one leaf + query", f"{timeit(edit):.5f}", ""))
+    rows.append(("rebuild", f"{timeit(index.rebuild, repeat=1):.2f}", ""))
+    report(f"Keeping the index up to date ({size} observable nodes)", rows)
+
+
+if __name__ == "__main__":
+    main()
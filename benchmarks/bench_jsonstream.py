@@ -0,0 +1,95 @@
+"""
+Throughput of streaming JSON export and import with gentry.jsonstream, compared with converting the tree
+to nested dicts and back around json.dump() and json.load(), which holds the whole document in memory.
+
+The tree is a complete binary tree of about a quarter of a million nodes, written to and read from a
+temporary file. Peak memory is measured with tracemalloc in a second run, for an import it includes the
+new tree (about 130 MB).
+"""
+
+import json
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from gentry.jsonstream import dump, load
+
+from .common import Leaf, Node, deep_tree, report
+
+DEPTH = 18
+CLASSES = {"Node": Node, "Leaf": Leaf}
+
+
+def build():
+    root = deep_tree(DEPTH)
+    for i, leaf in enumerate(node for node, _, _ in root.iter_preorder() if node.is_leaf()):
+        if i % 4 == 0:
+            leaf.properties.update(weight=i * 0.5, kind="even" if i % 8 == 0 else "odd")
+    return root
+
+
+def to_json(node):
+    data = {"class": node.__class__.__name__, "label": node.label}
+    if node.properties:
+        data["properties"] = node.properties
+    for group, children in node._children.items():
+        data[group] = [to_json(child) for child in children]
+    return data
+
+
+def from_json(data):
+    children = {key: [from_json(child) for child in value] for key, value in data.items() if isinstance(value, list)}
+    return CLASSES[data["class"]](data.get("label"), children=children, properties=data.get("properties"))
+
+
+def measure(function, *args):
+    """The time of a run and the peak memory allocated during a second run."""
+    start = perf_counter()
+    result = function(*args)
+    elapsed = perf_counter() - start
+    del result
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    root = build()
+    path = tempfile.mktemp(suffix=".json")
+
+    def export_stream():
+        with open(path, "w", encoding="utf-8") as f:
+            dump(root, f)
+
+    def export_whole():
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(to_json(root), f, separators=(",", ":"))
+
+    def import_stream():
+        with open(path, "rb") as f:
+            return load(f, CLASSES)
+
+    def import_whole():
+        with open(path, "rb") as f:
+            return from_json(json.load(f))
+
+    rows = [("", "s", "MB/s", "peak MB")]
+    try:
+        for name, export, imported in (
+            ("json + conversion", export_whole, import_whole),
+            ("gentry.jsonstream", export_stream, import_stream),
+        ):
+            for direction, function in (("export", export), ("import", imported)):
+                elapsed, peak = measure(function)
+                size = os.path.getsize(path) / 2**20
+                rows.append((f"{name} {direction}", f"{elapsed:.2f}", f"{size / elapsed:.1f}", f"{peak / 2**20:.1f}"))
+    finally:
+        os.remove(path)
+    report(f"JSON export and import of a tree of {2**DEPTH - 1} nodes ({size:.1f} MB)", rows)
+
+
+if __name__ == "__main__":
+    main()
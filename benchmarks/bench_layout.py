@@ -0,0 +1,69 @@
+"""
+Bytes per node of the regular and the compact (__slots__ based) Tree layout.
+
+Memory is measured with tracemalloc while building a complete binary tree where
+every node has been accessed through its group attributes, and every tenth node
+has properties.
+"""
+
+import tracemalloc
+
+from gentry.mermaid import Mermaid
+from gentry.tree import Tree
+
+from .common import report
+
+
+class Regular(Tree):
+    _groups = {"left", "right"}
+
+
+class RegularMermaid(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+class Compact(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+class CompactMermaid(Tree, Mermaid, compact=True):
+    _groups = {"left", "right"}
+
+
+def build(cls, depth):
+    count = 0
+
+    def node():
+        nonlocal count
+        count += 1
+        properties = {"n": count} if count % 10 == 0 else None
+        return cls("node", properties=properties)
+
+    level = [node() for _ in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        parents = []
+        for i in range(0, len(level), 2):
+            parent = node()
+            parent.left.append(level[i])
+            parent.right.append(level[i + 1])
+            parents.append(parent)
+        level = parents
+    return level[0]
+
+
+def main():
+    depth = 18
+    n = 2**depth - 1
+    rows = [("layout", "nodes", "bytes/node")]
+    for cls in (Regular, RegularMermaid, Compact, CompactMermaid):
+        tracemalloc.start()
+        root = build(cls, depth)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del root
+        rows.append((cls.__name__, n, f"{size / n:.0f}"))
+    report("Tree memory layout", rows)
+
+
+if __name__ == "__main__":
+    main()
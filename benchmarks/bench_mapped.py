@@ -0,0 +1,125 @@
+"""
+Time to first query: loading a whole tree with pickle or gentry.serialize versus opening a memory-mapped
+tree file and reading only what a query needs.
+
+The query walks from the root to a leaf 19 levels down, reads its label and properties, and counts the
+nodes of a subtree of 1023 nodes with an ordinary Visitor. The small file is a complete binary tree of about
+a million nodes. The large one (a few GB) is written from a complete binary tree of 2**26 - 1 nodes in which
+all subtrees of the same height are one shared object, it would not fit in memory as Tree objects.
+
+Before each measurement the pages of the file are evicted from the page cache (posix_fadvise), so the
+mapped file is read from disk.
+"""
+
+import os
+import pickle
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from gentry.mapped import MappedTree, write
+from gentry.serialize import dump, load
+from gentry.tree import Count
+
+from .common import Leaf, Node, deep_tree, report
+
+SMALL_DEPTH = 20
+LARGE_DEPTH = 26
+
+
+def shared_tree(depth):
+    """A complete binary tree in which all subtrees of the same height are the same object."""
+    node = Leaf("leaf", properties={"weight": 1.5})
+    for _ in range(depth - 1):
+        node = Node("node", left=[node], right=[node])
+    return node
+
+
+def evict(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def query(root, depth):
+    node = root
+    for level in range(depth - 1):
+        node = (node.left if level % 2 else node.right)[0]
+    subtree = root.left[0].right[0].left[0]
+    for _ in range(depth - 13):  # a subtree of height 10
+        subtree = subtree.right[0]
+    return node.label, dict(node.properties), Count(subtree).count()
+
+
+def first_query(open_tree, path, depth):
+    """The time to open the file and answer the query, and the peak memory allocated (in a second run)."""
+    evict(path)
+    start = perf_counter()
+    result = open_tree(path, depth)
+    elapsed = perf_counter() - start
+    assert result[2] == 1023
+    evict(path)
+    tracemalloc.start()
+    open_tree(path, depth)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def with_pickle(path, depth):
+    with open(path, "rb") as f:
+        return query(pickle.load(f), depth)
+
+
+def with_serialize(path, depth):
+    with open(path, "rb") as f:
+        return query(load(f), depth)
+
+
+def with_mapped(path, depth):
+    with MappedTree(path) as tree:
+        return query(tree.root, depth)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    rows = [("file", "nodes", "MB", "write s", "first query s", "peak MB")]
+    try:
+        tree = deep_tree(SMALL_DEPTH)
+        for i, (node, _, _) in enumerate(tree.iter_preorder()):
+            if node.is_leaf():
+                node.properties["weight"] = i * 0.5
+        nodes = 2**SMALL_DEPTH - 1
+        for name, save, open_tree in (
+            ("pickle", lambda tree, f: pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL), with_pickle),
+            ("gentry.serialize", dump, with_serialize),
+            ("gentry.mapped", write, with_mapped),
+        ):
+            path = os.path.join(directory, name)
+            start = perf_counter()
+            with open(path, "wb") as f:
+                save(tree, f)
+            written = perf_counter() - start
+            elapsed, peak = first_query(open_tree, path, SMALL_DEPTH)
+            size = os.path.getsize(path) / 2**20
+            rows.append((name, nodes, f"{size:.0f}", f"{written:.1f}", f"{elapsed:.4f}", f"{peak / 2**20:.2f}"))
+            os.remove(path)
+        del tree
+
+        path = os.path.join(directory, "large")
+        start = perf_counter()
+        nodes = write(shared_tree(LARGE_DEPTH), path)
+        written = perf_counter() - start
+        elapsed, peak = first_query(with_mapped, path, LARGE_DEPTH)
+        size = os.path.getsize(path) / 2**20
+        rows.append(("gentry.mapped", nodes, f"{size:.0f}", f"{written:.0f}", f"{elapsed:.4f}", f"{peak / 2**20:.2f}"))
+        os.remove(path)
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    report("Time to first query (cold page cache)", rows)
+
+
+if __name__ == "__main__":
+    main()
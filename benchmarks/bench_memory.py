@@ -0,0 +1,53 @@
+"""
+Peak memory used by a visit over a 1M node tree, measured with tracemalloc.
+
+Compares the nested result dict of a Visitor with a Reducer that only passes
+child results up, and with a Reducer that discards all results.
+"""
+
+import tracemalloc
+from time import perf_counter
+
+from gentry.tree import Reducer, Visitor
+
+from .common import deep_tree, report
+
+
+class Labels(Visitor):
+    def _do_labels(self, tree):
+        return 1
+
+
+class Sum(Reducer):
+    def _do_sum(self, tree, results):
+        return 1 + sum(results)
+
+
+def measure(visitor):
+    tracemalloc.start()
+    start = perf_counter()
+    result = visitor.visit()
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    visitor.result = None
+    return peak, elapsed
+
+
+def main():
+    root = deep_tree(20)  # 1048575 nodes
+    n = 2**20 - 1
+    rows = [("mode", "nodes", "peak MB", "bytes/node", "seconds (traced)")]
+    for name, visitor in (
+        ("Visitor", Labels(root)),
+        ("Reducer", Sum(root)),
+        ("Reducer(discard=True)", Sum(root, discard=True)),
+    ):
+        peak, elapsed = measure(visitor)
+        rows.append((name, n, f"{peak / 2**20:.1f}", f"{peak / n:.0f}", f"{elapsed:.2f}"))
+    report("Peak memory of a visit", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Time to render Mermaid markdown as a function of output size, for wide and deep trees.
+
+The time per byte of output should stay roughly constant as trees get bigger.
+"""
+
+import io
+
+from gentry.mermaid import Mermaid
+from gentry.tree import Tree
+
+from .common import report, timeit
+
+
+class M(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+def wide(n):
+    root = M("root")
+    root.left = [M(f"leaf{i}") for i in range(n - 1)]
+    return root
+
+
+def chain(n):
+    node = M("leaf")
+    for i in range(n - 1):
+        node = M(f"node{i}", left=[node, M("sibling")])
+    return node
+
+
+def render(node):
+    stream = io.StringIO()
+    node.write_mermaid(stream)
+    return stream.tell()
+
+
+def main():
+    rows = [("tree", "nodes", "output bytes", "seconds", "ns/byte")]
+    for name, build, sizes in (
+        ("wide", wide, (25_000, 50_000, 100_000, 200_000)),
+        ("deep", chain, (250, 500, 1_000, 2_000)),
+    ):
+        for n in sizes:
+            root = build(n)
+            size = render(root)
+            elapsed = timeit(render, root)
+            rows.append((name, n, size, f"{elapsed:.3f}", f"{elapsed / size * 1e9:.1f}"))
+    report("Mermaid.write_mermaid()", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+The cost of change tracking, and what it buys.
+
+Building an observable tree is slower than building a regular one, because group lists and
+properties are tracked containers. In return, after editing a single leaf, only the dirty
+nodes (the leaf and its ancestors) have to be looked at instead of the whole tree.
+"""
+
+from gentry.tree import Tree
+
+from .common import report, timeit
+
+
+class Plain(Tree):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+def complete(cls, depth):
+    level = [cls(f"leaf{i}") for i in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        level = [cls("node", left=[level[i]], right=[level[i + 1]]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def scan(root):
+    return sum(1 for _ in root.iter_preorder())
+
+
+def edit_and_collect(root, leaf):
+    leaf.properties["edited"] = True
+    changed = sum(1 for _ in root.iter_dirty())
+    root.mark_clean()
+    return changed
+
+
+def main():
+    rows = [("nodes", "build plain", "build observed", "full scan", "dirty scan", "dirty nodes")]
+    for depth in (14, 16, 18):
+        plain = timeit(complete, Plain, depth)
+        observed = timeit(complete, Observed, depth)
+        root = complete(Observed, depth)
+        root.mark_clean()
+        leaf = root
+        while not leaf.is_leaf():
+            leaf = leaf.right[0]
+        rows.append(
+            (
+                2**depth - 1,
+                f"{plain:.3f}",
+                f"{observed:.3f}",
+                f"{timeit(scan, root):.4f}",
+                f"{timeit(edit_and_collect, root, leaf):.6f}",
+                edit_and_collect(root, leaf),
+            )
+        )
+    report("Observable trees (seconds)", rows)
+
+
+if __name__ == "__main__":
+    main()
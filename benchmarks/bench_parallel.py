@@ -0,0 +1,56 @@
+"""
+Sequential versus parallel visits with a process pool.
+
+The speedup depends on the number of CPUs and on how much work a visitor method does per
+node: for trivial visitor methods pickling subtrees and results costs about as much as
+visiting them, for expensive ones the speedup approaches the number of workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from gentry.parallel import visit_parallel
+from gentry.tree import Visitor
+
+from .common import deep_tree, report, timeit
+
+
+class Cheap(Visitor):
+    def _do_cheap(self, tree):
+        return len(tree.label)
+
+
+class Expensive(Visitor):
+    def _do_expensive(self, tree):
+        return sum(ord(c) * i for i in range(200) for c in tree.label[:2])
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    workers = sorted({2, 4, cpus} - {1})
+    rows = [("visitor", "nodes", "sequential") + tuple(f"{w} workers" for w in workers) + ("best speedup",)]
+    root = deep_tree(17)
+    for visitor in (Cheap, Expensive):
+        sequential = timeit(lambda visitor=visitor: visitor(root).visit(), repeat=1)
+        times = []
+        for w in workers:
+            with ProcessPoolExecutor(w) as executor:
+                visit_parallel(visitor(root), w, min_size=0, executor=executor)  # start the workers
+                times.append(
+                    timeit(
+                        lambda visitor=visitor, w=w, executor=executor: visit_parallel(
+                            visitor(root), w, min_size=0, executor=executor
+                        ),
+                        repeat=1,
+                    )
+                )
+        rows.append(
+            (visitor.__name__, 2**17 - 1, f"{sequential:.2f}")
+            + tuple(f"{t:.2f}" for t in times)
+            + (f"{sequential / min(times):.1f}x",)
+        )
+    report(f"visit_parallel() on {cpus} CPUs (seconds)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Path queries compared with hand-written code for the same question on a tree with a million nodes.
+
+"visitor" is a Visitor subclass that collects the matching nodes, "loop" is a comprehension over
+iter_preorder() and "by hand" navigates the group attributes directly, where that is possible.
+"""
+
+from gentry.query import Query, compile_query
+from gentry.tree import Visitor
+
+from .common import Leaf, Node, report, timeit
+
+KINDS = ("loop", "block", "call", "return")
+
+
+def build():
+    root = Node("root")
+    root.left = [
+        Node(f"branch{b}", left=[Leaf(f"leaf{i}", properties={"kind": KINDS[i % 4]}) for i in range(999)])
+        for b in range(1000)
+    ]
+    return root
+
+
+class CollectLoops(Visitor):
+    def __init__(self, root):
+        super().__init__(root)
+        self.found = []
+
+    def _do_collectloops(self, tree):
+        pass
+
+    def _do_collectloops_Leaf(self, tree):
+        if tree.properties.get("kind") == "loop":
+            self.found.append(tree)
+
+
+def collect_loops(root):
+    visitor = CollectLoops(root)
+    visitor.visit()
+    return visitor.found
+
+
+def main():
+    root = build()
+    rows = [("question", "query", "visitor", "loop", "by hand", "matches")]
+
+    path = "//Leaf[@kind='loop']"
+    query = compile_query(path)
+    matches = len(list(query.select(root)))
+    rows.append(
+        (
+            path,
+            f"{timeit(lambda: list(query.select(root)), repeat=1):.3f}",
+            f"{timeit(collect_loops, root, repeat=1):.3f}",
+            f"{timeit(lambda: [n for n, _, _ in root.iter_preorder() if isinstance(n, Leaf) and n.properties.get('kind') == 'loop'], repeat=1):.3f}",
+            "",
+            matches,
+        )
+    )
+
+    path = "left/*[500]/left/*[@kind='loop']"
+    query = compile_query(path)
+    rows.append(
+        (
+            path,
+            f"{timeit(lambda: list(query.select(root))):.5f}",
+            "",
+            "",
+            f"{timeit(lambda: [n for n in root.left[500].left if n.properties.get('kind') == 'loop']):.5f}",
+            len(list(query.select(root))),
+        )
+    )
+
+    path = "left/*/left/*[0]"
+    query = compile_query(path)
+    rows.append(
+        (
+            path,
+            f"{timeit(lambda: list(query.select(root))):.4f}",
+            "",
+            "",
+            f"{timeit(lambda: [branch.left[0] for branch in root.left]):.4f}",
+            len(list(query.select(root))),
+        )
+    )
+
+    path = "//Leaf[label='leaf10']"
+    query = compile_query(path)
+    rows.append(
+        (
+            path + " first",
+            f"{timeit(query.first, root):.5f}",
+            "",
+            f"{timeit(lambda: next(n for n, _, _ in root.iter_preorder() if n.label == 'leaf10')):.5f}",
+            "",
+            1,
+        )
+    )
+    report("Path queries on a tree of 1000001 nodes (seconds)", rows)
+
+    path = "matriarch/*/children/Mother[label='Anna']/girls/*"
+    rows = [("compiling", "seconds per query")]
+    rows.append(("Query(path)", f"{timeit(lambda: [Query(path) for _ in range(1000)]) / 1000:.7f}"))
+    rows.append(("compile_query(path), cached", f"{timeit(lambda: [compile_query(path) for _ in range(1000)]) / 1000:.7f}"))
+    report(path, rows)
+
+
+if __name__ == "__main__":
+    main()
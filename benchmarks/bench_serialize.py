@@ -0,0 +1,64 @@
+"""
+Size, encode time and decode time of a complete binary tree of about a million nodes, stored with
+gentry.serialize, with pickle and as JSON.
+
+The JSON encoding is the obvious one, a nested object per node with its class name, label, properties
+and groups, converted from and to Tree objects by the benchmark (recursively, the tree is only 20 levels deep).
+"""
+
+import json
+import pickle
+
+from gentry.serialize import dumps, loads
+
+from .common import Leaf, Node, deep_tree, report, timeit
+
+DEPTH = 20
+CLASSES = {"Node": Node, "Leaf": Leaf}
+
+
+def build():
+    root = deep_tree(DEPTH)
+    for i, leaf in enumerate(node for node, _, _ in root.iter_preorder() if node.is_leaf()):
+        if i % 4 == 0:
+            leaf.properties.update(weight=i * 0.5, kind="even" if i % 8 == 0 else "odd")
+    return root
+
+
+def to_json(node):
+    return {
+        "class": node.__class__.__name__,
+        "label": node.label,
+        "properties": node.properties,
+        "children": {group: [to_json(child) for child in children] for group, children in node._children.items()},
+    }
+
+
+def from_json(data):
+    return CLASSES[data["class"]](
+        data["label"],
+        children={group: [from_json(child) for child in children] for group, children in data["children"].items()},
+        properties=data["properties"],
+    )
+
+
+def main():
+    root = build()
+    n = 2**DEPTH - 1
+    formats = [
+        ("gentry.serialize", dumps, loads),
+        ("pickle", lambda tree: pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+        ("JSON", lambda tree: json.dumps(to_json(tree)).encode(), lambda data: from_json(json.loads(data))),
+    ]
+    rows = [("format", "MB", "bytes/node", "encode s", "decode s")]
+    for name, encode, decode in formats:
+        data = encode(root)
+        encoding = timeit(encode, root, repeat=1)
+        decoding = timeit(decode, data, repeat=1)
+        rows.append((name, f"{len(data) / 2**20:.1f}", f"{len(data) / n:.1f}", f"{encoding:.2f}", f"{decoding:.2f}"))
+        del data
+    report(f"Serializing a tree of {n} nodes", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Structural hashing and sharing on a tree with a lot of repetition.
+
+The tree has a root with 1000 children, each a copy of one of 20 different subtrees of about 1000
+nodes (like the many similar functions in generated code). dedupe() merges the copies, after which
+a Reducer or Visitor with shared=True only evaluates the distinct subtrees.
+"""
+
+import random
+import tracemalloc
+
+from gentry.structure import StructuralHasher, dedupe
+from gentry.tree import Reducer, Visitor
+
+from .common import Leaf, Node, report, timeit
+
+COPIES = 1000
+TEMPLATES = 20
+
+
+def template(rng, size):
+    """A random tree of the given size, described as nested (label, children) tuples."""
+    nodes = [("n0", [])]
+    for i in range(1, size):
+        children = rng.choice(nodes)[1]
+        children.append((f"n{i % 10}", []))  # few distinct labels, so there are equal subtrees inside a copy too
+        nodes.append(children[-1])
+    return nodes[0]
+
+
+def materialize(spec):
+    label, children = spec
+    if not children:
+        return Leaf(label)
+    return Node(label, left=[materialize(child) for child in children])
+
+
+def build():
+    rng = random.Random(3)
+    templates = [template(rng, 1000) for _ in range(TEMPLATES)]
+    root = Node("root")
+    root.left = [materialize(rng.choice(templates)) for _ in range(COPIES)]
+    return root
+
+
+class Size(Reducer):
+    def _do_size(self, tree, results):
+        return 1 + sum(results)
+
+
+class Labels(Visitor):
+    def _do_labels(self, tree):
+        return tree.label
+
+
+def unique(root):
+    return len({id(node) for node, _, _ in root.iter_preorder()})
+
+
+def main():
+    root = build()
+    size = Size(root).visit()
+    rows = [("step", "seconds", "")]
+    rows.append(("hash all nodes", f"{timeit(lambda: StructuralHasher().hash(root), repeat=1):.2f}", ""))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = build()
+    tree_memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    elapsed = timeit(dedupe, tree, repeat=1)
+    rows.append(("dedupe()", f"{elapsed:.2f}", f"{size} nodes -> {unique(tree)} distinct nodes"))
+    rows.append(("memory of the tree", "", f"{tree_memory / 2**20:.0f} MB before dedupe"))
+    report(f"Deduplicating a tree of {size} nodes", rows)
+
+    rows = [("pass", "plain seconds", "shared=True seconds")]
+    rows.append(
+        (
+            "Reducer",
+            f"{timeit(lambda: Size(tree).visit(), repeat=1):.3f}",
+            f"{timeit(lambda: Size(tree, shared=True).visit()):.4f}",
+        )
+    )
+    rows.append(
+        (
+            "Visitor",
+            f"{timeit(lambda: Labels(tree).visit(), repeat=1):.3f}",
+            f"{timeit(lambda: Labels(tree, shared=True).visit()):.4f}",
+        )
+    )
+    rows.append(
+        (
+            "Visitor (tree without sharing)",
+            f"{timeit(lambda: Labels(root).visit(), repeat=1):.3f}",
+            f"{timeit(lambda: Labels(root, shared=True).visit(), repeat=1):.3f}",
+        )
+    )
+    report("Passes over the deduplicated tree", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Sequential versus threaded visits.
+
+Only free-threaded (no-GIL) builds of CPython run the worker threads in parallel, with the
+GIL this shows the overhead of splitting the tree and combining the results.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from gentry.parallel import visit_threaded
+from gentry.tree import Visitor
+
+from .common import deep_tree, report, timeit
+
+
+class Expensive(Visitor):
+    def _do_expensive(self, tree):
+        return sum(ord(c) * i for i in range(50) for c in tree.label[:2])
+
+
+def main():
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    cpus = os.cpu_count() or 1
+    workers = sorted({2, 4, cpus} - {1})
+    rows = [("nodes", "sequential") + tuple(f"{w} threads" for w in workers) + ("best speedup",)]
+    for depth in (15, 17):
+        root = deep_tree(depth)
+        sequential = timeit(lambda root=root: Expensive(root).visit(), repeat=1)
+        times = []
+        for w in workers:
+            with ThreadPoolExecutor(w) as executor:
+                times.append(
+                    timeit(
+                        lambda root=root, w=w, executor=executor: visit_threaded(
+                            Expensive(root), w, min_size=0, executor=executor
+                        ),
+                        repeat=1,
+                    )
+                )
+        rows.append(
+            (2**depth - 1, f"{sequential:.2f}")
+            + tuple(f"{t:.2f}" for t in times)
+            + (f"{sequential / min(times):.1f}x",)
+        )
+    report(f"visit_threaded() on {cpus} CPUs, GIL {'enabled' if gil else 'disabled'} (seconds)", rows)
+
+
+if __name__ == "__main__":
+    main()
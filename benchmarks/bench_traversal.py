@@ -0,0 +1,49 @@
+"""
+Recursive versus explicit stack implementation of Visitor._visit.
+
+The recursive version is the original implementation, it cannot handle the deep
+chain because it runs into the recursion limit.
+"""
+
+from collections import defaultdict
+
+from gentry.tree import Visitor
+
+from .common import chain, deep_tree, report, timeit, wide_tree
+
+
+class Labels(Visitor):
+    def _do_labels(self, tree):
+        return tree.label
+
+
+def recursive_visit(visitor, tree):
+    typename = tree.__class__.__name__
+    results = defaultdict(list)
+    for group, children in tree._children.items():
+        for child in children:
+            results[group].append(recursive_visit(visitor, child))
+    result = visitor._get_visitor(tree)(tree)
+    return {typename: result, "children": results}
+
+
+def main():
+    rows = [("tree", "nodes", "recursive s", "iterative s", "speedup")]
+    trees = (
+        ("wide", wide_tree(500_000), 500_000),
+        ("deep", deep_tree(19), 2**19 - 1),
+        ("chain", chain(500_000), 500_000),
+    )
+    for name, root, n in trees:
+        visitor = Labels(root)
+        after = timeit(visitor.visit)
+        try:
+            before = timeit(recursive_visit, visitor, root)
+            rows.append((name, n, f"{before:.3f}", f"{after:.3f}", f"{before / after:.1f}x"))
+        except RecursionError:
+            rows.append((name, n, "RecursionError", f"{after:.3f}", "-"))
+    report("Visitor.visit()", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Helpers shared by the benchmark scripts.
+
+The benchmarks are not part of the test suite; run them from the repository root, e.g.
+
+    python -m benchmarks.bench_dispatch
+"""
+
+import gc
+from time import perf_counter
+
+from gentry.tree import Tree
+
+
+class Node(Tree):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+def wide_tree(n: int, cls=Node) -> Tree:
+    """A root node with n - 1 leaf children in a single group."""
+    root = cls("root")
+    root.left = [Leaf(f"leaf{i}") for i in range(n - 1)]
+    return root
+
+
+def deep_tree(depth: int, cls=Node) -> Tree:
+    """A complete binary tree of the given depth (2**depth - 1 nodes)."""
+    level = [Leaf(f"leaf{i}") for i in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        level = [
+            cls("node", left=[level[i]], right=[level[i + 1]])
+            for i in range(0, len(level), 2)
+        ]
+    return level[0]
+
+
+def chain(n: int, cls=Node) -> Tree:
+    """A degenerate tree of n nodes where each node has a single child."""
+    node = Leaf("leaf")
+    for i in range(n - 1):
+        node = cls(f"node{i}", left=[node])
+    return node
+
+
+def nodes(root: Tree) -> list[Tree]:
+    """All nodes of the tree rooted at root, without recursion."""
+    result = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        result.append(node)
+        for children in node._children.values():
+            stack.extend(c for c in children if c is not None)
+    return result
+
+
+def timeit(func, *args, repeat: int = 3) -> float:
+    """The best wall clock time in seconds of repeat calls to func(*args)."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        func(*args)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def report(title: str, rows: list[tuple]):
+    """Print a simple aligned table, the first row is the header."""
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    print(f"\n{title}")
+    for row in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,206 @@
+"""
+Bulk aggregations over a tree stored in an Arena.
+
+Instead of paying for a Python method call per node, like a Visitor does, these functions
+compute a metric for all nodes at once from the flat columns of an `Arena`. The
+result for node i is at position i of the returned array.
+
+If NumPy is installed the computations are vectorized and numpy arrays are returned,
+otherwise a simple loop over `array.array` columns is used and array.array objects
+are returned. Both are indexable in the same way.
+
+A typical use:
+
+    arena, nodes = flatten(root)
+    sizes = subtree_sizes(arena)
+    print(nodes[42].label, sizes[42])
+"""
+
+from array import array
+from collections import Counter
+
+from .arena import Arena
+from .tree import Tree
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def flatten(root: Tree) -> tuple[Arena, list[Tree]]:
+    """
+    Convert a tree into an Arena once, so aggregations can be computed in bulk.
+
+    Args:
+        root (Tree): The root of the tree.
+
+    Returns:
+        tuple[Arena, list[Tree]]: The arena and the original nodes, in the order of the node indices of the arena.
+    """
+    # Arena.from_tree() adds nodes breadth first, in the same order as iter_bfs() walks them
+    return Arena.from_tree(root), [node for node, _, _ in root.iter_bfs()]
+
+
+def _parents(arena: Arena):
+    return np.frombuffer(arena.parent, dtype=np.int64) if np is not None else arena.parent
+
+
+def depths(arena: Arena):
+    """
+    The depth of each node, roots have depth 0.
+
+    Args:
+        arena (Arena): The flattened tree.
+
+    Returns:
+        numpy.ndarray|array.array: The depth of each node.
+    """
+    if np is not None:
+        # pointer jumping: each round doubles the distance to the ancestor we look at
+        parent = _parents(arena)
+        ancestor = parent.copy()
+        depth = (parent >= 0).astype(np.int64)  # the distance to the ancestor
+        active = np.flatnonzero(ancestor >= 0)
+        while active.size:
+            up = ancestor[active]
+            depth[active] += depth[up]
+            ancestor[active] = ancestor[up]
+            active = active[ancestor[active] >= 0]
+        return depth
+    depth = array("q", bytes(8 * len(arena)))
+    for i, p in enumerate(arena.parent):
+        if p >= 0:
+            depth[i] = depth[p] + 1
+    return depth
+
+
+def _reduce_up(arena: Arena, values, operation: str):
+    """
+    Combine the values of each node with those of all its descendants, in place.
+
+    Children always have a higher index than their parent, so combining values
+    from the highest index down visits every child before its parent. The vectorized
+    version does the same one depth level at a time.
+    """
+    parent = _parents(arena)
+    if np is not None:
+        combine = {"sum": np.add, "min": np.minimum, "max": np.maximum}[operation]
+        depth = depths(arena)
+        order = np.argsort(depth, kind="stable")
+        bounds = np.searchsorted(depth[order], np.arange(int(depth.max(initial=0)) + 2))
+        for level in range(len(bounds) - 2, 0, -1):
+            nodes = order[bounds[level] : bounds[level + 1]]
+            combine.at(values, parent[nodes], values[nodes])
+        return values
+    if operation == "sum":
+        for i in range(len(parent) - 1, -1, -1):
+            p = parent[i]
+            if p >= 0:
+                values[p] += values[i]
+    else:
+        combine = min if operation == "min" else max
+        for i in range(len(parent) - 1, -1, -1):
+            p = parent[i]
+            if p >= 0:
+                values[p] = combine(values[p], values[i])
+    return values
+
+
+def subtree_sizes(arena: Arena):
+    """
+    The number of nodes in the subtree rooted at each node, including the node itself.
+
+    Args:
+        arena (Arena): The flattened tree.
+
+    Returns:
+        numpy.ndarray|array.array: The size of each subtree.
+    """
+    n = len(arena)
+    if np is not None:
+        return _reduce_up(arena, np.ones(n, dtype=np.int64), "sum")
+    return _reduce_up(arena, array("q", [1]) * n, "sum")
+
+
+def leaves(arena: Arena):
+    """
+    Flags that are true for nodes without children.
+
+    Args:
+        arena (Arena): The flattened tree.
+
+    Returns:
+        numpy.ndarray|array.array: A boolean array (an array of 0/1 bytes without NumPy).
+    """
+    offsets, _ = arena._index()
+    if np is not None:
+        return np.diff(np.frombuffer(offsets, dtype=np.int64)) == 0
+    return array("b", [offsets[i] == offsets[i + 1] for i in range(len(arena))])
+
+
+def class_counts(arena: Arena) -> dict[str, int]:
+    """
+    The number of nodes per class name.
+
+    Args:
+        arena (Arena): The flattened tree.
+
+    Returns:
+        dict[str, int]: The counts, only classes that occur in the tree are present.
+    """
+    names = [cls.__name__ for cls in arena.classes]
+    result: Counter[str] = Counter()
+    if np is not None:
+        counts = np.bincount(np.frombuffer(arena.klass, dtype=np.int32), minlength=len(names))
+        for name, count in zip(names, counts.tolist()):
+            result[name] += count
+    else:
+        for klass, count in Counter(arena.klass).items():
+            result[names[klass]] += count
+    return dict(result)
+
+
+def property_values(arena: Arena, key: str, default: float = 0):
+    """
+    The value of a property for each node.
+
+    Args:
+        arena (Arena): The flattened tree.
+        key (str): The key in the properties of a node.
+        default (float): The value for nodes that do not have the property.
+
+    Returns:
+        numpy.ndarray|array.array: The values as floats.
+    """
+    n = len(arena)
+    values = np.full(n, default, dtype=np.float64) if np is not None else array("d", [default]) * n
+    for index, properties in arena.properties.items():  # properties are stored sparsely
+        if key in properties:
+            values[index] = properties[key]
+    return values
+
+
+def subtree_reduce(arena: Arena, key: str, operation: str = "sum", default: float | None = None):
+    """
+    Reduce a numeric property over the subtree rooted at each node.
+
+    Args:
+        arena (Arena): The flattened tree.
+        key (str): The key in the properties of a node.
+        operation (str): One of "sum", "min" or "max".
+        default (float|None): The value for nodes that do not have the property, by default the
+            identity of the operation (0 for sum, +inf for min and -inf for max).
+
+    Returns:
+        numpy.ndarray|array.array: The reduced value for each subtree, as floats.
+
+    Raises:
+        ValueError: If the operation is unknown.
+    """
+    identities = {"sum": 0.0, "min": float("inf"), "max": float("-inf")}
+    if operation not in identities:
+        raise ValueError(f"unknown operation {operation}")
+    if default is None:
+        default = identities[operation]
+    return _reduce_up(arena, property_values(arena, key, default), operation)
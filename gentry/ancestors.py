@@ -0,0 +1,131 @@
+"""
+Constant time lowest common ancestor queries.
+
+Observable nodes know their parent (see `Tree.parent`, `Tree.ancestors()` and `Tree.path()`), so
+the lowest common ancestor of two nodes can be found by walking up from both, which takes time
+proportional to their depth. When many pairs of nodes have to be related, an `AncestorIndex` answers
+each question in constant time, for any tree:
+
+    index = AncestorIndex(root)
+    common = index.lca(a, b)
+
+The index is built on the first query, from a preorder walk of the tree and a sparse table of range
+minimums over the depths of the nodes in that order (the preorder variant of the Euler tour
+technique, it needs n instead of 2n - 1 entries per level). For an observable root the index is
+built again when the tree changed, otherwise call `rebuild()` after changing the tree.
+"""
+
+from array import array
+
+from .tree import Tree
+
+
+class AncestorIndex:
+    """
+    Lowest common ancestor, depth and ancestor queries for the nodes of a tree.
+    """
+
+    def __init__(self, root: Tree) -> None:
+        """
+        Initialize an AncestorIndex, it is built when it is first needed.
+
+        Args:
+            root (Tree): The root of the tree.
+        """
+        self.root = root
+        self._generation = None
+        self._nodes: list[Tree] | None = None
+
+    def rebuild(self) -> None:
+        """
+        Build the index for the current tree.
+
+        This takes O(n log n) time and memory, for n nodes.
+        """
+        nodes = []
+        parents = array("q")
+        depths = array("q")
+        last = []  # the preorder index of the last node seen at each depth
+        for node, _, depth in self.root.iter_preorder():
+            del last[depth:]
+            parents.append(last[-1] if last else -1)
+            last.append(len(nodes))
+            nodes.append(node)
+            depths.append(depth)
+        n = len(nodes)
+        sizes = array("q", [1]) * n
+        for i in range(n - 1, 0, -1):  # children come after their parent in preorder
+            sizes[parents[i]] += sizes[i]
+
+        # level k holds the minimum of depth * n + index over the 2**k positions starting at each index,
+        # so the minimum identifies the shallowest node in a range as well as its depth
+        level = array("q", [depth * n + i for i, depth in enumerate(depths)])
+        table = [level]
+        width = 1
+        while 2 * width <= n:
+            level = array("q", map(min, level[: n - 2 * width + 1], level[width : n - width + 1]))
+            table.append(level)
+            width *= 2
+
+        self._nodes = nodes
+        self._positions = {id(node): i for i, node in enumerate(nodes)}
+        self._parents = parents
+        self._depths = depths
+        self._sizes = sizes
+        self._table = table
+        self._generation = self.root._version if self.root._observable else None
+
+    def _position(self, node: Tree) -> int:
+        if self._nodes is None or (self._generation is not None and self._generation != self.root._version):
+            self.rebuild()
+        try:
+            return self._positions[id(node)]
+        except KeyError:
+            raise ValueError(f"{node!r} is not in the tree of {self.root!r}") from None
+
+    def lca(self, a: Tree, b: Tree) -> Tree:
+        """
+        Return the lowest common ancestor of two nodes.
+
+        A node counts as an ancestor of itself, so if a is an ancestor of b the result is a.
+
+        Args:
+            a (Tree): A node of the tree.
+            b (Tree): Another node of the tree.
+
+        Returns:
+            Tree: The deepest node that has both a and b in its subtree.
+
+        Raises:
+            ValueError: If a node is not in the tree.
+        """
+        i, j = self._position(a), self._position(b)
+        if i == j:
+            return a
+        if i > j:
+            i, j = j, i
+        # the shallowest node in preorder positions i + 1 .. j is a child of the lowest common ancestor
+        i += 1
+        k = (j - i + 1).bit_length() - 1
+        level = self._table[k]
+        shallowest = min(level[i], level[j - (1 << k) + 1]) % len(self._nodes)
+        return self._nodes[self._parents[shallowest]]
+
+    def depth(self, node: Tree) -> int:
+        """
+        The number of ancestors of a node, 0 for the root.
+
+        Raises:
+            ValueError: If the node is not in the tree.
+        """
+        return self._depths[self._position(node)]
+
+    def is_ancestor(self, a: Tree, b: Tree) -> bool:
+        """
+        Check whether a is an ancestor of b (or b itself).
+
+        Raises:
+            ValueError: If a node is not in the tree.
+        """
+        i, j = self._position(a), self._position(b)
+        return i <= j < i + self._sizes[i]
@@ -0,0 +1,441 @@
+from array import array
+from collections.abc import Iterator
+from functools import cache
+from types import MappingProxyType
+
+from .tree import Tree, _CompactTree, _Observable, _TreeBase
+
+_NO_PROPERTIES = MappingProxyType({})
+
+
+class Arena:
+    """
+    A tree stored in flat columns instead of one Python object per node.
+
+    Each node is identified by an integer index and has an entry in the following columns:
+
+      parent      index of the parent node, -1 for a root node
+      group       index into the table of group names, -1 for a root node
+      klass       index into the table of Tree classes
+      label       index into the table of label strings, -1 if the label is None
+
+    Properties and any non-default instance attributes (like the shape of a Mermaid node)
+    are stored sparsely in dicts keyed by node index, and so are the groups of nodes that
+    have empty groups (which are rendered, but have no children to record them).
+
+    A node can only be added after its parent, so a parent always has a lower index
+    than its children. The children of a node are kept in the order they were added,
+    the index of the children of all nodes is built lazily in CSR form (an offsets column
+    and a column of child indices).
+
+    Nodes can be added directly with `add()`, without creating a Tree object per node,
+    or an existing tree can be converted with `Arena.from_tree()`. The `node()` method and the
+    `root` property return lightweight proxies that are instances of (a subclass of) the original
+    Tree class, so group attributes, `label`, `properties` and `is_leaf()` work as usual, and
+    Visitor subclasses as well as the Mermaid and HTMLLayout mixins can be used unchanged.
+
+    Proxies are read-only views, use `to_tree()` to convert (part of) the arena back into
+    regular Tree objects if you want to modify it.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty Arena.
+        """
+        self.parent = array("q")
+        self.group = array("i")
+        self.klass = array("i")
+        self.label = array("i")
+        self.groups: list[str] = []
+        self.classes: list[type] = []
+        self.strings: list[str] = []
+        self.properties: dict[int, dict] = {}
+        self.attributes: dict[int, dict] = {}
+        self.group_order: dict[int, list[int]] = {}  # indices into groups, for nodes with empty groups
+        self._group_ids: dict[str, int] = {}
+        self._class_ids: dict[type, int] = {}
+        self._string_ids: dict[str, int] = {}
+        self._offsets: array | None = None
+        self._children: array | None = None
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    @staticmethod
+    def _intern(value, table: list, ids: dict) -> int:
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(table)
+            table.append(value)
+        return index
+
+    def add(
+        self,
+        cls: type,
+        label: str | None,
+        parent: int = -1,
+        group: str | None = None,
+        properties: dict | None = None,
+    ) -> int:
+        """
+        Add a node.
+
+        Args:
+            cls (type): The Tree subclass of the node.
+            label (str|None): The label of the node.
+            parent (int): The index of the parent node, or -1 for a root node.
+            group (str|None): The name of the group in the parent, required if there is a parent.
+            properties (dict|None): Optional. The properties of the node.
+
+        Returns:
+            int: The index of the new node.
+
+        Raises:
+            ValueError: If the parent does not exist yet or the group is missing.
+        """
+        index = len(self.parent)
+        if parent >= index or parent < -1:
+            raise ValueError(f"parent {parent} does not exist")
+        if parent >= 0 and group is None:
+            raise ValueError("a node with a parent must be in a group")
+        self.parent.append(parent)
+        self.group.append(-1 if parent < 0 else self._intern(group, self.groups, self._group_ids))
+        self.klass.append(self._intern(cls, self.classes, self._class_ids))
+        self.label.append(-1 if label is None else self._intern(label, self.strings, self._string_ids))
+        if properties:
+            self.properties[index] = properties
+        self._offsets = None
+        return index
+
+    def add_group(self, index: int, group: str) -> None:
+        """
+        Add a group to a node even if it remains empty.
+
+        Groups that are added this way come first, in the order they were added, followed by
+        any other groups of the node.
+
+        Args:
+            index (int): The index of the node.
+            group (str): The name of the group.
+
+        Raises:
+            IndexError: If there is no such node.
+        """
+        if not 0 <= index < len(self.parent):
+            raise IndexError(f"node {index} does not exist")
+        order = self.group_order.setdefault(index, [])
+        group = self._intern(group, self.groups, self._group_ids)
+        if group not in order:
+            order.append(group)
+
+    def _index(self) -> tuple[array, array]:
+        """
+        Build (if needed) and return the offsets and children columns.
+
+        The children of node i are children[offsets[i]:offsets[i + 1]].
+        """
+        if self._offsets is None:
+            n = len(self.parent)
+            offsets = array("q", bytes(8 * (n + 1)))
+            for p in self.parent:
+                if p >= 0:
+                    offsets[p + 1] += 1
+            total = 0
+            for i in range(n + 1):
+                total += offsets[i]
+                offsets[i] = total
+            children = array("q", bytes(8 * total))
+            fill = offsets[:-1]
+            for i, p in enumerate(self.parent):
+                if p >= 0:
+                    children[fill[p]] = i
+                    fill[p] += 1
+            self._offsets, self._children = offsets, children
+        return self._offsets, self._children
+
+    def children(self, index: int) -> array:
+        """
+        Return the indices of the children of a node, in all groups.
+        """
+        offsets, children = self._index()
+        return children[offsets[index] : offsets[index + 1]]
+
+    def groups_of(self, index: int) -> dict[str, list[int]]:
+        """
+        Return the indices of the children of a node grouped by group name.
+
+        Groups added with `add_group()` come first, the others are in the order in which their
+        first child was added.
+        """
+        offsets, children = self._index()
+        groups = self.groups
+        group = self.group
+        order = self.group_order.get(index)
+        result: dict[str, list[int]] = {} if order is None else {groups[g]: [] for g in order}
+        for i in range(offsets[index], offsets[index + 1]):
+            child = children[i]
+            name = groups[group[child]]
+            members = result.get(name)
+            if members is None:
+                result[name] = [child]
+            else:
+                members.append(child)
+        return result
+
+    def roots(self) -> list[int]:
+        """
+        Return the indices of all nodes without a parent.
+        """
+        return [i for i, p in enumerate(self.parent) if p < 0]
+
+    def node(self, index: int) -> Tree:
+        """
+        Return a read-only proxy for a node.
+
+        Raises:
+            IndexError: If there is no such node.
+        """
+        if not 0 <= index < len(self.parent):
+            raise IndexError(f"node {index} does not exist")
+        proxy = object.__new__(_proxy_class(self.classes[self.klass[index]]))
+        object.__setattr__(proxy, "_arena", self)
+        object.__setattr__(proxy, "_ref", index)
+        return proxy
+
+    @property
+    def root(self) -> Tree:
+        """
+        A proxy for the first node, the root of the tree.
+        """
+        return self.node(0)
+
+    def iter_preorder(self, index: int = 0) -> Iterator[tuple[int, int]]:
+        """
+        Walk the subtree rooted at index without creating proxies, parents before children.
+
+        Yields:
+            tuple[int, int]: The index of a node and its depth relative to the start.
+        """
+        offsets, children = self._index()
+        stack = [(index, 0)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            depth += 1
+            for i in range(offsets[node + 1] - 1, offsets[node] - 1, -1):
+                stack.append((children[i], depth))
+
+    @classmethod
+    def from_tree(cls, root: Tree) -> "Arena":
+        """
+        Convert a tree of Tree objects into an Arena, the root will be node 0.
+
+        Nodes are added level by level, and children that are None are skipped. Nodes with
+        empty groups get all their groups recorded with `add_group()`, so they keep their order.
+        Instance attributes other than `label`, `_children` and `properties` that are
+        not None (for example the shape of a Mermaid node) are copied as well.
+
+        Args:
+            root (Tree): The root of the tree.
+
+        Returns:
+            Arena: The new arena.
+        """
+        arena = cls()
+        add = arena.add
+        attributes = arena.attributes
+        index = add(root.__class__, root.label, properties=_properties(root))
+        queue = [(root, index)]
+        for node, index in queue:  # the queue grows while we iterate over it
+            extra = _instance_attributes(node)
+            if extra:
+                attributes[index] = extra
+            groups = node._children
+            if not all(groups.values()):
+                for group in groups:
+                    arena.add_group(index, group)
+            for group, children in groups.items():
+                for child in children:
+                    if child is not None:
+                        queue.append(
+                            (
+                                child,
+                                add(
+                                    child.__class__,
+                                    child.label,
+                                    index,
+                                    group,
+                                    _properties(child),
+                                ),
+                            )
+                        )
+        return arena
+
+    def to_tree(self, index: int = 0) -> Tree:
+        """
+        Convert the subtree rooted at index into regular Tree objects.
+
+        Nodes are created without calling the __init__() of their class itself (which
+        might need arguments), the __init__() of Tree and of any mixins is called instead.
+
+        Args:
+            index (int): The index of the root of the subtree.
+
+        Returns:
+            Tree: The new root node.
+        """
+        offsets, children = self._index()
+        root = self._materialize(index)
+        stack = [(index, root)]
+        while stack:
+            i, node = stack.pop()
+            order = self.group_order.get(i)
+            if offsets[i] == offsets[i + 1] and order is None:
+                continue
+            kids = node._writable_children()
+            for group in order or ():
+                kids.setdefault(self.groups[group], [])
+            for c in range(offsets[i], offsets[i + 1]):
+                child = children[c]
+                childnode = self._materialize(child)
+                kids[self.groups[self.group[child]]].append(childnode)
+                stack.append((child, childnode))
+        return root
+
+    def _materialize(self, index: int) -> Tree:
+        cls = self.classes[self.klass[index]]
+        node = cls.__new__(cls)
+        label = self.label[index]
+        properties = self.properties.get(index)
+        _TreeBase.__init__(
+            node,
+            None if label < 0 else self.strings[label],
+            properties=None if properties is None else dict(properties),
+        )
+        for name, value in self.attributes.get(index, {}).items():
+            object.__setattr__(node, name, value)
+        return node
+
+
+@cache
+def _instance_fields(cls: type) -> frozenset[str]:
+    """
+    The names of the instance attributes declared by mixins through `_compact_slots` and
+    any slots declared by compact subclasses.
+    """
+    fields = set()
+    for klass in cls.__mro__:
+        fields.update(klass.__dict__.get("_compact_slots", ()))
+        if klass is not _CompactTree:
+            fields.update(
+                name for name in klass.__dict__.get("__slots__", ()) if not name.startswith("__")
+            )
+    return frozenset(fields.difference(_Observable._compact_slots))  # parent pointers and versions are not copied
+
+
+def _properties(node: Tree) -> dict | None:
+    """
+    The properties of a node, without allocating them for compact nodes.
+    """
+    if node._compact:
+        return getattr(node, "_props", None) or None
+    return node.properties or None
+
+
+def _instance_attributes(node: Tree) -> dict:
+    """
+    Instance attributes of a node that are not None, other than label, _children and properties.
+    """
+    result = {}
+    for name in _instance_fields(node.__class__):
+        value = getattr(node, name, None)
+        if value is not None:
+            result[name] = value
+    if node.__class__.__dictoffset__:  # not for compact nodes, don't end up in __getattr__
+        for name, value in node.__dict__.items():
+            if value is not None and name not in _TREE_ATTRIBUTES:
+                result[name] = value
+    return result
+
+
+_TREE_ATTRIBUTES = frozenset(("label", "_children", "properties", "_parent", "_group", "_version", "_dirty"))
+
+_proxy_classes: dict[type, type] = {}
+
+
+def _proxy_class(cls: type) -> type:
+    """
+    Return (and create if needed) the proxy class for a Tree subclass.
+
+    The proxy class derives from the original class and has the same name, so visitor methods
+    are found and Mermaid output is the same as for the original nodes.
+    """
+    proxy = _proxy_classes.get(cls)
+    if proxy is None:
+        fields = _instance_fields(cls)
+
+        def __getattr__(self, name):
+            if name in self._groups:
+                members = self._arena.groups_of(self._ref).get(name, ())
+                return tuple(self._arena.node(i) for i in members)
+            attributes = self._arena.attributes.get(self._ref)
+            if attributes is not None and name in attributes:
+                return attributes[name]
+            if name in fields:
+                return None
+            raise AttributeError(f"{name} attribute could not be found on {self!r}")
+
+        namespace = dict(_ArenaNode.__dict__)
+        for name in ("__dict__", "__weakref__", "__doc__"):
+            namespace.pop(name, None)
+        namespace["__getattr__"] = __getattr__
+        namespace["__slots__"] = ("_arena", "_ref")
+        namespace["__qualname__"] = cls.__qualname__
+        namespace["__module__"] = cls.__module__
+        namespace["__doc__"] = f"Read-only Arena proxy for {cls.__name__} nodes."
+        proxy = _proxy_classes[cls] = type(cls)(cls.__name__, (cls,), namespace)
+    return proxy
+
+
+class _ArenaNode:
+    """
+    The attributes that are copied into every proxy class, see `_proxy_class()`.
+
+    They only use the `label` column, `strings`, `properties`, `attributes`, `groups_of()`, `node()`
+    and `_index()` of the arena, which a `gentry.mapped.MappedTree` provides as well.
+    """
+
+    @property
+    def label(self) -> str | None:
+        label = self._arena.label[self._ref]
+        return None if label < 0 else self._arena.strings[label]
+
+    @property
+    def properties(self) -> MappingProxyType:
+        return MappingProxyType(self._arena.properties.get(self._ref, _NO_PROPERTIES))
+
+    @property
+    def _children(self) -> dict[str, tuple]:
+        node = self._arena.node
+        return {
+            group: tuple(node(i) for i in members)
+            for group, members in self._arena.groups_of(self._ref).items()
+        }
+
+    def _writable_children(self):
+        raise AttributeError(f"{self!r} is a read-only Arena node")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self!r} is a read-only Arena node")
+
+    def is_leaf(self) -> bool:
+        offsets, _ = self._arena._index()
+        return offsets[self._ref] == offsets[self._ref + 1]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _TreeBase) and hasattr(other, "_ref"):
+            return self._arena is other._arena and self._ref == other._ref
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._arena), self._ref))
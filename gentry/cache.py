@@ -0,0 +1,123 @@
+"""
+A cache for rendered subtrees.
+
+Rendering a large tree again after a small edit mostly repeats work that was already done.
+A `RenderCache` remembers the rendering of each subtree together with the version of its
+root node. Nodes of classes defined with `observable=True` (see Tree) increment their version,
+and that of all their ancestors, whenever they change, so after editing a single leaf only the
+subtrees rooted at its ancestors have to be rendered again, the rendering of all other subtrees
+is taken from the cache.
+
+A typical use:
+
+    class MyTree(Tree, Mermaid, observable=True):
+        _groups = {"left", "right"}
+        _render_cache = RenderCache(maxsize=10000)
+
+The Mermaid and HTMLLayout mixins use the cache in their `_render_cache` class variable, if any.
+Nodes that are not observable are never cached.
+"""
+
+from collections import OrderedDict, namedtuple
+from collections.abc import Hashable
+from threading import Lock
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class RenderCache:
+    """
+    A bounded cache of rendered subtrees with least recently used eviction.
+
+    Entries are keyed by the identity of a node plus a key that describes how it was rendered
+    (for example the indentation level), and are valid as long as the version of the node does
+    not change. A cache holds a reference to the nodes it has entries for, and can be shared
+    between threads.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        """
+        Initialize a RenderCache.
+
+        Args:
+            maxsize (int): The maximum number of entries.
+
+        Raises:
+            ValueError: If maxsize is not positive.
+        """
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive, not {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, node, key: Hashable):
+        """
+        Return the cached rendering of a node.
+
+        Args:
+            node (Tree): The root of the rendered subtree.
+            key (Hashable): Describes how the subtree was rendered.
+
+        Returns:
+            The cached value, or None if there is no valid entry or the node is not observable.
+        """
+        if not node._observable:
+            return None
+        entrykey = (id(node), key)
+        with self._lock:
+            entry = self._entries.get(entrykey)
+            if entry is not None and entry[0] is node and entry[1] == node._version:
+                self._entries.move_to_end(entrykey)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:  # stale
+                del self._entries[entrykey]
+            self.misses += 1
+            return None
+
+    def put(self, node, key: Hashable, value) -> None:
+        """
+        Store the rendering of a node, evicting the least recently used entry if the cache is full.
+
+        Nothing is stored if the node is not observable.
+
+        Args:
+            node (Tree): The root of the rendered subtree.
+            key (Hashable): Describes how the subtree was rendered.
+            value: The rendering.
+        """
+        if not node._observable:
+            return
+        entrykey = (id(node), key)
+        with self._lock:
+            self._entries[entrykey] = (node, node._version, value)
+            self._entries.move_to_end(entrykey)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Return the hit and miss statistics, like functools.lru_cache does.
+
+        Returns:
+            CacheInfo: A named tuple (hits, misses, maxsize, currsize).
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the statistics.
+
+        This is needed after changes the versions do not reflect, like changing a class variable
+        that affects rendering.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,221 @@
+"""
+Fast copies of trees, and persistent versions of a tree that share their unchanged parts.
+
+`clone()` copies a tree without recursion and without the memo and reduce machinery of `copy.deepcopy()`:
+
+    copy = clone(root)
+    copy = root.clone(share_properties=True)
+
+Every node is copied with its label and its other instance attributes (like the shape of a Mermaid
+node), which are not copied themselves. Each copy gets a shallow copy of the properties dict of its
+original, or, with `share_properties=True`, the same dict. Subtrees that occur more than once (see
+`gentry.structure.dedupe()`) are copied once, like `deepcopy()` does.
+
+A `PersistentTree` is a version of a tree that shares all nodes with the versions it is derived from,
+until a node is edited. `edit()` returns a node that can be modified in place, after copying it and its
+ancestors if they are shared, so an edit costs a copy of the path from the root instead of the whole tree:
+
+    base = PersistentTree(root)
+    version = base.fork()
+    version.edit([("left", 0), ("right", 1)]).label = "changed"
+    assert base.root.left[0].right[1].label != "changed"
+
+Properties are shared until the node they belong to is returned by `edit()`. Nodes must only be modified
+through `edit()`, and the original tree should not be modified at all once a PersistentTree was made from it.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+from functools import cache
+
+from .arena import _instance_attributes
+from .tree import TrackedList, Tree
+
+_PLAIN, _SLOTTED, _COMPACT, _OBSERVABLE = 0, 1, 2, 3  # how a node is copied, see _kind()
+
+
+def clone(root: Tree, share_properties: bool = False) -> Tree:
+    """
+    Copy a tree.
+
+    Args:
+        root (Tree): The root of the tree.
+        share_properties (bool): Optional. If True, the copies use the properties dicts of the original
+            nodes instead of copies of them. Observable nodes always get their own.
+
+    Returns:
+        Tree: The root of the copy.
+    """
+    result = _copy(root, share_properties)
+    memo = {id(root): result}  # the copies of nodes that occur more than once
+    stack = [(root, result)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node, copy = pop()
+        children = node._children
+        if not children:
+            continue
+        kind = _kind(node.__class__)
+        groups = {}
+        for group, members in children.items():
+            copies = groups[group] = []
+            for child in members:
+                if child is None:
+                    copies.append(None)
+                    continue
+                new = memo.get(id(child))
+                if new is None:
+                    new = memo[id(child)] = _copy(child, share_properties)
+                    push((child, new))
+                copies.append(new)
+        _attach(copy, kind, groups)
+    return result
+
+
+class PersistentTree:
+    """
+    A copy-on-write version of a tree, see the module documentation.
+
+    Observable nodes can't be shared, because a node can have only one parent.
+    """
+
+    def __init__(self, root: Tree) -> None:
+        """
+        Initialize a PersistentTree that shares all nodes of a tree except its root.
+
+        Args:
+            root (Tree): The root of the tree.
+
+        Raises:
+            TypeError: If the root is observable.
+        """
+        if root._observable:
+            raise TypeError(f"{root.__class__.__name__} is observable, its nodes can't be shared")
+        self._owned: dict[int, tuple[Tree, bool]] = {}  # id -> (node, own properties) of nodes copied for this version
+        self.root = self._own(root, False)
+
+    def __len__(self) -> int:
+        """
+        The number of nodes that were copied for this version.
+        """
+        return len(self._owned)
+
+    def _own(self, node: Tree, properties: bool) -> Tree:
+        """
+        Return a copy of a node that shares its children (and, if not `properties`, its properties) with the original.
+        """
+        if node._observable:
+            raise TypeError(f"{node.__class__.__name__} is observable, its nodes can't be shared")
+        copy = _copy(node, not properties)
+        children = node._children
+        if children:
+            _attach(copy, _kind(node.__class__), {group: list(members) for group, members in children.items()})
+        self._owned[id(copy)] = (copy, properties)
+        return copy
+
+    def edit(self, path: Iterable[tuple[str, int]] = ()) -> Tree:
+        """
+        Return the node at a path, ready to be modified.
+
+        Shared nodes on the path are replaced by copies that only this version uses, and the properties of
+        the node are copied if they are still shared. The children of the node remain shared, so replacing
+        or adding children is fine, but to modify a child, edit its path.
+
+        Args:
+            path (Iterable[tuple[str, int]]): The group names and indices to follow from the root, like
+                the `path()` of observable nodes. The root itself if empty.
+
+        Returns:
+            Tree: The node.
+
+        Raises:
+            IndexError: If there is no node at the path.
+        """
+        owned = self._owned
+        node = self.root
+        for group, index in path:
+            members = node._children.get(group)
+            child = None if members is None or not -len(members) <= index < len(members) else members[index]
+            if child is None:
+                raise IndexError(f"there is no node at {group}[{index}] of {node!r}")
+            if id(child) not in owned:
+                child = members[index] = self._own(child, False)
+            node = child
+        if not owned[id(node)][1]:
+            properties = node._props if node._compact else node.properties
+            if properties is not None:
+                properties = dict(properties)
+                if node._compact:
+                    node._props = properties
+                else:
+                    node.properties = properties
+            owned[id(node)] = (node, True)
+        return node
+
+    def fork(self) -> "PersistentTree":
+        """
+        Return a new version that shares all nodes with this one.
+
+        From now on the nodes are shared by both versions, so editing either one copies them again.
+
+        Returns:
+            PersistentTree: The new version.
+        """
+        self._owned = {id(self.root): (self.root, False)}  # the new root shares the children and properties
+        version = PersistentTree.__new__(PersistentTree)
+        version._owned = {}
+        version.root = version._own(self.root, False)
+        return version
+
+
+@cache
+def _kind(cls: type) -> int:
+    """
+    _PLAIN if all instance attributes of a class are in its __dict__, _SLOTTED if it is not compact but
+    declares slots, otherwise _COMPACT or _OBSERVABLE.
+    """
+    if cls._observable:
+        return _OBSERVABLE
+    if cls._compact:
+        return _COMPACT
+    if any(name not in ("__dict__", "__weakref__") for klass in cls.__mro__ for name in klass.__dict__.get("__slots__", ())):
+        return _SLOTTED
+    return _PLAIN
+
+
+def _copy(node: Tree, share_properties: bool) -> Tree:
+    """
+    A copy of a node without children.
+    """
+    cls = node.__class__
+    copy = cls.__new__(cls)
+    if _kind(cls) == _PLAIN:
+        state = copy.__dict__
+        state.update(node.__dict__)
+        state["_children"] = defaultdict(list)
+        if not share_properties:
+            state["properties"] = dict(state["properties"])
+        return copy
+    properties = node._props if cls._compact else node.properties
+    if properties is not None and not share_properties and not cls._observable:
+        properties = dict(properties)  # observable nodes copy them into a TrackedDict anyway
+    copy._init_storage(None, properties)
+    object.__setattr__(copy, "label", node.label)
+    for name, value in _instance_attributes(node).items():
+        object.__setattr__(copy, name, value)
+    return copy
+
+
+def _attach(copy: Tree, kind: int, groups: dict[str, list]) -> None:
+    """
+    Set the children of a node created by `_copy()`, without reporting changes.
+    """
+    if kind <= _SLOTTED:
+        copy._children.update(groups)
+    elif kind == _COMPACT:
+        copy._kids = defaultdict(list, groups)
+    else:
+        tracked = copy._writable_children()
+        for group, children in groups.items():
+            dict.__setitem__(tracked, group, TrackedList(copy, children, group))
@@ -1,3 +1,6 @@
+from .cache import RenderCache
+
+
 class HTMLLayout:
     """
     A mixin class for Tree that adds a __str__ method that will render a node and its children as an svg.
@@ -8,7 +11,11 @@ class HTMLLayout:
       properties    a dict
     """
 
+    __slots__ = ()
+    _compact_slots = ("_iinclude_properties",)  # instance attributes, see compact mode in Tree
+
     _include_properties = False
+    _render_cache: RenderCache | None = None  # see gentry.cache
 
     def __init__(
         self,
@@ -18,7 +25,7 @@ class HTMLLayout:
 
 
     def __str__(self) -> str:
-        html = self._box()
+        html = self._box({})
         prolog = '''<html>
         <head><title>Tree</title></head>
         <style>
@@ -40,7 +47,25 @@ class HTMLLayout:
         </html>"""
         return f"{prolog}{html}{epilog}"
     
-    def _box(self):
+    def _box(self, rendered: dict | None = None):
+        # rendered maps id(node) -> html for the nodes rendered so far, so a subtree that occurs more than once
+        # (see gentry.structure.dedupe()) is rendered only once
+        if rendered is not None:
+            html = rendered.get(id(self))
+            if html is not None:
+                return html
+        html = self._render(rendered)
+        if rendered is not None:
+            rendered[id(self)] = html
+        return html
+
+    def _render(self, rendered: dict | None):
+        cache = self._render_cache
+        if cache is not None and not self.is_leaf():
+            html = cache.get(self, ("html", self.__class__))
+            if html is not None:
+                return html
+
         node_name = self.label
 
         include_properties = self._include_properties  # class var
@@ -62,7 +87,10 @@ class HTMLLayout:
                 childitems = []
                 for child in children:
                     if child is not None:
-                        childitems.append(child._box())
+                        childitems.append(child._box(rendered))
                 groups[group] = "".join(childitems)
             groupdivs = "".join(f'<div class="group">\n<div class="groupname">{group}</div>\n<div class="groupitems">{html}</div>\n</div>\n' for group,html in groups.items())
-            return f'<div class="column">\n<div class="parent"><div class="nodename">{node_name}</div>{props}</div>\n<div class="children">{groupdivs}</div>\n</div>'
+            html = f'<div class="column">\n<div class="parent"><div class="nodename">{node_name}</div>{props}</div>\n<div class="children">{groupdivs}</div>\n</div>'
+            if cache is not None:
+                cache.put(self, ("html", self.__class__), html)
+            return html
@@ -0,0 +1,270 @@
+"""
+Secondary indexes on a tree.
+
+A `TreeIndex` is built in one pass over a tree and answers questions like "all Child nodes",
+"the nodes labeled X" or "the nodes where properties['kind'] == 'loop'" without walking the tree:
+
+    index = TreeIndex(root, properties=("kind",))
+    loops = index.by_property("kind", "loop")
+    children = index.by_class(Child)
+
+For trees of observable classes (see Tree) the index can be kept up to date: with `incremental=True`
+every query first catches up with changes made since the previous query, which only looks at the
+nodes whose generation changed (the changed nodes and their ancestors). Without it, call `rebuild()`
+after modifying the tree.
+"""
+
+from collections.abc import Hashable, Iterable
+
+from .tree import Tree, _child_nodes
+
+_MISSING = object()
+
+
+class TreeIndex:
+    """
+    Lookups by node class, label and selected property keys for the tree rooted at a node.
+
+    Queries return lists of nodes in the order in which they were indexed (parents before
+    children for nodes indexed in the same pass). Property values that are not hashable are not indexed.
+    """
+
+    def __init__(self, root: Tree, properties: Iterable[str] = (), incremental: bool = False) -> None:
+        """
+        Initialize a TreeIndex and index all nodes of the tree.
+
+        Args:
+            root (Tree): The root of the tree to index.
+            properties (Iterable[str]): The property keys to index.
+            incremental (bool): If True, keep the index up to date when the tree changes.
+
+        Raises:
+            ValueError: If incremental is True but the root is not observable.
+        """
+        if incremental and not root._observable:
+            raise ValueError(f"{root.__class__.__name__} is not observable, an incremental index needs observable nodes")
+        self.root = root
+        self.keys = tuple(properties)
+        self.incremental = incremental
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Index the whole tree again.
+        """
+        self._classes: dict[type, dict[Tree, None]] = {}
+        self._labels: dict[Hashable, dict[Tree, None]] = {}
+        self._properties: dict[str, dict[Hashable, dict[Tree, None]]] = {key: {} for key in self.keys}
+        self._class_queries: dict[tuple, list[type]] = {}  # (cls, subclasses) -> matching indexed classes
+        self._memo: dict[int, tuple] = {}  # id(node) -> (node, generation, label, values, children)
+        self._count = 0
+        if self.incremental:
+            self._update()
+            return
+        # the same as calling _add() for every node, inlined because this is the bulk of the build time
+        classes, labels, properties = self._classes, self._labels, self._properties
+        keys = self.keys
+        count = 0
+        for node, _, _ in self.root.iter_preorder():
+            cls = node.__class__
+            members = classes.get(cls)
+            if members is None:
+                members = classes[cls] = {}
+            members[node] = None
+            try:
+                members = labels.get(node.label)
+                if members is None:
+                    labels[node.label] = {node: None}
+                else:
+                    members[node] = None
+            except TypeError:  # not hashable
+                pass
+            if keys:
+                values = node._props if node._compact else node.properties
+                if values:
+                    for key in keys:
+                        value = values.get(key, _MISSING)
+                        if value is not _MISSING:
+                            try:
+                                members = properties[key].get(value)
+                                if members is None:
+                                    properties[key][value] = {node: None}
+                                else:
+                                    members[node] = None
+                            except TypeError:
+                                pass
+            count += 1
+        self._count = count
+
+    def __len__(self) -> int:
+        """
+        The number of indexed nodes.
+        """
+        self._refresh()
+        return self._count
+
+    def by_class(self, cls: type | str, subclasses: bool = True) -> list[Tree]:
+        """
+        Return the nodes of a class.
+
+        Args:
+            cls (type|str): The class, or the name of a class.
+            subclasses (bool): If True, nodes of subclasses are included, i.e. a node matches if
+                the class (or a class with the given name) is in the method resolution order of its class.
+
+        Returns:
+            list[Tree]: The matching nodes.
+        """
+        self._refresh()
+        key = (cls, subclasses)
+        classes = self._class_queries.get(key)
+        if classes is None:
+            classes = self._class_queries[key] = [
+                klass for klass in self._classes if _class_matches(klass, cls, subclasses)
+            ]
+        if len(classes) == 1:
+            return list(self._classes[classes[0]])
+        return [node for klass in classes for node in self._classes[klass]]
+
+    def by_label(self, label: Hashable) -> list[Tree]:
+        """
+        Return the nodes with a label.
+
+        Args:
+            label (Hashable): The label.
+
+        Returns:
+            list[Tree]: The matching nodes.
+        """
+        self._refresh()
+        return list(self._labels.get(label, ()))
+
+    def by_property(self, key: str, value: Hashable) -> list[Tree]:
+        """
+        Return the nodes for which properties[key] == value.
+
+        Args:
+            key (str): The property key, it must be one of the indexed keys.
+            value (Hashable): The value.
+
+        Returns:
+            list[Tree]: The matching nodes.
+
+        Raises:
+            KeyError: If the key is not indexed.
+        """
+        self._refresh()
+        try:
+            values = self._properties[key]
+        except KeyError:
+            raise KeyError(f"property {key} is not indexed") from None
+        try:
+            return list(values.get(value, ()))
+        except TypeError:  # not hashable, so not indexed
+            return []
+
+    def _values(self, node: Tree) -> tuple:
+        """
+        The values of the indexed property keys of a node, without allocating properties for compact nodes.
+        """
+        if not self.keys:
+            return ()
+        properties = node._props if node._compact else node.properties
+        if not properties:
+            return (_MISSING,) * len(self.keys)
+        return tuple(properties.get(key, _MISSING) for key in self.keys)
+
+    def _add(self, node: Tree, values: tuple) -> None:
+        cls = node.__class__
+        members = self._classes.get(cls)
+        if members is None:
+            members = self._classes[cls] = {}
+            self._class_queries.clear()
+        members[node] = None
+        _insert(self._labels, node.label, node)
+        for key, value in zip(self.keys, values):
+            if value is not _MISSING:
+                _insert(self._properties[key], value, node)
+        self._count += 1
+
+    def _remove(self, node: Tree, label, values: tuple) -> None:
+        del self._classes[node.__class__][node]
+        _discard(self._labels, label, node)
+        for key, value in zip(self.keys, values):
+            if value is not _MISSING:
+                _discard(self._properties[key], value, node)
+        self._count -= 1
+
+    def _refresh(self) -> None:
+        if self.incremental:
+            entry = self._memo.get(id(self.root))
+            if entry is None or entry[1] != self.root._version:
+                self._update()
+
+    def _update(self) -> None:
+        """
+        Catch up with the changes in the tree.
+
+        Nodes whose generation did not change are skipped together with their subtree. For a changed
+        node, its label and property values are indexed again, and former children that no longer
+        occur anywhere in the changed part of the tree are removed from the index with their subtree.
+        """
+        memo = self._memo
+        alive = {id(self.root)}
+        removed = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            entry = memo.get(id(node))
+            if entry is not None and entry[1] == node._version:  # the memo keeps nodes alive, so ids are unique
+                continue
+            values = self._values(node)
+            children = tuple(_child_nodes(node))
+            if entry is not None:
+                if entry[2] != node.label or entry[3] != values:
+                    self._remove(node, entry[2], entry[3])
+                    self._add(node, values)
+                removed.extend(entry[4])
+            else:
+                self._add(node, values)
+            memo[id(node)] = (node, node._version, node.label, values, children)
+            alive.update(map(id, children))
+            stack.extend(children)
+        while removed:  # former children that were not moved elsewhere
+            node = removed.pop()
+            if id(node) in alive:
+                continue
+            entry = memo.pop(id(node), None)
+            if entry is not None:
+                self._remove(node, entry[2], entry[3])
+                removed.extend(entry[4])
+
+
+def _insert(index: dict, value, node: Tree) -> None:
+    try:
+        members = index.get(value)
+    except TypeError:  # not hashable
+        return
+    if members is None:
+        index[value] = {node: None}
+    else:
+        members[node] = None
+
+
+def _discard(index: dict, value, node: Tree) -> None:
+    try:
+        members = index.get(value)
+    except TypeError:
+        return
+    if members is not None:
+        members.pop(node, None)
+        if not members:
+            del index[value]
+
+
+def _class_matches(klass: type, cls: type | str, subclasses: bool) -> bool:
+    if isinstance(cls, str):
+        if subclasses:
+            return any(base.__name__ == cls for base in klass.__mro__)
+        return klass.__name__ == cls
+    return issubclass(klass, cls) if subclasses else klass is cls
@@ -0,0 +1,410 @@
+"""
+Streaming JSON export and import of trees.
+
+Every node is a JSON object with its class name, its label, its properties (if it has any) and a
+key for each group, whose value is an array of child nodes (or null for a None child):
+
+    {"class": "Mother", "label": "Anna", "properties": {"age": 42}, "girls": [{"class": "Child", "label": "Eve"}]}
+
+`dump()` writes a tree to a text stream in chunks while it walks the tree, without building the
+document in memory first. `load()` reads a stream in chunks and builds the nodes while it parses:
+a node is created as soon as its closing brace is read, so the state of the parser is a frame per
+open node and group, plus a buffer of one chunk of text. Both work without recursion.
+
+Labels and property values are written and read by the `json` module, so they are limited to what
+JSON can represent (tuples become lists, for example), and other instance attributes like the shape
+of a Mermaid node are not exported. `schema()` returns a JSON Schema for the documents, derived from
+the groups that the classes declare in `_groups` (or through `list[Tree]` annotations of __init__()).
+"""
+
+import codecs
+import io
+import json
+import re
+from collections.abc import Iterable, Mapping
+from typing import IO
+
+from .arena import _properties
+from .serialize import _plain, _registry
+from .tree import Tree, _TreeBase
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# punctuation, or a string without escapes or null that is followed by a delimiter
+_TOKEN = re.compile(r'[ \t\n\r]*(?:([{}\[\],:])|"([^"\\\x00-\x1f]*)"(?=[ \t\n\r]*[,:}\]])|null(?=[ \t\n\r]*[,}\]]))')
+_MEMBER = re.compile(
+    r'[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:[ \t\n\r]*'
+    r'(?:(?:"([^"\\\x00-\x1f]*)"|null)[ \t\n\r]*([,}])|(\[))'
+)
+_KEYS = frozenset(("class", "label", "properties"))
+_VALUES = {"class": 2, "label": 3}  # keys with a value that _MEMBER matches, and their place in a parser frame
+_ENCODER = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")  # the rest of the buffer could still be part of a number
+
+_DECODER = json.JSONDecoder()
+_CHUNK = 1 << 16
+
+_NODE, _GROUP = 0, 1  # the kinds of parser frames
+
+
+def dump(root: Tree, stream: IO[str], chunk: int = _CHUNK) -> None:
+    """
+    Write a tree as JSON to a text stream, in pieces of about `chunk` characters.
+
+    Args:
+        root (Tree): The root of the tree.
+        stream (IO[str]): A stream opened for writing text.
+        chunk (int): Optional. The number of characters that are collected before they are written.
+
+    Raises:
+        TypeError: If a label or property value can't be represented in JSON.
+    """
+    encode = _ENCODER.encode
+    heads: dict[type, str] = {}
+    out: list[str] = []
+    size = 0
+    stack = [root]
+    pop = stack.pop
+    while stack:
+        item = pop()
+        if type(item) is str:
+            out.append(item)
+            size += len(item)
+        elif item is None:
+            out.append("null")
+            size += 4
+        else:
+            cls = item.__class__
+            head = heads.get(cls)
+            if head is None:
+                head = heads[cls] = '{"class":' + encode(cls.__name__) + ',"label":'
+            text = head + encode(item.label)
+            properties = _properties(item)
+            if properties:
+                text += ',"properties":' + encode(properties)
+            out.append(text)
+            size += len(text)
+            tokens = []
+            for group, children in item._children.items():  # empty groups too, they are rendered
+                tokens.append("," + encode(group) + ":[")
+                for index, child in enumerate(children):
+                    if index:
+                        tokens.append(",")
+                    tokens.append(child)
+                tokens.append("]")
+            tokens.append("}")
+            tokens.reverse()
+            stack.extend(tokens)
+        if size >= chunk:
+            stream.write("".join(out))
+            out.clear()
+            size = 0
+    stream.write("".join(out))
+
+
+def dumps(root: Tree) -> str:
+    """
+    Return a tree as a JSON string, see `dump()`.
+    """
+    stream = io.StringIO()
+    dump(root, stream)
+    return stream.getvalue()
+
+
+def load(
+    stream: IO[str] | IO[bytes],
+    classes: Iterable[type] | Mapping[str, type] | None = None,
+    strict: bool = False,
+) -> Tree:
+    """
+    Build a tree from a JSON document, read from a stream in chunks.
+
+    Nodes are created without calling the __init__() of their class itself (which might need
+    arguments), the __init__() of Tree and of any mixins is called instead, like `Arena.to_tree()` does.
+    The keys of a node may be in any order.
+
+    Args:
+        stream (IO[str]|IO[bytes]): A stream opened for reading, binary streams are decoded as UTF-8.
+        classes (Iterable[type]|Mapping[str, type]|None): Optional. The Tree subclasses that may be created,
+            found by their `__name__`, or a mapping from the names in the document to classes. By default
+            all Tree subclasses that are currently defined (a name that more than one of them has can't be used).
+        strict (bool): Optional. If True, only the groups declared in the `_groups` of a class are accepted.
+
+    Returns:
+        Tree: The root of the new tree.
+
+    Raises:
+        ValueError: If the document is not valid JSON, does not describe a tree, refers to a class that is not
+            available or (if strict) uses a group that the class does not declare.
+    """
+    names = _names(classes)
+    reader = _Reader(stream)
+    token = reader.token
+    member = _MEMBER.match
+    resolved_names: dict[str, tuple[type, bool]] = {}  # the class of a name and whether it is _plain()
+    resolve = resolved_names.get
+    init = _TreeBase.__init__
+    setattr = object.__setattr__
+    if token() != "{":
+        raise reader.error("expected a node")
+    # kind, expect a separator (None right after a comma), class, label, properties, groups
+    stack = [[_NODE, False, None, None, None, {}]]
+    root = None
+    while stack:
+        frame = stack[-1]
+        if frame[0] == _GROUP:  # kind, expect a separator, children, group name
+            c = token()
+            if frame[1]:
+                frame[1] = False
+                if c == "]":
+                    stack.pop()
+                    stack[-1][5][frame[3]] = frame[2]
+                elif c != ",":
+                    raise reader.error("expected , or ]")
+            elif c == "{":
+                frame[1] = True
+                stack.append([_NODE, False, None, None, None, {}])
+            elif c == "n":
+                frame[1] = True
+                frame[2].append(None)
+            elif c == "]" and not frame[2]:
+                stack.pop()
+                stack[-1][5][frame[3]] = frame[2]
+            else:
+                raise reader.error("expected a node")
+            continue
+
+        c = None
+        if not frame[1]:
+            # the common case in one step: a key with a string or null and the separator after it, or a group
+            match = member(reader.buffer, reader.pos)
+            if match is not None:
+                key, string, c, bracket = match.group(1, 2, 3, 4)
+                if bracket is None and key in _VALUES:
+                    reader.pos = match.end()
+                    frame[_VALUES[key]] = string
+                    frame[1] = True
+                elif bracket is not None and key not in _KEYS:
+                    reader.pos = match.end()
+                    frame[1] = True
+                    stack.append([_GROUP, False, [], key])
+                    continue
+                else:
+                    c = None  # an error or a label that is a list, take the long way
+        if c is None:
+            c = token()
+
+        if frame[1]:
+            if c == ",":
+                frame[1] = None
+                continue
+            if c != "}":
+                raise reader.error("expected , or }")
+        elif c == '"':
+            key = reader.string
+            if token() != ":":
+                raise reader.error("expected :")
+            frame[1] = True
+            if key == "class":
+                frame[2] = reader.value()
+                if not isinstance(frame[2], str):
+                    raise reader.error("class must be a string")
+            elif key == "label":
+                frame[3] = reader.value()
+            elif key == "properties":
+                frame[4] = reader.value()
+                if not isinstance(frame[4], dict):
+                    raise reader.error("properties must be an object")
+            elif token() == "[":
+                stack.append([_GROUP, False, [], key])
+            else:
+                raise reader.error(f"group {key} must be an array")
+            continue
+        elif c != "}" or frame[1] is not False:  # only an empty object may end here
+            raise reader.error("expected a key")
+
+        stack.pop()
+        _, _, name, label, properties, groups = frame
+        resolved = resolve(name)
+        if resolved is None:
+            resolved = resolved_names[name] = _resolve(name, names, reader)
+        cls, simple = resolved
+        if strict:
+            for group in groups:
+                if group not in cls._groups:
+                    raise reader.error(f"{name} has no group {group}")
+        node = cls.__new__(cls)
+        if simple:
+            node._init_storage(groups or None, properties)
+            setattr(node, "label", label)
+        else:
+            init(node, label, groups or None, properties)
+        if stack:
+            stack[-1][2].append(node)
+        else:
+            root = node
+    if token():
+        raise reader.error("extra data after the tree")
+    return root
+
+
+def loads(
+    text: str | bytes,
+    classes: Iterable[type] | Mapping[str, type] | None = None,
+    strict: bool = False,
+) -> Tree:
+    """
+    Build a tree from a JSON string, see `load()`.
+    """
+    return load(io.BytesIO(text) if isinstance(text, bytes) else io.StringIO(text), classes, strict)
+
+
+def schema(classes: Iterable[type]) -> dict:
+    """
+    Return a JSON Schema (draft 2020-12) for the documents that `dump()` writes for trees of the given classes.
+
+    A node of a class may have the groups it declares in `_groups`, which is also what `load()`
+    accepts with `strict=True`. Children can be nodes of any of the classes.
+
+    Args:
+        classes (Iterable[type]): The Tree subclasses.
+
+    Returns:
+        dict: The schema.
+    """
+    node = {"anyOf": [{"$ref": "#/$defs/node"}, {"type": "null"}]}
+    definitions = {}
+    for cls in classes:
+        properties = {
+            "class": {"const": cls.__name__},
+            "label": {},
+            "properties": {"type": "object"},
+        }
+        for group in sorted(cls._groups):
+            properties[group] = {"type": "array", "items": node}
+        definitions[cls.__name__] = {
+            "type": "object",
+            "properties": properties,
+            "required": ["class"],
+            "additionalProperties": False,
+        }
+    definitions["node"] = {"oneOf": [{"$ref": f"#/$defs/{name}"} for name in definitions]}
+    return {
+        "$schema": "https://json-schema.org/draft/2020-12/schema",
+        "$ref": "#/$defs/node",
+        "$defs": definitions,
+    }
+
+
+class _Reader:
+    """
+    A buffer over a stream that holds the text that was read but not parsed yet, at most one chunk
+    plus the part of a label or property value that did not fit in the previous one.
+    """
+
+    def __init__(self, stream: IO[str] | IO[bytes]) -> None:
+        self.stream = stream
+        self.decoder = None
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0  # the position of the buffer in the document, for error messages
+        self.eof = False
+        self.string = None  # the last string returned by token()
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk, dropping the text before the current position. Returns False at the end.
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(_CHUNK)
+        if isinstance(chunk, bytes):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = self.decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def token(self) -> str:
+        """
+        Consume the next token and return its first character: a punctuation character, '"' for a string
+        (which is stored in `string`) or "n" for null. Anything else is not consumed, "" is returned at the end.
+        """
+        while True:
+            buffer = self.buffer
+            match = _TOKEN.match(buffer, self.pos)
+            if match is not None:  # a token that is followed by a delimiter, so it is complete
+                self.pos = match.end()
+                punctuation, string = match.group(1, 2)
+                if punctuation:
+                    return punctuation
+                if string is not None:
+                    self.string = string
+                    return '"'
+                return "n"
+            pos = self.pos = _WHITESPACE.match(buffer, self.pos).end()
+            if pos == len(buffer):
+                if self.fill():
+                    continue
+                return ""
+            c = buffer[pos]
+            if c == '"':  # with escapes, or it might continue in the next chunk
+                self.string = self.value()
+            elif c == "n" and self.value() is not None:
+                raise self.error("expected null")
+            return c
+
+    def value(self):
+        """
+        Parse the JSON value at the next non-whitespace character.
+        """
+        match = _TOKEN.match(self.buffer, self.pos)
+        if match is not None and match.group(1) is None:  # a simple string or null
+            self.pos = match.end()
+            return match.group(2)
+        self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.fill():
+                    continue  # the value might continue in the next chunk
+                raise self.error(e.msg) from None
+            if type(value) in (int, float) and _NUMBER_TAIL.fullmatch(self.buffer, end) and self.fill():
+                continue  # the number might continue in the next chunk, like 1 from 1.25 cut after 1.
+            self.pos = end
+            return value
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f"{message} at position {self.offset + self.pos}")
+
+
+def _names(classes: Iterable[type] | Mapping[str, type] | None) -> Mapping[str, type | None]:
+    """
+    Map class names to classes, None for names that more than one class has.
+    """
+    if isinstance(classes, Mapping):
+        return classes
+    if classes is None:
+        classes = [cls for cls in _registry(None).values() if issubclass(cls, _TreeBase)]
+    names: dict[str, type | None] = {}
+    for cls in classes:
+        names[cls.__name__] = None if names.get(cls.__name__, cls) is not cls else cls
+    return names
+
+
+def _resolve(name: str | None, names: Mapping[str, type | None], reader: _Reader) -> tuple[type, bool]:
+    """
+    Return the class for a name in a document and whether it is _plain().
+    """
+    if name is None:
+        raise reader.error("a node without a class")
+    cls = names.get(name)
+    if cls is None:
+        reason = "is ambiguous" if name in names else "is not available"
+        raise reader.error(f"class {name} {reason}")
+    return cls, _plain(cls)
@@ -0,0 +1,524 @@
+"""
+Read-only tree files that are memory-mapped and loaded lazily.
+
+`write()` stores a tree in a file that consists of fixed-width columns, so any node can be found
+without reading the nodes before it:
+
+    write(root, "tree.gmap")
+    with MappedTree("tree.gmap") as tree:
+        print(tree.root.left[0].label)
+
+A `MappedTree` maps the file into memory with `mmap` and reads nothing up front but the header and the
+class table. Its `root` and `node()` return the same kind of read-only proxies as an `Arena` (instances
+of a subclass of the original class), which are created only when they are reached, and only the
+pages of the file that are touched are read by the operating system. `label_bytes()` returns the
+UTF-8 bytes of a label as a memoryview into the file, without copying them. `to_tree()` converts a
+subtree into regular Tree objects.
+
+Nodes are numbered level by level (breadth first), the root is node 0. The file starts with a header
+(magic, version, byte order, number of nodes and the offset and length of every section), followed by
+these sections, each aligned to 8 bytes and stored in the byte order of the machine that wrote it:
+
+    string offsets  Q   the start of every string in the string data, plus the end
+    string data     B   labels, group names and class names as UTF-8, and the strings of values
+    classes         I   the class table, as string indices of "module.qualname" names
+    klass           I   per node, the index of its class
+    label           i   per node, the string index of its label, -1 for None
+    edge offsets    Q   per node, the index of its first edge, plus the number of edges
+    edge groups     I   per edge, the string index of the group name
+    edge children   I   per edge, the index of the child node
+    blob offsets    Q   per node, the start of its properties and attributes in the blob data, plus the end
+    blob data       B   properties and other instance attributes, tagged like `gentry.serialize` values, and
+                        for nodes with empty groups the string indices of the names of all their groups
+
+Children that are None are not stored, as in an Arena, and labels have to be strings or None.
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from itertools import accumulate
+from typing import BinaryIO
+
+from .arena import (
+    _TREE_ATTRIBUTES,
+    _instance_attributes,
+    _instance_fields,
+    _proxy_class,
+)
+from .serialize import (
+    _Encoder,
+    _name,
+    _plain,
+    _read_value,
+    _registry,
+    _unvarints,
+    _varints,
+)
+from .tree import Tree, _TreeBase
+
+MAGIC = b"GNTM"
+VERSION = 1
+
+_SECTIONS = (
+    ("string offsets", "Q"),
+    ("string data", "B"),
+    ("classes", "I"),
+    ("klass", "I"),
+    ("label", "i"),
+    ("edge offsets", "Q"),
+    ("edge groups", "I"),
+    ("edge children", "I"),
+    ("blob offsets", "Q"),
+    ("blob data", "B"),
+)
+_HEADER = struct.Struct("<4sBBxxQ" + "QQ" * len(_SECTIONS))
+_ORDER = {"little": 0, "big": 1}
+_CHUNK = 1 << 18  # nodes in memory before the columns are written to their temporary files
+
+
+def write(root: Tree, file: "str | os.PathLike | BinaryIO") -> int:
+    """
+    Write a tree to a file that can be opened with `MappedTree`.
+
+    The tree is walked level by level without recursion, and the columns are kept in temporary
+    files while it is walked, so trees (or DAGs with shared subtrees, see `gentry.structure.dedupe()`,
+    which are stored once for every place they occur in) can be written that are larger than memory
+    would allow to load again.
+
+    Args:
+        root (Tree): The root of the tree.
+        file (str|os.PathLike|BinaryIO): A path or a file opened for writing in binary mode.
+
+    Returns:
+        int: The number of nodes written.
+
+    Raises:
+        TypeError: If a label is not a string or None, or a property or attribute has a type that can't be stored.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "wb") as f:
+            return write(root, f)
+
+    encoder = _Encoder()
+    strings = encoder.strings
+    string = encoder.string
+    classes = encoder.classes
+    value = encoder.value
+    fields: dict[type, frozenset[str]] = {}
+    written = ("klass", "label", "edge offsets", "edge groups", "edge children", "blob offsets")
+    columns = {name: array(typecode) for name, typecode in _SECTIONS if name in written}
+    with ExitStack() as files:
+        spills = {name: files.enter_context(tempfile.TemporaryFile()) for name in written + ("blob data",)}
+        klasses = columns["klass"]
+        labels = columns["label"]
+        edge_offsets = columns["edge offsets"]
+        edge_groups = columns["edge groups"]
+        edge_children = columns["edge children"]
+        blob_offsets = columns["blob offsets"]
+        blob_data = spills["blob data"]
+        edge_offsets.append(0)
+        blob_offsets.append(0)
+        blob_size = 0
+        keys = (value, lambda name, out: out.append(string(name)))  # for properties and attributes
+        count = 1  # the number of nodes that were given an index
+        level = [root]
+        while level:
+            below = []
+            for node in level:
+                cls = node.__class__
+                code = classes.get(cls)
+                if code is None:
+                    code = encoder.klass(cls)
+                    fields[cls] = _instance_fields(cls)
+                klasses.append(code)
+                label = node.label
+                if label is None:
+                    labels.append(-1)
+                elif type(label) is str:
+                    index = strings.get(label)
+                    labels.append(string(label) if index is None else index)
+                else:
+                    raise TypeError(f"label {label!r} of {node!r} is not a string")
+                names = []
+                empty = False
+                for group, children in node._children.items():  # empty groups too, they are rendered
+                    index = strings.get(group)
+                    if index is None:
+                        index = string(group)
+                    names.append(index)
+                    empty = empty or not children
+                    for child in children:
+                        if child is not None:
+                            edge_groups.append(index)
+                            edge_children.append(count)
+                            count += 1
+                            below.append(child)
+                edge_offsets.append(count - 1)  # every node but the root is the child of one edge
+                props = node._props if cls._compact else node.properties
+                extra = None
+                if fields[cls] or not _TREE_ATTRIBUTES.issuperset(getattr(node, "__dict__", ())):
+                    extra = _instance_attributes(node)
+                if props or extra or empty:
+                    ints = []
+                    for mapping, key in zip((props or {}, extra or {}), keys):
+                        ints.append(len(mapping))
+                        for k, v in mapping.items():
+                            key(k, ints)
+                            value(v, ints)
+                    if empty:
+                        ints.append(len(names))
+                        ints.extend(names)
+                    data = _varints(ints)
+                    blob_data.write(data)
+                    blob_size += len(data)
+                blob_offsets.append(blob_size)
+                if len(klasses) >= _CHUNK:
+                    _spill(columns, spills)
+            level = below
+        _spill(columns, spills)
+
+        table = array("I", [string(_name(cls)) for cls in classes])  # may add to the string table
+        encoded = [s.encode("utf-8") for s in strings]
+        sections = {
+            "string offsets": array("Q", accumulate(map(len, encoded), initial=0)).tobytes(),
+            "string data": b"".join(encoded),
+            "classes": table.tobytes(),
+        }
+        lengths = [len(sections[name]) if name in sections else spills[name].tell() for name, _ in _SECTIONS]
+        layout = []
+        pos = _HEADER.size
+        for length in lengths:
+            pos += -pos % 8
+            layout += [pos, length]
+            pos += length
+        nodes = lengths[3] // klasses.itemsize
+        file.write(_HEADER.pack(MAGIC, VERSION, _ORDER[sys.byteorder], nodes, *layout))
+        pos = _HEADER.size
+        for (name, _), offset, length in zip(_SECTIONS, layout[::2], lengths):
+            file.write(bytes(offset - pos))
+            if name in sections:
+                file.write(sections[name])
+            else:
+                spill = spills[name]
+                spill.seek(0)
+                shutil.copyfileobj(spill, file, 1 << 20)
+            pos = offset + length
+        return nodes
+
+
+def _spill(columns: dict[str, array], spills: dict) -> None:
+    """
+    Append the columns that are written while walking the tree to their temporary files and empty them.
+    """
+    for name, spill in spills.items():
+        column = columns.get(name)
+        if column is not None:
+            column.tofile(spill)
+            del column[:]
+
+
+class _Strings:
+    """
+    The string table of a MappedTree, strings are decoded when they are indexed.
+    """
+
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        offsets = self.offsets
+        return str(self.data[offsets[index] : offsets[index + 1]], "utf-8")
+
+
+class _Blobs:
+    """
+    The properties (part 0), the other instance attributes (part 1) or the names of the groups of nodes
+    with empty groups (part 2) of the nodes of a MappedTree, decoded when they are asked for with `get()`,
+    like the dicts of an Arena.
+    """
+
+    __slots__ = ("tree", "part")
+
+    def __init__(self, tree: "MappedTree", part: int) -> None:
+        self.tree = tree
+        self.part = part
+
+    def get(self, index: int, default=None):
+        tree = self.tree
+        offsets = tree._blob_offsets
+        start, end = offsets[index], offsets[index + 1]
+        if start == end:
+            return default
+        ints = _unvarints(bytes(tree._blob_data[start:end]))
+        strings, classes = tree.strings, tree.classes
+        pos = 0
+        for part in range(min(self.part, 1) + 1):
+            mapping = {}
+            count = ints[pos]
+            pos += 1
+            for _ in range(count):
+                if part == 0:
+                    key, pos = _read_value(ints, pos, strings, classes)
+                else:
+                    key, pos = strings[ints[pos]], pos + 1
+                mapping[key], pos = _read_value(ints, pos, strings, classes)
+        if self.part < 2:
+            return mapping or default
+        if pos == len(ints):  # the node has no empty groups
+            return default
+        return [strings[index] for index in ints[pos + 1 : pos + 1 + ints[pos]]]
+
+
+class MappedTree:
+    """
+    A read-only tree in a file written by `write()`, mapped into memory and read lazily.
+
+    It offers the same read-only view as an `Arena`: `root` and `node()` return proxies that are
+    instances of (a subclass of) the original Tree classes, so group attributes, `label`, `properties`
+    and `is_leaf()` work as usual, and Visitor subclasses as well as the Mermaid and HTMLLayout mixins
+    can be used unchanged. The columns of the file are available as memoryviews (`klass` and `label`),
+    and `children()`, `groups_of()` and `iter_preorder()` work with node indices without creating proxies.
+
+    Close the MappedTree (or use it as a context manager) when done, proxies can't be used after that.
+    """
+
+    def __init__(self, path: "str | os.PathLike", classes: Iterable[type] | None = None) -> None:
+        """
+        Open a tree file.
+
+        Only the header and the class table are read.
+
+        Args:
+            path (str|os.PathLike): The path of the file.
+            classes (Iterable[type]|None): Optional. The Tree subclasses and Enum classes that may be
+                instantiated, found by module and qualified name. By default all classes that are
+                currently defined.
+
+        Raises:
+            ValueError: If the file is not a tree file, was written on a machine with a different byte order,
+                or refers to a class that is not available.
+        """
+        self._views: list[memoryview] = []
+        with ExitStack() as stack:
+            self._file = stack.enter_context(open(path, "rb"))
+            stack.callback(self.close)  # unless the file turns out to be valid
+            size = os.fstat(self._file.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"{path} is not a tree file")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+            magic, version, order, count, *layout = _HEADER.unpack_from(self._view)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a tree file")
+            if version != VERSION:
+                raise ValueError(f"unsupported format version {version}")
+            if order != _ORDER[sys.byteorder]:
+                raise ValueError(f"{path} was written on a machine with a different byte order")
+            columns = []
+            for (name, typecode), offset, length in zip(_SECTIONS, layout[::2], layout[1::2]):
+                if offset + length > size or length % array(typecode).itemsize:
+                    raise ValueError(f"the {name} section of {path} is corrupt")
+                view = self._view[offset : offset + length]
+                if typecode != "B":
+                    self._views.append(view)
+                    view = view.cast(typecode)
+                self._views.append(view)
+                columns.append(view)
+            (
+                string_offsets,
+                self._string_data,
+                table,
+                self.klass,
+                self.label,
+                self._edge_offsets,
+                self._edge_groups,
+                self._edge_children,
+                self._blob_offsets,
+                self._blob_data,
+            ) = columns
+            if not (len(self.klass) == len(self.label) == count == len(self._edge_offsets) - 1 == len(self._blob_offsets) - 1):
+                raise ValueError(f"the columns of {path} don't have the same length")
+            self.strings = _Strings(string_offsets, self._string_data)
+            available = _registry(classes)
+            self.classes: list[type] = []
+            for index in table:
+                name = self.strings[index]
+                cls = available.get(name)
+                if cls is None:
+                    raise ValueError(f"class {name} is not available")
+                self.classes.append(cls)
+            stack.pop_all()
+        self.properties = _Blobs(self, 0)
+        self.attributes = _Blobs(self, 1)
+        self._group_order = _Blobs(self, 2)
+
+    def close(self) -> None:
+        """
+        Unmap and close the file.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> "MappedTree":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.klass)
+
+    def _index(self) -> tuple[memoryview, memoryview]:
+        """
+        The offsets and children columns, the children of node i are children[offsets[i]:offsets[i + 1]].
+        """
+        return self._edge_offsets, self._edge_children
+
+    def children(self, index: int) -> list[int]:
+        """
+        Return the indices of the children of a node, in all groups.
+        """
+        offsets = self._edge_offsets
+        return self._edge_children[offsets[index] : offsets[index + 1]].tolist()
+
+    def groups_of(self, index: int) -> dict[str, list[int]]:
+        """
+        Return the indices of the children of a node grouped by group name, including empty groups.
+        """
+        offsets = self._edge_offsets
+        start, end = offsets[index], offsets[index + 1]
+        order = self._group_order.get(index)
+        result: dict[str, list[int]] = {} if order is None else {group: [] for group in order}
+        previous = None
+        for group, child in zip(self._edge_groups[start:end], self._edge_children[start:end]):
+            if group != previous:
+                members = result.setdefault(self.strings[group], [])
+                previous = group
+            members.append(child)
+        return result
+
+    def node(self, index: int) -> Tree:
+        """
+        Return a read-only proxy for a node.
+
+        Raises:
+            IndexError: If there is no such node.
+        """
+        if not 0 <= index < len(self.klass):
+            raise IndexError(f"node {index} does not exist")
+        proxy = object.__new__(_proxy_class(self.classes[self.klass[index]]))
+        object.__setattr__(proxy, "_arena", self)
+        object.__setattr__(proxy, "_ref", index)
+        return proxy
+
+    @property
+    def root(self) -> Tree:
+        """
+        A proxy for the root of the tree.
+        """
+        return self.node(0)
+
+    def label_bytes(self, node: "Tree | int") -> memoryview | None:
+        """
+        The label of a node as UTF-8 bytes, a view into the mapped file that is not copied.
+
+        Args:
+            node (Tree|int): A proxy returned by this MappedTree, or the index of a node.
+
+        Returns:
+            memoryview|None: The bytes of the label, or None if the node has no label.
+        """
+        index = node if isinstance(node, int) else node._ref
+        label = self.label[index]
+        if label < 0:
+            return None
+        offsets = self.strings.offsets
+        return self._string_data[offsets[label] : offsets[label + 1]]
+
+    def iter_preorder(self, index: int = 0) -> Iterator[tuple[int, int]]:
+        """
+        Walk the subtree rooted at index without creating proxies, parents before children.
+
+        Yields:
+            tuple[int, int]: The index of a node and its depth relative to the start.
+        """
+        offsets, children = self._edge_offsets, self._edge_children
+        stack = [(index, 0)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            depth += 1
+            for i in range(offsets[node + 1] - 1, offsets[node] - 1, -1):
+                stack.append((children[i], depth))
+
+    def to_tree(self, index: int = 0) -> Tree:
+        """
+        Convert the subtree rooted at index into regular Tree objects.
+
+        Nodes are created without calling the __init__() of their class itself (which might need
+        arguments), the __init__() of Tree and of any mixins is called instead.
+
+        Args:
+            index (int): The index of the root of the subtree.
+
+        Returns:
+            Tree: The new root node.
+        """
+        plain: dict[type, bool] = {}
+        root = self._materialize(index, plain)
+        stack = [(index, root)]
+        while stack:
+            i, node = stack.pop()
+            groups = self.groups_of(i)
+            if not groups:
+                continue
+            kids = node._writable_children()
+            for group, members in groups.items():
+                children = [self._materialize(child, plain) for child in members]
+                kids[group] = children
+                stack.extend(zip(members, children))
+        return root
+
+    def _materialize(self, index: int, plain: dict[type, bool]) -> Tree:
+        cls = self.classes[self.klass[index]]
+        node = cls.__new__(cls)
+        label = self.label[index]
+        label = None if label < 0 else self.strings[label]
+        offsets = self._blob_offsets
+        properties = extra = None
+        if offsets[index] != offsets[index + 1]:
+            properties = self.properties.get(index)
+            extra = self.attributes.get(index)
+        simple = plain.get(cls)
+        if simple is None:
+            simple = plain[cls] = _plain(cls)
+        if simple:
+            node._init_storage(None, properties)
+            object.__setattr__(node, "label", label)
+        else:
+            _TreeBase.__init__(node, label, properties=properties)
+        if extra:
+            for name, value in extra.items():  # after __init__(), mixins would reset them
+                object.__setattr__(node, name, value)
+        return node
@@ -1,4 +1,8 @@
 from enum import StrEnum, auto
+from io import StringIO
+from typing import TextIO
+
+from .cache import RenderCache
 
 
 class Shape(StrEnum):
@@ -34,6 +38,30 @@ class Style(StrEnum):
     subgraph_odd = auto()
 
 
+class MermaidContext:
+    """
+    The state of a single Mermaid rendering.
+
+    Nodes and subgraphs in the output get ids that are numbered with a counter. Keeping that
+    counter in a context that is created for each rendering (instead of in a class variable)
+    makes the output for a given tree the same each time it is rendered, and allows rendering
+    many trees concurrently from different threads.
+
+    A context can be passed explicitly to continue numbering where a previous rendering left off.
+    """
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int = 0) -> None:
+        """
+        Initialize a MermaidContext.
+
+        Args:
+            index (int): The number to start counting at.
+        """
+        self.index = index
+
+
 class Mermaid:
     """
     A mixin class for Tree that adds a __str__ method that will render a node and its children as markdown with mermaid.
@@ -44,9 +72,13 @@ class Mermaid:
       properties    a dict
     """
 
+    __slots__ = ()
+    _compact_slots = ("_ishape", "_istyle", "_iinclude_properties")  # instance attributes, see compact mode in Tree
+
     _style = Style.none
     _shape = Shape.rounded
     _include_properties = False
+    _render_cache: RenderCache | None = None  # see gentry.cache
 
     def __init__(
         self,
@@ -83,8 +115,6 @@ class Mermaid:
             return f"\\\\{name}"
         return name
 
-    _index: int = 0
-
     styles: dict[Style, str] = {
         Style.none: "",
         Style.keyword: "fill:#dFd",
@@ -97,132 +127,195 @@ class Mermaid:
         Style.subgraph_odd: "fill:#eee",
     }
 
-    def __str__(self, parent_index=0) -> str:
+    @classmethod
+    def _mermaid_node(cls, node) -> str:
         """
-        Render the node and its children as a Mermaid markdown graph.
+        Render the style, shape and label of a node, i.e. everything after its id.
 
         Args:
-            parent_index (int): The index of the parent node, used for indentation and unique node IDs.
-
-            this is used internally when recursing into the tree.
+            node (Tree): The node to render.
 
         Returns:
-            str: The Mermaid markdown representation of the tree rooted at this node.
+            str: The Mermaid markdown for the node.
         """
-
-        # calculate the left hand part (or parent)
         # we are very conservative with what a label can be, even though it is supposed to be a string
-        node_name = self.__class__.__name__
-        if hasattr(self, "label") and self.label is not None:
-            name = str(self.label)
+        if hasattr(node, "label") and node.label is not None:
+            name = str(node.label)
         else:
-            name = node_name
+            name = node.__class__.__name__
 
         sep = ",\\n"  # for f-strings prior to python 3.13 we need to take the backslash out of the string
         nl = "\\n"
-        include_properties = self._include_properties  # class var
+        include_properties = node._include_properties  # class var
         if (
-            self._iinclude_properties is not None
+            node._iinclude_properties is not None
         ):  # override if instance variable is not None
-            include_properties = self._iinclude_properties
+            include_properties = node._iinclude_properties
         if include_properties:  # neither None or False
-            props = [f"{k}={v}" for k, v in self.properties.items()]
+            props = [f"{k}={v}" for k, v in node.properties.items()]
             props = f"{nl}({sep.join(props)})"
         else:
             props = ""
 
         name = f"{name}{props}"
 
-        indent = "    " * (parent_index + 1)
-        pstyle = self._style
-        if self._istyle is not None:
-            pstyle = self._istyle
+        pstyle = node._style
+        if node._istyle is not None:
+            pstyle = node._istyle
         if pstyle is None or pstyle is Style.none:
             style = ""
         else:
             style = f":::{pstyle}"
 
-        pshape = self._shape
-        if self._ishape is not None:
-            pshape = self._ishape
+        pshape = node._shape
+        if node._ishape is not None:
+            pshape = node._ishape
         if pshape is None or pshape is Shape.none:
             pshape = Shape.rounded
 
-        # calculate the right hand parts (or children)
-        cs = []
+        return f'{style}@{{shape: {pshape}, label: "{cls._mermaid_safe(name)}"}}'
 
-        subgraphstyle = Style.subgraph_even if parent_index % 2 else Style.subgraph_odd
+    def write_mermaid(
+        self,
+        stream: TextIO,
+        parent_index: int = 0,
+        context: MermaidContext | None = None,
+        cache: RenderCache | None = None,
+    ) -> None:
+        """
+        Write the node and its children as a Mermaid markdown graph to a text stream.
 
-        if self.is_leaf() and parent_index == 0:
-            p = f'{node_name}{parent_index}{style}@{{shape: {pshape}, label: "{self._mermaid_safe(name)}"}}'
+        The graph is written incrementally in a single pass over the tree that uses an
+        explicit stack instead of recursion, so neither the depth of the tree nor the size
+        of the output is limited by available memory. The output is identical to `str(node)`.
 
-            cs.append(p)
-        else:
-            p = f'{node_name}{parent_index}{style}@{{shape: {pshape}, label: "{self._mermaid_safe(name)}"}}'
-            for group, children in self._children.items():
-                groupid = f"subgraph{Mermaid._index}"
-                Mermaid._index += 1
-                groupstart = f"subgraph {groupid}[{group}]"
+        If a render cache is used, the output of every observable subtree is stored in it and
+        reused as long as the subtree does not change. The graph is then assembled in memory
+        and written to the stream at the end.
+
+        Args:
+            stream (TextIO): Any object with a write() method that accepts a str.
+            parent_index (int): The index of the parent node, used for indentation and unique node IDs.
+                A value other than 0 renders the node as part of an enclosing graph, without the markdown prolog.
+            context (MermaidContext | None): Optional. The context with the counter used to number
+                nodes and subgraphs, by default a new context that starts at 0.
+            cache (RenderCache | None): Optional. The render cache to use, by default the one in
+                the `_render_cache` class variable (if any).
+        """
+        write = stream.write
+        if context is None:
+            context = MermaidContext()
+        if cache is None:
+            cache = self._render_cache
+        index = context.index
 
-                cs.append(
-                    f"{indent}{groupid}:::{subgraphstyle}\n{indent}{p} --> {groupid}\n{indent}{groupstart}\n{indent}        direction TB\n"
-                )
+        if parent_index == 0:
+            styles = "\n\t".join(
+                f"classDef {style} {definition}"
+                for style, definition in self.styles.items()
+                if style != "none"
+            )
+            write(f"```mermaid\ngraph TD\n\t{styles}\n\n")
 
-                for i, child in enumerate(children):
+        if self.is_leaf() and parent_index == 0:
+            write(f"{self.__class__.__name__}{parent_index}{self._mermaid_node(self)}")
+        else:
+            if cache is not None:
+                parts = []
+                emit = parts.append
+            else:
+                emit = write
+            # each frame is [indent, node id and shape, style of its subgraphs, groups, children in current group]
+            # followed by [node, position in parts, cache key] for frames whose output is cached
+            stack = []
+            pending = self  # a node with children that should be pushed onto the stack
+            separator = ""  # all lines but the first one are preceded by a newline
+            while pending is not None or stack:
+                if pending is not None:
+                    level = parent_index + len(stack)
+                    frame = self._mermaid_frame(pending, level)
+                    if cache is not None and pending._observable:
+                        key = ("mermaid", self.__class__, level, index, separator)
+                        hit = cache.get(pending, key)
+                        if hit is not None:
+                            text, index = hit
+                            emit(text)
+                            separator = "\n"
+                        else:
+                            frame += (pending, len(parts), key)
+                            stack.append(frame)
+                    else:
+                        stack.append(frame)
+                    pending = None
+                    continue
+                frame = stack[-1]
+                indent, p, subgraphstyle, groups, children = frame[:5]
+                if children is None:  # start the next group, if any
+                    for group, children in groups:
+                        groupid = f"subgraph{index}"
+                        index += 1
+                        emit(
+                            f"{separator}{indent}{groupid}:::{subgraphstyle}\n{indent}{p} --> {groupid}\n"
+                            f"{indent}subgraph {groupid}[{group}]\n{indent}        direction TB\n"
+                        )
+                        separator = "\n"
+                        frame[4] = iter(children)
+                        break
+                    else:
+                        stack.pop()
+                        if len(frame) > 5:  # store the output of the subtree
+                            node, start, key = frame[5:]
+                            text = "".join(parts[start:])
+                            parts[start:] = [text]
+                            cache.put(node, key, (text, index))
+                    continue
+                for child in children:
                     if child is None:
                         continue
-                    Mermaid._index += 1
-
-                    node_name = child.__class__.__name__
-                    if hasattr(child, "label") and child.label is not None:
-                        childname = str(child.label)
-                    else:
-                        childname = node_name
-
-                    include_properties = child._include_properties  # class var
-                    if (
-                        child._iinclude_properties is not None
-                    ):  # override if instance variable is not None
-                        include_properties = child._iinclude_properties
-                    if include_properties:  # neither None or False
-                        props = [f"{k}={v}" for k, v in child.properties.items()]
-                        props = f"{nl}({sep.join(props)})"
+                    index += 1
+                    if child.is_leaf():
+                        emit(
+                            f"{separator}{indent}{child.__class__.__name__}{index}{self._mermaid_node(child)}"
+                        )
+                        separator = "\n"
                     else:
-                        props = ""
+                        pending = child
+                        break
+                else:  # the group is done
+                    emit(f"{separator}{indent}end")
+                    frame[4] = None
+            if cache is not None:
+                write("".join(parts))
+        context.index = index
 
-                    childname = f"{childname}{props}"
-
-                    cstyle = child._style
-                    if child._istyle is not None:
-                        cstyle = child._istyle
-                    if cstyle is None or cstyle is Style.none:
-                        childstyle = ""
-                    else:
-                        childstyle = f":::{cstyle}"
+        if parent_index == 0:
+            write("\n```")
 
-                    cshape = child._shape
-                    if child._ishape is not None:
-                        cshape = child._ishape
-                    if cshape is None or cshape is Shape.none:
-                        cshape = Shape.rounded
+    @classmethod
+    def _mermaid_frame(cls, node, parent_index: int) -> list:
+        """
+        Create the stack frame used by write_mermaid() for a node with children.
+        """
+        return [
+            "    " * (parent_index + 1),
+            f"{node.__class__.__name__}{parent_index}{cls._mermaid_node(node)}",
+            Style.subgraph_even if parent_index % 2 else Style.subgraph_odd,
+            iter(node._children.items()),
+            None,
+        ]
 
-                    if child.is_leaf():
-                        c = f'{indent}{child.__class__.__name__}{self._index}{childstyle}@{{shape: {cshape}, label: "{self._mermaid_safe(childname)}"}}'
-                        cs.append(c)
-                    else:
-                        cs.append(child.__str__(parent_index=parent_index + 1))
+    def __str__(self, parent_index=0) -> str:
+        """
+        Render the node and its children as a Mermaid markdown graph.
 
-                cs.append(f"{indent}end")
+        Args:
+            parent_index (int): The index of the parent node, used for indentation and unique node IDs.
 
-        prolog = ""
-        epilog = ""
-        styles = "\n\t".join(
-            f"classDef {style} {definition}"
-            for style, definition in self.styles.items()
-            if style != "none"
-        )
-        if parent_index == 0:
-            prolog = f"```mermaid\ngraph TD\n\t{styles}\n\n"
-            epilog = "\n```"
+            this is used internally when recursing into the tree.
 
-        return prolog + ("\n".join(cs)) + epilog
+        Returns:
+            str: The Mermaid markdown representation of the tree rooted at this node.
+        """
+        stream = StringIO()
+        self.write_mermaid(stream, parent_index)
+        return stream.getvalue()
@@ -0,0 +1,254 @@
+"""
+Visiting a tree with several processes or threads.
+
+`visit_parallel()` splits a tree into independent subtrees, visits those in a
+`concurrent.futures.ProcessPoolExecutor` and then visits the remaining nodes at the top
+of the tree in the calling process, with the usual dispatch of visitor methods. The result
+is the same as that of `visitor.visit()`:
+
+    result = visit_parallel(MyVisitor(root), max_workers=8)
+
+Subtrees are sent to the worker processes in batches and are pickled as a whole, so the
+classes of the nodes and the visitor must be importable (defined at module level), and
+the visitor methods should only depend on the node they are called for. Any attributes
+of the visitor are copied to the workers, changes made to them there are lost.
+
+`visit_threaded()` does the same with a pool of threads, which avoids pickling altogether.
+Threads run Python code in parallel on free-threaded (no-GIL) builds of CPython only, on other
+builds the result is the same but there is no speedup. The visitor methods are called
+concurrently, so they should not modify shared state (like attributes of the visitor)
+without a lock.
+"""
+
+import copy
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .tree import Tree, Visitor, _child_nodes, _visit_nested
+
+MAX_TASK_HEIGHT = 64
+"""Subtrees that are higher than this are split further, pickle recurses once per level."""
+
+TASKS_PER_WORKER = 4
+"""The number of subtrees per worker to aim for, more tasks balance the load better."""
+
+
+def visit_parallel(
+    visitor: Visitor,
+    max_workers: int | None = None,
+    min_size: int = 50_000,
+    executor: Executor | None = None,
+):
+    """
+    Visit the tree of a visitor using a pool of processes.
+
+    Trees with fewer than min_size nodes are visited sequentially, because starting
+    processes and pickling subtrees costs more than it gains for those.
+
+    Args:
+        visitor (Visitor): The visitor, its `root` is the tree to visit.
+        max_workers (int|None): The number of processes, by default the number of CPUs. Required with
+            an executor, where it is the number of workers of that executor to split the work for.
+        min_size (int): The minimum number of nodes for a parallel visit.
+        executor (Executor|None): Optional. An existing executor to use (it is not shut down),
+            by default a new ProcessPoolExecutor is created for this visit.
+
+    Returns:
+        dict: The same nested result as `visitor.visit()`, it is stored in `visitor.result` as well.
+
+    Raises:
+        TypeError: If the visitor class overrides `_visit()` (like a Reducer), its results can't be combined.
+        ValueError: If an executor is given without max_workers.
+    """
+    if type(visitor)._visit is not Visitor._visit:
+        raise TypeError(f"{type(visitor).__name__} does not produce Visitor results")
+    root = visitor.root
+    if max_workers is None:
+        if executor is not None:
+            raise ValueError("max_workers is required when an executor is given")
+        max_workers = os.cpu_count() or 1
+    info = _subtree_info(root)
+    size = info[id(root)][0]
+    if size < min_size or max_workers < 2:
+        return visitor.visit()
+
+    target = max(size // (max_workers * TASKS_PER_WORKER), 1)
+    batches = _batches(_partition(root, info, target), info, target)
+    worker = copy.copy(visitor)
+    worker.root = worker.result = None  # don't ship the whole tree with every batch
+
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers)
+    try:
+        futures = [executor.submit(_visit_batch, worker, batch) for batch in batches]
+        known = {}
+        for batch, future in zip(batches, futures):
+            for node, result in zip(batch, future.result()):
+                known[id(node)] = result
+    finally:
+        if own:
+            executor.shutdown()
+    visitor.result = _combine(visitor, root, known)
+    return visitor.result
+
+
+def visit_threaded(
+    visitor: Visitor,
+    max_workers: int | None = None,
+    min_size: int = 10_000,
+    executor: Executor | None = None,
+):
+    """
+    Visit the tree of a visitor using a pool of threads.
+
+    The tree is split into independent subtrees in the same way as for `visit_parallel()`.
+    Each worker thread gets its own deque of subtrees and, when it runs out, steals subtrees
+    from the other workers, so a few large subtrees do not leave the other threads idle.
+    The nodes at the top of the tree are visited in the calling thread afterwards.
+
+    Trees with fewer than min_size nodes are visited sequentially.
+
+    Args:
+        visitor (Visitor): The visitor, its `root` is the tree to visit.
+        max_workers (int|None): The number of threads, by default the number of CPUs. Required with
+            an executor, where it is the number of workers of that executor to split the work for.
+        min_size (int): The minimum number of nodes for a parallel visit.
+        executor (Executor|None): Optional. An existing ThreadPoolExecutor to use (it is not shut down),
+            by default a new one is created for this visit.
+
+    Returns:
+        dict: The same nested result as `visitor.visit()`, it is stored in `visitor.result` as well.
+
+    Raises:
+        TypeError: If the visitor class overrides `_visit()` (like a Reducer), its results can't be combined.
+        ValueError: If an executor is given without max_workers.
+    """
+    if type(visitor)._visit is not Visitor._visit:
+        raise TypeError(f"{type(visitor).__name__} does not produce Visitor results")
+    root = visitor.root
+    if max_workers is None:
+        if executor is not None:
+            raise ValueError("max_workers is required when an executor is given")
+        max_workers = os.cpu_count() or 1
+    info = _subtree_info(root)
+    size = info[id(root)][0]
+    if size < min_size or max_workers < 2:
+        return visitor.visit()
+
+    target = max(size // (max_workers * TASKS_PER_WORKER), 1)
+    tasks = _partition(root, info, target, max_height=None)
+    tasks.sort(key=lambda node: info[id(node)][0], reverse=True)
+    deques = [deque() for _ in range(max_workers)]
+    for i, node in enumerate(tasks):  # workers pop their largest subtree first, thieves take the smallest
+        deques[i % max_workers].appendleft(node)
+
+    known = {}  # id(node) -> result, every worker writes the results of different nodes
+    own = executor is None
+    if own:
+        executor = ThreadPoolExecutor(max_workers)
+    try:
+        workers = [
+            executor.submit(_steal_and_visit, visitor, deques, index, known) for index in range(max_workers)
+        ]
+        for worker in workers:
+            worker.result()
+    finally:
+        if own:
+            executor.shutdown()
+    visitor.result = _combine(visitor, root, known)
+    return visitor.result
+
+
+def _steal_and_visit(visitor: Visitor, deques: list[deque], index: int, known: dict) -> None:
+    """
+    The loop of a worker thread: visit subtrees from its own deque, then steal from the others.
+
+    All subtrees are distributed before the workers start, so a worker is done when all deques are empty.
+    """
+    own = deques[index]
+    others = deques[index + 1 :] + deques[:index]
+    visit = visitor._visit
+    while True:
+        try:
+            node = own.pop()
+        except IndexError:
+            for other in others:
+                try:
+                    node = other.popleft()  # steal from the other end
+                    break
+                except IndexError:
+                    continue
+            else:
+                return
+        known[id(node)] = visit(node)
+
+
+def _subtree_info(root: Tree) -> dict[int, tuple[int, int]]:
+    """
+    The size and height of the subtree rooted at each node, keyed by id(node).
+    """
+    info = {}
+    for node, _, _ in root.iter_postorder():
+        size, height = 1, 0
+        for child in _child_nodes(node):
+            childsize, childheight = info[id(child)]
+            size += childsize
+            if childheight > height:
+                height = childheight
+        info[id(node)] = (size, height + 1)
+    return info
+
+
+def _partition(root: Tree, info: dict, target: int, max_height: int | None = MAX_TASK_HEIGHT) -> list[Tree]:
+    """
+    Find the largest subtrees with at most target nodes that are not higher than max_height (if not None).
+
+    All nodes that are not in one of these subtrees will be visited by the calling process.
+    """
+    tasks = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        size, height = info[id(node)]
+        if size <= target and (max_height is None or height <= max_height):
+            tasks.append(node)
+        else:
+            stack.extend(_child_nodes(node))
+    return tasks
+
+
+def _batches(tasks: list[Tree], info: dict, target: int) -> list[list[Tree]]:
+    """
+    Group the subtrees into batches of about target nodes, so small subtrees don't need a task each.
+    """
+    batches = []
+    batch = []
+    total = 0
+    for node in tasks:
+        batch.append(node)
+        total += info[id(node)][0]
+        if total >= target:
+            batches.append(batch)
+            batch = []
+            total = 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _visit_batch(visitor: Visitor, subtrees: list[Tree]) -> list[dict]:
+    """
+    Visit a batch of subtrees, this runs in a worker process.
+    """
+    return [visitor._visit(subtree) for subtree in subtrees]
+
+
+def _combine(visitor: Visitor, root: Tree, known: dict[int, dict]) -> dict:
+    """
+    Visit the nodes at the top of the tree, using the known results of the subtrees below them.
+
+    This is the same traversal as `Visitor._visit()`, it does not descend into nodes with a known result.
+    """
+    return _visit_nested(root, visitor._get_visitor, lambda child: known.get(id(child)))
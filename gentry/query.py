@@ -0,0 +1,370 @@
+"""
+Path queries over the groups of a tree.
+
+A path selects nodes by alternating group names and node tests, starting at the node the query
+is applied to, so
+
+    family.select("matriarch/*/children/Mother[label='Anna']/girls/*")
+
+yields the girls of the mothers labeled Anna among the children of the nodes in the matriarch group
+of family, like `family.matriarch[0].children[0].girls` would for a single path through the tree.
+
+The parts of a path are:
+
+  group       the name of a group, or * for all groups. A path that ends with a group selects all
+              nodes in that group.
+  test        * for any node, or a class name, which matches nodes of that class and of its subclasses
+              (the name is looked up along the MRO of the class of a node, like visitor methods are).
+              A test can be followed by any number of predicates in square brackets:
+                [2]               the node is at index 2 in its group (negative indices count from the end)
+                [label='Anna']    a comparison of the label
+                [@kind='loop']    a comparison of properties['kind'], false if the property is missing
+                [@kind]           the node has a property kind
+                [@'a key']        keys that are not identifiers are quoted
+              Comparisons are =, !=, <, <=, > and >=, values are quoted strings, numbers, True, False or None.
+  //test      instead of /group/test, selects the descendants at any depth that pass the test.
+
+Queries are compiled once and cached by `compile_query()`. A compiled `Query` does not refer to
+any tree, so it can be applied to many trees, and `select()` is a generator that only walks as much
+of the tree as is needed for the nodes that are consumed.
+"""
+
+import re
+from collections.abc import Callable, Iterable, Iterator
+from functools import lru_cache
+
+from .tree import Tree
+
+_TOKEN = re.compile(
+    r"""
+    (?P<descendants>//) | (?P<slash>/)
+    | (?P<name>\*|[A-Za-z_]\w*)
+    | \[\s*(?:
+        (?P<index>-?\d+)
+        | (?P<field>label|@(?:'[^']*'|"[^"]*"|[^\s\]=!<>'"]+))\s*(?:(?P<op>=|!=|<=|>=|<|>)\s*(?P<value>'[^']*'|"[^"]*"|[-+.\w]+))?
+      )\s*\]
+    """,
+    re.VERBOSE,
+)
+
+_OPERATORS: dict[str, Callable] = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+_CONSTANTS = {"True": True, "False": False, "None": None}
+
+_MISSING = object()
+
+Test = Callable[[Tree, int, int], bool]  # called with a node, its index in its group and the length of the group
+
+
+class Query:
+    """
+    A compiled path query, see the module documentation for the syntax.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Compile a path query.
+
+        Args:
+            path (str): The path.
+
+        Raises:
+            ValueError: If the path is not valid.
+        """
+        self.path = path
+        self._steps = _parse(path)
+
+    def __repr__(self) -> str:
+        return f"Query({self.path!r})"
+
+    def select(self, tree: Tree) -> Iterator[Tree]:
+        """
+        Lazily yield the nodes selected by the query, starting at a node.
+
+        Nodes are yielded in the order of the path, i.e. the nodes of the first group in the order
+        of their groups and indices before those of the next, and descendants in preorder. A node
+        is yielded only once, even if it is found along several paths.
+
+        Args:
+            tree (Tree): The node to start at.
+
+        Returns:
+            Iterator[Tree]: A generator over the selected nodes.
+        """
+        nodes: Iterable[Tree] = (tree,)
+        for step in self._steps:
+            nodes = step(nodes)
+        return iter(nodes)
+
+    def first(self, tree: Tree) -> Tree | None:
+        """
+        Return the first node selected by the query, without looking any further.
+
+        Args:
+            tree (Tree): The node to start at.
+
+        Returns:
+            Tree|None: The first selected node, or None if there is none.
+        """
+        return next(self.select(tree), None)
+
+
+@lru_cache(maxsize=256)
+def compile_query(path: str) -> Query:
+    """
+    Compile a path query, or return the cached compiled query for the same path.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        Query: The compiled query.
+
+    Raises:
+        ValueError: If the path is not valid.
+    """
+    return Query(path)
+
+
+def _parse(path: str) -> list[Callable[[Iterable[Tree]], Iterator[Tree]]]:
+    """
+    Convert a path into a list of steps, each step maps an iterable of nodes to an iterator over the next nodes.
+    """
+    tokens = []
+    position = 0
+    while position < len(path):
+        match = _TOKEN.match(path, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"invalid query {path!r} at position {position}")
+        tokens.append(match)
+        position = match.end()
+    if not tokens:
+        raise ValueError("empty query")
+
+    steps = []
+    descendant_steps = 0
+    i = 0
+    if tokens[0].group("slash"):
+        raise ValueError(f"invalid query {path!r}, a query can't start with a single /")
+    while i < len(tokens):
+        if tokens[i].group("descendants"):  # //test
+            test, _, i = _parse_test(path, tokens, i + 1, positional=False)
+            descendant_steps += 1
+            steps.append(_descendants_step(test, dedupe=descendant_steps > 1))
+        else:  # group[/test]
+            if tokens[i].group("name") is None:
+                raise ValueError(f"invalid query {path!r} at position {tokens[i].start()}, expected a group name")
+            group = tokens[i].group("name")
+            i += 1
+            test = position = None
+            if i < len(tokens) and tokens[i].group("slash"):
+                test, position, i = _parse_test(path, tokens, i + 1, positional=True)
+            steps.append(_children_step(None if group == "*" else group, test, position))
+        if i < len(tokens):
+            if not tokens[i].group("slash") and not tokens[i].group("descendants"):
+                raise ValueError(f"invalid query {path!r} at position {tokens[i].start()}, expected / or //")
+            if tokens[i].group("slash"):
+                i += 1
+                if i == len(tokens):
+                    raise ValueError(f"invalid query {path!r}, it ends with /")
+    return steps
+
+
+def _parse_test(path: str, tokens: list[re.Match], i: int, positional: bool) -> tuple[Test | None, int | None, int]:
+    """
+    Parse a node test with its predicates starting at token i.
+
+    If positional is True, the first index predicate is not part of the test but returned
+    separately, so the step can look up the child at that index directly.
+
+    Returns:
+        tuple: The test (None if any node passes), the index (or None) and the index of the next token.
+    """
+    if i >= len(tokens) or tokens[i].group("name") is None:
+        raise ValueError(f"invalid query {path!r}, expected a class name or *")
+    name = tokens[i].group("name")
+    i += 1
+    predicates = [] if name == "*" else [_class_test(name)]
+    position = None
+    while i < len(tokens) and (tokens[i].group("index") is not None or tokens[i].group("field") is not None):
+        if positional and position is None and tokens[i].group("index") is not None:
+            position = int(tokens[i].group("index"))
+        else:
+            predicates.append(_predicate(path, tokens[i]))
+        i += 1
+    if not predicates:
+        return None, position, i
+    if len(predicates) == 1:
+        return predicates[0], position, i
+
+    def test(node: Tree, index: int, length: int) -> bool:
+        for predicate in predicates:
+            if not predicate(node, index, length):
+                return False
+        return True
+
+    return test, position, i
+
+
+def _class_test(name: str) -> Test:
+    matches: dict[type, bool] = {}  # node class -> whether name is in its MRO
+
+    def test(node: Tree, index: int, length: int) -> bool:
+        cls = node.__class__
+        match = matches.get(cls)
+        if match is None:
+            match = matches[cls] = any(klass.__name__ == name for klass in cls.__mro__)
+        return match
+
+    return test
+
+
+def _predicate(path: str, token: re.Match) -> Test:
+    if token.group("index") is not None:
+        position = int(token.group("index"))
+        if position >= 0:
+            return lambda node, index, length: index == position
+        return lambda node, index, length: index == length + position
+
+    field = token.group("field")
+    op = token.group("op")
+    value = _literal(path, token.group("value")) if op else None
+    if field == "label":
+        if op is None:
+            return lambda node, index, length: node.label is not None
+        compare = _OPERATORS[op]
+        return lambda node, index, length: _safe(compare, node.label, value)
+
+    key = field[1:]
+    if key[0] in "'\"":
+        key = key[1:-1]
+    if op is None:
+        return lambda node, index, length: key in _properties(node)
+    compare = _OPERATORS[op]
+
+    def test(node: Tree, index: int, length: int) -> bool:
+        actual = _properties(node).get(key, _MISSING)
+        return actual is not _MISSING and _safe(compare, actual, value)
+
+    return test
+
+
+def _literal(path: str, text: str):
+    if text[0] in "'\"":
+        return text[1:-1]
+    if text in _CONSTANTS:
+        return _CONSTANTS[text]
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"invalid value {text} in query {path!r}, strings must be quoted") from None
+
+
+def _safe(compare: Callable, a, b) -> bool:
+    try:
+        return bool(compare(a, b))
+    except TypeError:  # like comparing a string with a number
+        return False
+
+
+def _properties(node: Tree):
+    """
+    The properties of a node, without allocating them for compact nodes.
+    """
+    if node._compact:
+        return node._props or {}
+    return node.properties
+
+
+def _children_step(
+    group: str | None, test: Test | None, position: int | None
+) -> Callable[[Iterable[Tree]], Iterator[Tree]]:
+    """
+    A step that yields the children in a group (or all groups if group is None) that pass the test,
+    and that are at the given index in their group if position is not None.
+    """
+
+    def step(nodes: Iterable[Tree]) -> Iterator[Tree]:
+        for node in nodes:
+            children = node._children
+            if group is None:
+                members_list = children.values()
+            else:
+                members = children.get(group)  # get() does not add missing groups to a defaultdict
+                if not members:
+                    continue
+                members_list = (members,)
+            for members in members_list:
+                if position is not None:
+                    length = len(members)
+                    index = position if position >= 0 else length + position
+                    if 0 <= index < length:
+                        child = members[index]
+                        if child is not None and (test is None or test(child, index, length)):
+                            yield child
+                elif test is None:
+                    for child in members:
+                        if child is not None:
+                            yield child
+                else:
+                    length = len(members)
+                    for index, child in enumerate(members):
+                        if child is not None and test(child, index, length):
+                            yield child
+
+    return step
+
+
+def _descendants_step(test: Test | None, dedupe: bool) -> Callable[[Iterable[Tree]], Iterator[Tree]]:
+    """
+    A step that yields the descendants at any depth (in preorder) that pass the test.
+
+    If an earlier step selected descendants as well, its nodes may be nested, so this step
+    remembers which nodes it walked already and yields every node only once.
+    """
+
+    def step(nodes: Iterable[Tree]) -> Iterator[Tree]:
+        walked = set() if dedupe else None
+        for node in nodes:
+            if walked is not None:
+                if id(node) in walked:  # its subtree was walked as part of an earlier subtree
+                    continue
+                walked.add(id(node))
+            stack = [_members(node)]
+            while stack:
+                for child, index, length in stack[-1]:
+                    if walked is not None:
+                        if id(child) in walked:
+                            continue
+                        walked.add(id(child))
+                    if test is None or test(child, index, length):
+                        yield child
+                    if child._children:  # don't create an iterator for leaves
+                        stack.append(_members(child))
+                    break
+                else:
+                    stack.pop()
+
+    return step
+
+
+def _members(node: Tree) -> Iterator[tuple[Tree, int, int]]:
+    """
+    The children of a node in all its groups, with their index in the group and the length of the group.
+    """
+    for members in node._children.values():
+        length = len(members)
+        for index, child in enumerate(members):
+            if child is not None:
+                yield child, index, length
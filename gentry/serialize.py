@@ -0,0 +1,588 @@
+"""
+A compact binary format for trees.
+
+    data = dumps(root)
+    copy = loads(data)
+
+`dump()` and `load()` do the same with a binary file. The format consists of a header and
+six sections, each preceded by its length in bytes:
+
+    header      b"GNTR" and a format version byte
+    strings     the string table: labels, group names, class names, attribute names and
+                string values, each stored once
+    classes     the class table: node classes and Enum classes of values, as indices of
+                "module.qualname" strings
+    nodes       the structure: for every node in preorder its class, its label and the
+                name and number of children of each group, a class of 0 is a
+                None child
+    properties  the properties of the nodes that have them, by node index
+    attributes  other instance attributes (like the shape of a Mermaid node), by node index
+    labels      the labels that are neither strings nor None, in node order
+
+All numbers are unsigned varints (7 bits per byte, the high bit set on all but the last byte).
+Property and attribute values and labels that are neither strings nor None are tagged with
+their type, supported are None, bool, int, float, str, bytes, Enum members, and lists,
+tuples, sets, frozensets and dicts of those.
+
+Loading only ever creates instances of classes that are defined (imported) when `load()` is called,
+it never imports modules or calls arbitrary functions, and both directions work without recursion,
+so trees of any depth can be stored. Shared subtrees (see `gentry.structure.dedupe()`) are stored
+once for every place they occur in.
+
+Creating millions of nodes keeps the cyclic garbage collector busy, which can double the time it takes.
+Pausing it (`gc.disable()` or `gc.freeze()`) is a setting of the whole process, so that is left to the
+application.
+"""
+
+import struct
+from collections.abc import Iterable
+from enum import Enum
+from typing import BinaryIO
+
+from .arena import _TREE_ATTRIBUTES, _instance_attributes, _instance_fields, _proxy_classes
+from .tree import Tree, _TreeBase
+
+MAGIC = b"GNTR"
+VERSION = 1
+
+# value tags
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _BYTES, _ENUM, _LIST, _TUPLE, _SET, _FROZENSET, _DICT = range(13)
+_CONTAINERS = {list: _LIST, tuple: _TUPLE, set: _SET, frozenset: _FROZENSET}
+_BUILD = {_LIST: list, _TUPLE: tuple, _SET: set, _FROZENSET: frozenset}
+_DOUBLE = struct.Struct("<d")
+_QWORD = struct.Struct("<Q")
+
+
+def dumps(root: Tree) -> bytes:
+    """
+    Serialize a tree.
+
+    Args:
+        root (Tree): The root of the tree.
+
+    Returns:
+        bytes: The serialized tree.
+
+    Raises:
+        TypeError: If a label, property or attribute has a type that can't be stored.
+    """
+    return _Encoder().encode(root)
+
+
+def dump(root: Tree, file: BinaryIO) -> None:
+    """
+    Serialize a tree to a binary file.
+
+    Args:
+        root (Tree): The root of the tree.
+        file (BinaryIO): A file opened for writing in binary mode.
+
+    Raises:
+        TypeError: If a label, property or attribute has a type that can't be stored.
+    """
+    file.write(dumps(root))
+
+
+def loads(data: bytes, classes: Iterable[type] | None = None) -> Tree:
+    """
+    Rebuild a tree that was serialized with `dumps()`.
+
+    Nodes are created without calling the __init__() of their class itself (which might need
+    arguments), the __init__() of Tree and of any mixins is called instead, like `Arena.to_tree()` does.
+
+    Args:
+        data (bytes): The serialized tree.
+        classes (Iterable[type]|None): Optional. The Tree subclasses and Enum classes that may be
+            instantiated, found by module and qualified name. By default all classes that are
+            currently defined.
+
+    Returns:
+        Tree: The root of the new tree.
+
+    Raises:
+        ValueError: If the data is not a serialized tree or refers to a class that is not available.
+    """
+    try:
+        return _Decoder(data, classes).decode()
+    except (IndexError, UnicodeDecodeError, struct.error) as e:
+        raise ValueError("the data is truncated or corrupt") from e
+
+
+def load(file: BinaryIO, classes: Iterable[type] | None = None) -> Tree:
+    """
+    Rebuild a tree from a binary file written by `dump()`.
+
+    Args:
+        file (BinaryIO): A file opened for reading in binary mode.
+        classes (Iterable[type]|None): Optional. The classes that may be instantiated, see `loads()`.
+
+    Returns:
+        Tree: The root of the new tree.
+
+    Raises:
+        ValueError: If the file does not contain a serialized tree or refers to a class that is not available.
+    """
+    return loads(file.read(), classes)
+
+
+def _name(cls: type) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class _Encoder:
+    """
+    The state of a single `dumps()`: the string and class tables and the sections as lists of numbers.
+    """
+
+    def __init__(self) -> None:
+        self.strings: dict[str, int] = {}
+        self.classes: dict[type, int] = {}
+        self.fields: dict[type, frozenset[str]] = {}  # the instance fields of the node classes
+        self.nodes: list[int] = []
+        self.properties: list[int] = []
+        self.attributes: list[int] = []
+        self.values: list[int] = []  # labels that are not strings, in node order
+
+    def string(self, value: str) -> int:
+        strings = self.strings
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    def klass(self, cls: type) -> int:
+        index = self.classes.get(cls)
+        if index is None:
+            index = self.classes[cls] = len(self.classes)
+        return index
+
+    def encode(self, root: Tree) -> bytes:
+        out = self.nodes
+        emit = out.append
+        strings = self.strings
+        classes = self.classes
+        string = self.string
+        fields = self.fields
+        properties = []  # (node index, properties)
+        attributes = []  # (node index, attributes)
+        index = 0
+        stack = [root]
+        pop = stack.pop
+        push = stack.extend
+        while stack:
+            node = pop()
+            if node is None:
+                emit(0)
+                continue
+            cls = node.__class__
+            code = classes.get(cls)
+            if code is None:
+                code = self.klass(cls)
+                self.fields[cls] = _instance_fields(cls)
+            label = node.label
+            if label is None:
+                labelcode = 0
+            elif type(label) is str:
+                labelcode = strings.get(label)
+                if labelcode is None:
+                    labelcode = string(label)
+                labelcode += 2
+            else:
+                labelcode = 1
+                self.value(label, self.values)
+            groups = list(node._children.items())  # empty groups too, they are rendered
+            emit(code + 1)
+            emit(labelcode)
+            emit(len(groups))
+            for group, children in groups:
+                code = strings.get(group)
+                emit(string(group) if code is None else code)
+                emit(len(children))
+            for _, children in reversed(groups):
+                push(reversed(children))
+            props = node._props if cls._compact else node.properties  # don't allocate properties of compact nodes
+            if props:
+                properties.append((index, props))
+            if fields[cls] or not _TREE_ATTRIBUTES.issuperset(getattr(node, "__dict__", ())):
+                extra = _instance_attributes(node)
+                if extra:
+                    attributes.append((index, extra))
+            index += 1
+
+        self.mapping(properties, self.properties, self.value)
+        self.mapping(attributes, self.attributes, lambda name, out: out.append(string(name)))
+        table = [self.string(_name(cls)) for cls in classes]  # may add to the string table
+        text = "".join(strings)
+        sections = [
+            _varints([len(strings)] + [len(s) for s in strings]) + text.encode("utf-8"),
+            _varints([len(table)] + table),
+            _varints(self.nodes),
+            _varints(self.properties),
+            _varints(self.attributes),
+            _varints(self.values),
+        ]
+        result = bytearray(MAGIC)
+        result.append(VERSION)
+        for section in sections:
+            result += _varints([len(section)])
+            result += section
+        return bytes(result)
+
+    def mapping(self, items: list[tuple[int, dict]], out: list[int], key) -> None:
+        """
+        Encode the dicts of some of the nodes: their number, and for each the distance to the previous
+        node index, the number of items and the keys and values.
+        """
+        emit = out.append
+        value = self.value
+        emit(len(items))
+        previous = 0
+        for index, mapping in items:
+            emit(index - previous)
+            previous = index
+            emit(len(mapping))
+            for k, v in mapping.items():
+                key(k, out)
+                value(v, out)
+
+    def value(self, value, out: list[int]) -> None:
+        """
+        Encode a tagged value, containers are encoded with an explicit stack instead of recursion.
+        """
+        emit = out.append
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            kind = type(value)
+            if value is None:
+                emit(_NONE)
+            elif kind is bool:
+                emit(_TRUE if value else _FALSE)
+            elif kind is str:
+                emit(_STR)
+                emit(self.string(value))
+            elif isinstance(value, Enum):
+                emit(_ENUM)
+                emit(self.klass(kind))
+                emit(self.string(value.name))
+            elif isinstance(value, int):
+                emit(_INT)
+                emit(value << 1 if value >= 0 else (-value << 1) - 1)  # zigzag
+            elif isinstance(value, float):
+                emit(_FLOAT)
+                emit(_QWORD.unpack(_DOUBLE.pack(value))[0])
+            elif isinstance(value, str):
+                emit(_STR)
+                emit(self.string(str(value)))
+            elif isinstance(value, (bytes, bytearray)):
+                emit(_BYTES)
+                emit(len(value))
+                out.extend(value)
+            elif isinstance(value, dict):
+                emit(_DICT)
+                emit(len(value))
+                items = [item for pair in value.items() for item in pair]
+                items.reverse()
+                stack.extend(items)
+            else:
+                for base, tag in _CONTAINERS.items():
+                    if isinstance(value, base):
+                        break
+                else:
+                    raise TypeError(f"values of type {kind.__name__} can't be serialized")
+                emit(tag)
+                emit(len(value))
+                stack.extend(reversed(list(value)))
+
+
+class _Decoder:
+    """
+    The state of a single `loads()`.
+    """
+
+    def __init__(self, data: bytes, classes: Iterable[type] | None) -> None:
+        if data[:4] != MAGIC:
+            raise ValueError("the data is not a serialized tree")
+        if data[4] != VERSION:
+            raise ValueError(f"unsupported format version {data[4]}")
+        self.sections = []
+        pos = 5
+        for _ in range(6):
+            length, pos = _varint(data, pos)
+            self.sections.append(data[pos : pos + length])
+            pos += length
+            if pos > len(data):
+                raise IndexError(pos)
+        self.available = _registry(classes)
+
+    def decode(self) -> Tree:
+        strings_section, classes_section, nodes, properties, attributes, values = self.sections
+        self.strings = strings = self.read_strings(strings_section)
+        names = _unvarints(classes_section)
+        classes = []
+        for index in names[1:]:
+            name = strings[index]
+            cls = self.available.get(name)
+            if cls is None:
+                raise ValueError(f"class {name} is not available")
+            classes.append(cls)
+        self.classes = classes
+        plain = [_plain(cls) if issubclass(cls, _TreeBase) else None for cls in classes]
+        properties = self.mapping(_unvarints(properties), self.value)
+        attributes = self.mapping(_unvarints(attributes), lambda ints, pos: (strings[ints[pos]], pos + 1))
+        labels = _unvarints(values)
+        labelpos = 0
+
+        ints = _unvarints(nodes)
+        pos = 0
+        init = _TreeBase.__init__
+        setattr = object.__setattr__
+        getprops = properties.get
+        observed = []  # (node, groups) of observable nodes, their groups are set when they are complete
+        holder = []
+        stack = [[holder, 1]]  # lists of children that are being filled, and the number of children still to come
+        index = 0
+        while stack:
+            frame = stack[-1]
+            if not frame[1]:
+                stack.pop()
+                continue
+            frame[1] -= 1
+            code = ints[pos]
+            if not code:
+                pos += 1
+                frame[0].append(None)
+                continue
+            cls = classes[code - 1]
+            simple = plain[code - 1]
+            if simple is None:
+                raise ValueError(f"{cls.__name__} is not a Tree class")
+            labelcode = ints[pos + 1]
+            if labelcode > 1:
+                label = strings[labelcode - 2]
+            elif labelcode:
+                label, labelpos = self.value(labels, labelpos)
+            else:
+                label = None
+            ngroups = ints[pos + 2]
+            pos += 3
+            node = cls.__new__(cls)
+            props = getprops(index)
+            if ngroups:
+                groups = {}
+                frames = []
+                for _ in range(ngroups):
+                    children = groups[strings[ints[pos]]] = []
+                    frames.append([children, ints[pos + 1]])
+                    pos += 2
+                if cls._observable:
+                    init(node, label, None, props)
+                    observed.append((node, groups))
+                elif simple:
+                    node._init_storage(groups, props)  # the lists are filled below
+                    setattr(node, "label", label)
+                else:
+                    init(node, label, groups, props)
+                frames.reverse()
+                stack.extend(frames)
+            elif simple:
+                node._init_storage(None, props)
+                setattr(node, "label", label)
+            else:
+                init(node, label, None, props)
+            extra = attributes.get(index)
+            if extra:
+                for name, value in extra.items():
+                    setattr(node, name, value)
+            frame[0].append(node)
+            index += 1
+
+        for node, groups in reversed(observed):  # children before parents, so the changes don't propagate up
+            kids = node._writable_children()
+            for group, children in groups.items():
+                kids[group] = children
+        return holder[0]
+
+    @staticmethod
+    def read_strings(section: bytes) -> list[str]:
+        ints, pos = [], 0
+        count, pos = _varint(section, pos)
+        for _ in range(count):
+            length, pos = _varint(section, pos)
+            ints.append(length)
+        text = section[pos:].decode("utf-8")
+        strings = []
+        start = 0
+        for length in ints:
+            strings.append(text[start : start + length])
+            start += length
+        return strings
+
+    def mapping(self, ints: list[int], key) -> dict[int, dict]:
+        result = {}
+        value = self.value
+        index = 0
+        count, pos = ints[0], 1
+        for _ in range(count):
+            index += ints[pos]
+            length = ints[pos + 1]
+            pos += 2
+            mapping = {}
+            for _ in range(length):
+                k, pos = key(ints, pos)
+                mapping[k], pos = value(ints, pos)
+            result[index] = mapping
+        return result
+
+    def value(self, ints: list[int], pos: int) -> tuple[object, int]:
+        return _read_value(ints, pos, self.strings, self.classes)
+
+
+def _read_value(ints: list[int], pos: int, strings, classes: list[type]) -> tuple[object, int]:
+    """
+    Decode a tagged value, containers are filled from an explicit stack instead of recursion.
+
+    Args:
+        ints (list[int]): The decoded varints.
+        pos (int): The position of the value.
+        strings: The string table, anything that can be indexed.
+        classes (list[type]): The class table.
+
+    Returns:
+        tuple: The value and the position after it.
+    """
+    stack = []  # [tag, number of items still to come, items]
+    while True:
+        tag = ints[pos]
+        pos += 1
+        if tag == _STR:
+            value = strings[ints[pos]]
+            pos += 1
+        elif tag == _INT:
+            n = ints[pos]
+            value = -((n + 1) >> 1) if n & 1 else n >> 1
+            pos += 1
+        elif tag == _NONE:
+            value = None
+        elif tag == _FALSE or tag == _TRUE:
+            value = tag == _TRUE
+        elif tag == _FLOAT:
+            value = _DOUBLE.unpack(_QWORD.pack(ints[pos]))[0]
+            pos += 1
+        elif tag == _ENUM:
+            value = classes[ints[pos]][strings[ints[pos + 1]]]
+            pos += 2
+        elif tag == _BYTES:
+            n = ints[pos]
+            value = bytes(ints[pos + 1 : pos + 1 + n])
+            pos += 1 + n
+        elif tag in _BUILD or tag == _DICT:
+            n = ints[pos]
+            pos += 1
+            if tag == _DICT:
+                n *= 2
+            if n:
+                stack.append([tag, n, []])
+                continue
+            value = {} if tag == _DICT else _BUILD[tag]()
+        else:
+            raise ValueError(f"unknown value tag {tag}")
+        while stack:
+            frame = stack[-1]
+            frame[2].append(value)
+            frame[1] -= 1
+            if frame[1]:
+                break
+            stack.pop()
+            tag, _, items = frame
+            value = dict(zip(items[::2], items[1::2])) if tag == _DICT else _BUILD[tag](items)
+        else:
+            return value, pos
+
+
+def _plain(cls: type) -> bool:
+    """
+    True if initializing an instance only needs `_init_storage()` and setting the label, i.e. the class
+    is not observable and there are no mixins with an __init__() that `Tree.__init__()` would call.
+    """
+    if cls._observable:
+        return False
+    mro = cls.__mro__
+    return not any("__init__" in klass.__dict__ for klass in mro[mro.index(_TreeBase) + 1 : -1])
+
+
+def _varints(values: list[int]) -> bytes:
+    """
+    Encode non-negative numbers as varints.
+    """
+    if not values or max(values) < 128:
+        return bytes(values)  # one byte each, the common case for small trees and sections
+    small = _SMALL
+    return b"".join([small[value] if value < 16384 else _varint_bytes(value) for value in values])
+
+
+def _varint_bytes(value: int) -> bytes:
+    out = bytearray()
+    while value >= 128:
+        out.append(value & 127 | 128)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+_SMALL = [_varint_bytes(value) for value in range(16384)]
+
+
+def _unvarints(data: bytes) -> list[int]:
+    """
+    Decode a sequence of varints.
+    """
+    if data.isascii():
+        return list(data)  # no byte has the high bit set, so every byte is a number
+    result = []
+    append = result.append
+    value = shift = 0
+    for byte in data:
+        if byte < 128:
+            append(value | byte << shift)
+            value = shift = 0
+        else:
+            value |= (byte & 127) << shift
+            shift += 7
+    if shift:
+        raise IndexError("varint")
+    return result
+
+
+def _varint(data: bytes, pos: int) -> tuple[int, int]:
+    """
+    Decode a single varint.
+
+    Returns:
+        tuple[int, int]: The number and the position after it.
+    """
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 127) << shift
+        if byte < 128:
+            return value, pos
+        shift += 7
+
+
+def _registry(classes: Iterable[type] | None) -> dict[str, type]:
+    """
+    Map "module.qualname" to the classes that may be instantiated, by default all Tree subclasses
+    and Enum classes that are defined now (if a name occurs more than once, the class defined last wins).
+    """
+    if classes is None:
+        proxies = set(_proxy_classes.values())
+        classes = []
+        pending = [_TreeBase, Enum]
+        while pending:
+            cls = pending.pop(0)
+            if cls not in proxies:
+                classes.append(cls)
+                pending.extend(cls.__subclasses__())
+    return {_name(cls): cls for cls in classes}
@@ -0,0 +1,258 @@
+"""
+Structural hashing and sharing of identical subtrees.
+
+Two subtrees are structurally equal if their roots have the same class, label and properties, and
+the same groups in the same order (empty groups too, they are rendered), with structurally equal
+children (or None) at the same positions. Labels and property values must also have the same types,
+so 1, 1.0 and True are different. Other instance attributes (like the shape of a Mermaid node) are
+not compared.
+
+A `StructuralHasher` computes a hash for every node of a subtree in one bottom-up pass and caches
+it, so `equal()` can reject most pairs of subtrees by comparing two integers:
+
+    hasher = StructuralHasher()
+    if hasher.equal(a, b):
+        ...
+
+`dedupe()` turns a tree into a DAG in which structurally equal subtrees are one and the same object:
+
+    removed = dedupe(root)
+
+Visitors and reducers created with `shared=True` and the HTMLLayout mixin evaluate a subtree that
+occurs in several places only once.
+"""
+
+from .tree import Tree
+
+
+class StructuralHasher:
+    """
+    Computes and caches structural hashes of nodes.
+
+    The hash of an observable node is computed again when its generation changed. Nodes that are
+    not observable don't report changes, so call `clear()` after modifying them.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize a StructuralHasher with an empty cache.
+        """
+        self._memo: dict[int, tuple] = {}  # id(node) -> (node, generation or None, hash)
+
+    def __len__(self) -> int:
+        return len(self._memo)
+
+    def clear(self) -> None:
+        """
+        Forget all cached hashes.
+        """
+        self._memo.clear()
+
+    def _cached(self, node: Tree) -> int | None:
+        entry = self._memo.get(id(node))
+        if entry is not None and (entry[1] is None or entry[1] == node._version):
+            return entry[2]
+        return None
+
+    def hash(self, node: Tree) -> int:
+        """
+        Return the structural hash of a node.
+
+        The hashes of all nodes in its subtree that are not cached yet are computed bottom-up,
+        with an explicit stack instead of recursion.
+
+        Args:
+            node (Tree): The root of the subtree.
+
+        Returns:
+            int: The hash, equal for structurally equal subtrees.
+        """
+        value = self._cached(node)
+        if value is not None:
+            return value
+        memo = self._memo
+        stack = [(node, False)]
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            current, expanded = pop()
+            if expanded:
+                groups = [
+                    (group, tuple([None if child is None else memo[id(child)][2] for child in children]))
+                    for group, children in current._children.items()
+                ]
+                memo[id(current)] = (
+                    current,
+                    current._version if current._observable else None,
+                    hash((current.__class__, _value_key(current.label), _properties_key(current), tuple(groups))),
+                )
+                continue
+            entry = memo.get(id(current))
+            if entry is not None and (entry[1] is None or entry[1] == current._version):
+                continue  # cached, or a shared node that was done already
+            push((current, True))
+            for children in current._children.values():
+                for child in children:
+                    if child is not None:
+                        push((child, False))
+        return memo[id(node)][2]
+
+    def equal(self, a: Tree, b: Tree) -> bool:
+        """
+        Check whether two subtrees are structurally equal.
+
+        Subtrees with different hashes are rejected right away, otherwise they are compared node by node
+        (without recursion), where identical nodes and nodes with different hashes end the comparison early.
+
+        Args:
+            a (Tree): The root of a subtree.
+            b (Tree): The root of another subtree.
+
+        Returns:
+            bool: True if the subtrees are structurally equal.
+        """
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if a is None or b is None or self.hash(a) != self.hash(b):
+                return False
+            if not _same_node(a, b):
+                return False
+            for achildren, bchildren in zip(a._children.values(), b._children.values()):
+                stack.extend(zip(achildren, bchildren))
+        return True
+
+
+def dedupe(root: Tree, hasher: StructuralHasher | None = None) -> int:
+    """
+    Share structurally equal subtrees, turning the tree into a DAG.
+
+    The tree is modified in place: every child reference to a subtree that is structurally equal
+    to one seen before is replaced by a reference to that first subtree. The root itself is kept.
+    Because a shared node occurs in more than one place, it should not be modified afterwards
+    (that would change all places at once), and the parent pointers of observable nodes only
+    record one of the places.
+
+    Args:
+        root (Tree): The root of the tree.
+        hasher (StructuralHasher|None): Optional. A hasher whose cached hashes can be used.
+
+    Returns:
+        int: The number of child references that were replaced.
+    """
+    if hasher is None:
+        hasher = StructuralHasher()
+    hasher.hash(root)
+    memo = hasher._memo  # the hashes of all nodes of the tree are valid now
+    canonical: dict[int, list[Tree]] = {}  # hash -> the first subtrees seen with that hash
+    replaced = 0
+    for node, _, _ in root.iter_postorder():  # children are done (and canonical) before their parent
+        for children in node._children.values():
+            for index, child in enumerate(children):
+                if child is None:
+                    continue
+                candidates = canonical.setdefault(memo[id(child)][2], [])
+                for candidate in candidates:
+                    if candidate is child:
+                        break
+                    if _shallow_equal(candidate, child):
+                        children[index] = candidate
+                        replaced += 1
+                        break
+                else:
+                    candidates.append(child)
+    return replaced
+
+
+def _shallow_equal(a: Tree, b: Tree) -> bool:
+    """
+    Structural equality of two nodes whose children are shared already, so they can be compared by identity.
+    """
+    if not _same_node(a, b):
+        return False
+    for achildren, bchildren in zip(a._children.values(), b._children.values()):
+        for achild, bchild in zip(achildren, bchildren):
+            if achild is not bchild:
+                return False
+    return True
+
+
+def _same_node(a: Tree, b: Tree) -> bool:
+    """
+    Whether two nodes have the same class, label, properties and groups (including empty ones, which are
+    rendered too) with the same number of children, values of different types are never the same.
+    """
+    if a.__class__ is not b.__class__ or _value_key(a.label) != _value_key(b.label):
+        return False
+    if _properties_key(a) != _properties_key(b):
+        return False
+    agroups = a._children
+    bgroups = b._children
+    if len(agroups) != len(bgroups):
+        return False
+    for (agroup, achildren), (bgroup, bchildren) in zip(agroups.items(), bgroups.items()):
+        if agroup != bgroup or len(achildren) != len(bchildren):
+            return False
+    return True
+
+
+def _properties(node: Tree):
+    """
+    The properties of a node, without allocating them for compact nodes.
+    """
+    if node._compact:
+        return node._props or {}
+    return node.properties
+
+
+def _properties_key(node: Tree):
+    properties = _properties(node)
+    if not properties:
+        return None
+    return _value_key(properties)
+
+
+def _value_key(value):
+    """
+    A hashable key for a label or property value that includes the types of the value and of everything
+    in it, so that 1, 1.0 and True (which are equal in Python) get different keys.
+
+    Lists, tuples, sets and dicts are converted to tuples and frozensets of keys, other values that are
+    not hashable are wrapped in an `_Unhashable`.
+    """
+    cls = value.__class__
+    if cls in _ATOMS:
+        return cls, value
+    if isinstance(value, (list, tuple)):
+        return cls, tuple([_value_key(item) for item in value])
+    if isinstance(value, dict):
+        return cls, frozenset([(_value_key(key), _value_key(item)) for key, item in value.items()])
+    if isinstance(value, (set, frozenset)):
+        return cls, frozenset([_value_key(item) for item in value])
+    try:
+        hash(value)
+    except TypeError:
+        return cls, _Unhashable(value)
+    return cls, value
+
+
+_ATOMS = frozenset((type(None), bool, int, float, complex, str, bytes))
+
+
+class _Unhashable:
+    """
+    Wraps a value that is not hashable: equal if the values are equal, and hashed by type only.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _Unhashable) and self.value == other.value
+
+    def __hash__(self) -> int:
+        return hash(self.value.__class__)
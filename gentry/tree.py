@@ -1,7 +1,11 @@
-from collections import defaultdict
+import asyncio
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterator, Mapping
 
-from inspect import getfullargspec
-from types import GenericAlias
+from inspect import getfullargspec, isawaitable
+from itertools import islice
+from types import GenericAlias, MappingProxyType, UnionType
+from typing import Union, get_args, get_origin
 
 class _MetaTree(type):
     """
@@ -9,10 +13,24 @@ class _MetaTree(type):
     with a set of strings that are valid python identifiers that do not start with an underscore.
 
     Also, any positional parameters of the __init__() function that are annotated with list[Tree]
-    will be added to to _groups (and _groups will be created if necessary)
+    (or list[Tree] | None) will be added to to _groups (and _groups will be created if necessary)
+
+    When a class is defined with the `compact=True` keyword, it will get a memory efficient
+    layout based on `__slots__` (see Tree for details). Subclasses of compact classes are compact too.
+
+    Finally, when a class is defined with the `observable=True` keyword, its instances keep track
+    of changes (see Tree for details). Subclasses of observable classes are observable too.
     """
 
-    def __new__(cls, clsname, bases, attrs, **kwargs):
+    def __new__(
+        cls,
+        clsname,
+        bases,
+        attrs,
+        compact: bool | None = None,
+        observable: bool | None = None,
+        **kwargs,
+    ):
         if "_groups" in attrs:
             value = attrs["_groups"]
             if not isinstance(value, set):
@@ -31,52 +49,79 @@ class _MetaTree(type):
         if '__init__' in attrs:
             argspec = getfullargspec(attrs['__init__'])
             for argname, annotation in argspec.annotations.items():
-                if type(annotation) is GenericAlias and list[Tree] == annotation:
+                options = get_args(annotation) if get_origin(annotation) in (Union, UnionType) else (annotation,)
+                if any(type(option) is GenericAlias and option.__origin__ is list and list[Tree] == option for option in options):
                     if '_groups' not in attrs:
                         attrs['_groups'] = set()
                     attrs['_groups'].add(argname)
+        inherited = any(getattr(base, "_compact", False) for base in bases)
+        if compact is None:
+            compact = inherited
+        elif inherited and not compact:
+            raise TypeError(f"{clsname} derives from a compact class and must be compact too")
+        observed = any(getattr(base, "_observable", False) for base in bases)
+        if observed and observable is False:
+            raise TypeError(f"{clsname} derives from an observable class and must be observable too")
+        if observable or observed:
+            for group in attrs.get("_groups", ()):
+                if hasattr(_Observable, group):
+                    raise AttributeError(f"_groups item {group} is a reserved name for observable classes")
+            if not observed:
+                bases = (_Observable,) + bases
+        if compact:
+            bases, attrs = cls._compact_layout(clsname, bases, attrs)
         return super().__new__(cls, clsname, bases, attrs, **kwargs)
 
+    @staticmethod
+    def _compact_layout(clsname, bases, attrs):
+        """
+        Replace Tree by _CompactTree in the bases and add __slots__ for all instance attributes.
 
-class Tree(metaclass=_MetaTree):
-    """
-    A basic Tree object has one attribute "_children" which is a defaultdict.
-
-    The keys are group names, the values are lists of Tree objects.
-
-    If the children argument is given, it must be a defaultdict or it will be converted to one.
-
-    If any keys to the children dict are also in the groups set, these keys can also be used as attributes
-    to directly access the values in the children dictionary.
-
-    This setup allows for mixin classes and generic tools like a visitor to rely on the presence of a children
-    dict that doesn't change if a Tree class is inherited, yet allow for a more semantically meaningful way of
-    accessing groups of children im derived classes.
-
-    A typical example:
-
-        class MyTree(Tree):
-            _groups = {"left", "right"}
-        
-        m = MyTree("root")
-        m.left.append(MyTree("left"))
-
-    Or alternatively:
-
-        class MyTree(Tree):
-            def __init__(self, label: str, left:list[Tree]=[], right:list[Tree]=[]):
-                super().__init__(label, children={"left":left,"right":right})
+        Mixin classes like Mermaid declare the names of the instance attributes they need
+        in a `_compact_slots` class variable.
 
-        m = MyTree("root", left=[MyTree("left")])  # can now pass to constructor and Pylance will know about 'left'
-        m.right.append(MyTree("right"))            # this still works
-
-    This last example is a bit more work to write down, but has the advantage that you can use the groupnames as
-    arguments when calling __init__ and Pylance actually knowing about the type, while attribute access still works.
+        Returns:
+            tuple: The new bases and attrs.
+        """
+        bases = tuple(_CompactTree if base is Tree else base for base in bases)
+        for base in bases:
+            if isinstance(base, _MetaTree) and not base._compact:
+                raise TypeError(f"{clsname} is compact but {base.__name__} is not")
+        existing = set()
+        needed = {}  # an ordered set
+        for base in bases:
+            for klass in base.__mro__:
+                existing.update(klass.__dict__.get("__slots__", ()))
+                needed.update(dict.fromkeys(klass.__dict__.get("_compact_slots", ())))
+        slots = attrs.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        attrs["__slots__"] = tuple(name for name in needed if name not in existing) + tuple(slots)
+        return bases, attrs
+
+    def __instancecheck__(cls, instance):
+        # compact classes derive from _CompactTree instead of Tree, but are still Trees
+        if cls is Tree:
+            return isinstance(instance, _TreeBase)
+        return super().__instancecheck__(instance)
+
+    def __subclasscheck__(cls, subclass):
+        if cls is Tree:
+            return issubclass(subclass, _TreeBase)
+        return super().__subclasscheck__(subclass)
+
+
+class _TreeBase(metaclass=_MetaTree):
+    """
+    The implementation of Tree.
 
-    So use the latter if you want to be able to initialize a new node while passing initial children directly, or
-    use the first style if you only want to instantiate nodes without children (but still can add children later).
+    It does not have an instance __dict__ so it can be the base class of both Tree
+    and of the compact classes based on _CompactTree.
     """
 
+    __slots__ = ()
+    _compact = False
+    _observable = False
     _groups = set()
 
     def __init__(
@@ -107,23 +152,20 @@ class Tree(metaclass=_MetaTree):
         Any keyword arguments that are defined in `_groups` will be added as an entry in `_children`.
         It is an error to pass a groups of children both as keyword argument and as part of the children argument.
         """
+        self._init_storage(children, properties)
         self.label = label
-        self._children: defaultdict[str, list[Tree]] = (
-            defaultdict(list) if children is None else defaultdict(list, **children)
-        )
-        self.properties = {} if properties is None else properties
 
         remove = set()
         for k,v in kwargs.items():
             if k in self._groups and k in self._children:
                 raise ValueError(f"group {k} used in children and as keyword argument")
             if k in self._groups:
-                self._children[k] = v
+                self._writable_children()[k] = v
                 remove.add(k)
         for k in remove:
             del kwargs[k]
 
-        super(Tree, self).__init__(
+        super(_TreeBase, self).__init__(
             *args, **kwargs
         )  # executes next __init__() in MRO, see: https://stackoverflow.com/a/6099026
 
@@ -144,7 +186,7 @@ class Tree(metaclass=_MetaTree):
             AttributeError: If the attribute is not found and is also not a group.
         """
         if name in self._groups:
-            return self._children[name]
+            return self._writable_children()[name]
         raise AttributeError(f"{name} attribute could not be found on {self!r}")
 
     def __setattr__(self, name, value):
@@ -163,12 +205,31 @@ class Tree(metaclass=_MetaTree):
         """
         if name in self._groups:
             if isinstance(value, list):
-                self._children[name] = value
+                self._writable_children()[name] = value
             else:
                 raise AttributeError(f"{name} {type(value)} is not a list")
         else:
             object.__setattr__(self, name, value)
 
+    def _init_storage(self, children, properties):
+        """
+        Initialize the `_children` and `properties` attributes.
+
+        Args:
+            children (defaultdict|dict|None): The children passed to __init__().
+            properties (dict|None): The properties passed to __init__().
+        """
+        self._children: defaultdict[str, list[Tree]] = (
+            defaultdict(list) if children is None else defaultdict(list, **children)
+        )
+        self.properties = {} if properties is None else properties
+
+    def _writable_children(self) -> defaultdict[str, list["Tree"]]:
+        """
+        Return the `_children` defaultdict, to be used when adding or replacing groups.
+        """
+        return self._children
+
     def __repr__(self) -> str:
         """
         Return a string representation of the Tree node.
@@ -176,7 +237,11 @@ class Tree(metaclass=_MetaTree):
         Returns:
             str: The string representation.
         """
-        return f"{self.__class__.__name__}(label={self.label}, groups={self._groups})"
+        try:
+            label = object.__getattribute__(self, "label")
+        except AttributeError:  # not initialized yet, don't end up in __getattr__ again
+            label = None
+        return f"{self.__class__.__name__}(label={label}, groups={self._groups})"
 
     def is_leaf(self) -> bool:
         """
@@ -187,18 +252,824 @@ class Tree(metaclass=_MetaTree):
         """
         return sum(len(group) for group in self._children.values()) == 0
 
+    def find(self, predicate: "Callable[[Tree], bool]") -> "Tree | None":
+        """
+        Return the first node of the tree rooted at this node for which predicate(node) is true.
+
+        Nodes are tried parents first, in the order of `iter_preorder()`, and the search stops at the
+        first match, so its cost depends on where the match is rather than on the size of the tree.
 
-class Visitor:
-    def __init__(self, root: Tree, strict: bool = False) -> None:
+        Args:
+            predicate (Callable[[Tree], bool]): Called with a node, returns True for a match.
+
+        Returns:
+            Tree|None: The first matching node, or None if there is none.
+        """
+        finder = _Finder(self, predicate, first=True)
+        finder.visit()
+        return finder.found[0] if finder.found else None
+
+    def find_all(self, predicate: "Callable[[Tree], bool]") -> "list[Tree]":
+        """
+        Return all nodes of the tree rooted at this node for which predicate(node) is true.
+
+        Args:
+            predicate (Callable[[Tree], bool]): Called with a node, returns True for a match.
+
+        Returns:
+            list[Tree]: The matching nodes, parents before children.
+        """
+        finder = _Finder(self, predicate, first=False)
+        finder.visit()
+        return finder.found
+
+    def select(self, path: str) -> "Iterator[Tree]":
+        """
+        Lazily yield the nodes selected by a path query, starting at this node.
+
+        For example `family.select("matriarch/*/children/Mother[label='Anna']/girls/*")`, see
+        `gentry.query` for the syntax. Compiled queries are cached, so using the same path
+        again does not parse it again.
+
+        Args:
+            path (str): The path.
+
+        Returns:
+            Iterator[Tree]: A generator over the selected nodes.
+
+        Raises:
+            ValueError: If the path is not valid.
+        """
+        from .query import compile_query  # gentry.query imports this module
+
+        return compile_query(path).select(self)
+
+    def clone(self, share_properties: bool = False) -> "Tree":
+        """
+        Return a copy of the tree rooted at this node, much faster than `copy.deepcopy()`.
+
+        Nodes are copied with their other instance attributes, and get a shallow copy of their
+        properties, see `gentry.clone` for details and for persistent (copy-on-write) versions of a tree.
+
+        Args:
+            share_properties (bool): Optional. If True, the copies use the same properties dicts as the originals.
+
+        Returns:
+            Tree: The root of the copy.
+        """
+        from .clone import clone  # gentry.clone imports this module
+
+        return clone(self, share_properties)
+
+    def iter_preorder(self) -> "Iterator[tuple[Tree, str | None, int]]":
+        """
+        Lazily walk the tree rooted at this node, yielding each node before its children.
+
+        Groups and the children within a group are visited in the order they appear
+        in `_children`, just like a `Visitor` does. Children that are `None` are skipped.
+        Only an iterator per level of the tree is kept, no intermediate structures are built.
+
+        Yields:
+            tuple[Tree, str | None, int]: The node, the name of the group it is in
+            (None for the starting node) and its depth relative to the starting node.
+        """
+        yield self, None, 0
+        stack = [_child_pairs(self)]
+        while stack:
+            for group, child in stack[-1]:
+                yield child, group, len(stack)
+                stack.append(_child_pairs(child))
+                break
+            else:
+                stack.pop()
+
+    def iter_postorder(self) -> "Iterator[tuple[Tree, str | None, int]]":
+        """
+        Lazily walk the tree rooted at this node, yielding each node after its children.
+
+        This is the same order in which a `Visitor` calls its visitor methods.
+        Children that are `None` are skipped.
+
+        Yields:
+            tuple[Tree, str | None, int]: The node, the name of the group it is in
+            (None for the starting node) and its depth relative to the starting node.
+        """
+        stack = [(self, None, _child_pairs(self))]
+        while stack:
+            node, group, pairs = stack[-1]
+            for childgroup, child in pairs:
+                stack.append((child, childgroup, _child_pairs(child)))
+                break
+            else:
+                stack.pop()
+                yield node, group, len(stack)
+
+    def iter_bfs(self) -> "Iterator[tuple[Tree, str | None, int]]":
+        """
+        Lazily walk the tree rooted at this node level by level (breadth first).
+
+        Children that are `None` are skipped. Note that a breadth first walk has to keep
+        a complete level of the tree in its queue.
+
+        Yields:
+            tuple[Tree, str | None, int]: The node, the name of the group it is in
+            (None for the starting node) and its depth relative to the starting node.
+        """
+        queue = deque([(self, None, 0)])
+        while queue:
+            node, group, depth = item = queue.popleft()
+            yield item
+            depth += 1
+            for childgroup, children in node._children.items():
+                for child in children:
+                    if child is not None:
+                        queue.append((child, childgroup, depth))
+
+
+class Tree(_TreeBase):
+    """
+    A basic Tree object has one attribute "_children" which is a defaultdict.
+
+    The keys are group names, the values are lists of Tree objects.
+
+    If the children argument is given, it must be a defaultdict or it will be converted to one.
+
+    If any keys to the children dict are also in the groups set, these keys can also be used as attributes
+    to directly access the values in the children dictionary.
+
+    This setup allows for mixin classes and generic tools like a visitor to rely on the presence of a children
+    dict that doesn't change if a Tree class is inherited, yet allow for a more semantically meaningful way of
+    accessing groups of children im derived classes.
+
+    A typical example:
+
+        class MyTree(Tree):
+            _groups = {"left", "right"}
+        
+        m = MyTree("root")
+        m.left.append(MyTree("left"))
+
+    Or alternatively:
+
+        class MyTree(Tree):
+            def __init__(self, label: str, left:list[Tree]=[], right:list[Tree]=[]):
+                super().__init__(label, children={"left":left,"right":right})
+
+        m = MyTree("root", left=[MyTree("left")])  # can now pass to constructor and Pylance will know about 'left'
+        m.right.append(MyTree("right"))            # this still works
+
+    This last example is a bit more work to write down, but has the advantage that you can use the groupnames as
+    arguments when calling __init__ and Pylance actually knowing about the type, while attribute access still works.
+
+    So use the latter if you want to be able to initialize a new node while passing initial children directly, or
+    use the first style if you only want to instantiate nodes without children (but still can add children later).
+
+    When very large numbers of nodes are needed, a class can be defined with the `compact=True` keyword:
+
+        class MyTree(Tree, Mermaid, compact=True):
+            _groups = {"left", "right"}
+
+    Instances of a compact class store their attributes in `__slots__` instead of an instance `__dict__`, and
+    `_children` and `properties` are only allocated when they are first accessed. Group attributes work just the
+    same, but arbitrary other attributes can only be set if they are listed in a `__slots__` class variable.
+    Subclasses of a compact class are compact as well.
+
+    A class defined with the `observable=True` keyword keeps track of changes to its instances. Every node
+    knows its `parent` and has a `generation` counter that is incremented whenever the node or any of its
+    descendants change: when an attribute (like `label` or a group) is assigned, when a child is added to or
+    removed from a group list, or when `properties` is modified. Changed nodes and their ancestors are also
+    marked `dirty` until `mark_clean()` is called, and `iter_dirty()` walks only the dirty parts of a tree.
+    To make this possible, group lists and `properties` are replaced by list and dict subclasses that report
+    changes to the node they belong to. A node should have only one parent, and all nodes in an observed tree
+    should be observable. Render caches (see `gentry.cache`) rely on the generation counters.
+    Because nodes know their parent, their `position` (group name and index), `depth`, `ancestors()` and `path()`
+    are available without a search from the root. The keyword can be combined with `compact=True`.
+    """
+
+
+_NO_CHILDREN = MappingProxyType({})
+
+
+class _CompactTree(_TreeBase):
+    """
+    The base of compact Tree classes, i.e. classes defined with `compact=True`.
+
+    All instance attributes live in slots, and `_children` and `properties` are
+    only allocated when they are first needed. Until then `_children` is an empty
+    read-only mapping.
+    """
+
+    __slots__ = ("label", "_kids", "_props")
+    _compact = True
+
+    def _init_storage(self, children, properties):
+        self._kids = None if children is None else defaultdict(list, **children)
+        self._props = properties
+
+    def _writable_children(self) -> defaultdict[str, list["Tree"]]:
+        kids = self._kids
+        if kids is None:
+            self._kids = defaultdict(list)
+            kids = self._kids  # the assignment might have converted the defaultdict (observable classes)
+        return kids
+
+    @property
+    def _children(self) -> Mapping[str, list["Tree"]]:
+        kids = self._kids
+        return _NO_CHILDREN if kids is None else kids
+
+    @_children.setter
+    def _children(self, value):
+        self._kids = value
+
+    @property
+    def properties(self) -> dict:
+        props = self._props
+        if props is None:
+            self._props = {}
+            props = self._props
+        return props
+
+    @properties.setter
+    def properties(self, value):
+        self._props = value
+
+
+class _Observable:
+    """
+    The base of observable Tree classes, i.e. classes defined with `observable=True`.
+
+    It is inserted in front of the bases of such a class by `_MetaTree`. It converts the
+    `_children` mapping, the group lists and `properties` into tracked containers and, when
+    anything changes, increments the generation of a node and all its ancestors and marks
+    them dirty.
+
+    The tracked containers also record the parent of each node and the group it is in,
+    so the location of a node can be found without searching from the root.
+    """
+
+    __slots__ = ()
+    _compact_slots = ("_parent", "_group", "_version", "_dirty")  # instance attributes, see compact mode in Tree
+    _observable = True
+
+    def _init_storage(self, children, properties):
+        object.__setattr__(self, "_parent", None)
+        object.__setattr__(self, "_group", None)
+        object.__setattr__(self, "_version", 0)
+        object.__setattr__(self, "_dirty", True)
+        super()._init_storage(children, properties)
+
+    def __setattr__(self, name, value):
+        if name in self._groups:
+            super().__setattr__(name, value)  # _TrackedGroups reports the change
+            return
+        changed = value is not None
+        if name in ("_children", "_kids"):
+            changed = bool(value) or bool(self._current(name))  # allocating no children is not a change
+            if value is not None and not (type(value) is _TrackedGroups and value._owner is self):
+                value = _TrackedGroups(self, value)
+        elif name in ("properties", "_props"):
+            if value is not None and not (type(value) is TrackedDict and value._owner is self):
+                value = TrackedDict(self, value)
+                changed = bool(value) or bool(self._current("_props" if self._compact else name))
+        elif name in ("_parent", "_group", "_version", "_dirty"):
+            changed = False
+        else:
+            changed = True
+        super().__setattr__(name, value)
+        if changed:
+            self._changed()
+
+    def __getstate__(self):
+        # don't pickle (or deepcopy) the ancestors of a node, the tracked lists restore the parent pointers below it
+        state = super().__getstate__()
+        if isinstance(state, tuple):
+            state, slots = state
+            return state, {**slots, "_parent": None, "_group": None}
+        return {**state, "_parent": None, "_group": None}
+
+    def _current(self, name):
+        """
+        The current value of an attribute, or None if it wasn't set yet (without calling __getattr__).
+        """
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            return None
+
+    @property
+    def generation(self) -> int:
+        """
+        A counter that is incremented whenever this node or any of its descendants changes.
+
+        Consumers can remember the generation of a node and skip the subtree if it is still the same.
+        """
+        return self._version
+
+    @property
+    def dirty(self) -> bool:
+        """
+        True if this node or any of its descendants changed since `mark_clean()` was last called.
+
+        New nodes are dirty.
+        """
+        return self._dirty
+
+    @property
+    def parent(self) -> "Tree | None":
+        """
+        The node that has this node in one of its groups, or None for a root node.
+
+        If a node is added to more than one group, the group it was added to last counts.
+        """
+        return self._parent
+
+    @property
+    def position(self) -> "tuple[str, int] | None":
+        """
+        The name of the group this node is in and its index in that group, or None for a root node.
+        """
+        parent = self._parent
+        if parent is None:
+            return None
+        return self._group, parent._children[self._group].index_of(self)
+
+    @property
+    def depth(self) -> int:
+        """
+        The number of ancestors of this node, 0 for a root node.
+        """
+        depth = 0
+        node = self._parent
+        while node is not None:
+            depth += 1
+            node = node._parent
+        return depth
+
+    def ancestors(self) -> "Iterator[Tree]":
+        """
+        Lazily walk the ancestors of this node, from its parent up to the root.
+
+        Yields:
+            Tree: The ancestors.
+        """
+        node = self._parent
+        while node is not None:
+            yield node
+            node = node._parent
+
+    def path(self) -> "list[tuple[str, int]]":
+        """
+        The location of this node relative to its root, as the group names and indices to follow from the root.
+
+        For example [("left", 0), ("right", 2)] is the path of `root.left[0].right[2]`.
+
+        Returns:
+            list[tuple[str, int]]: The group name and index at each level, an empty list for a root node.
+        """
+        path = []
+        node = self
+        while node._parent is not None:
+            path.append(node.position)
+            node = node._parent
+        path.reverse()
+        return path
+
+    def mark_clean(self) -> None:
+        """
+        Clear the dirty flag of this node and all its descendants.
+
+        Subtrees that are already clean are skipped.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._dirty:
+                object.__setattr__(node, "_dirty", False)
+                stack.extend(_child_nodes(node))
+
+    def iter_dirty(self) -> "Iterator[Tree]":
+        """
+        Lazily walk the dirty nodes of the tree rooted at this node, parents before children.
+
+        Clean subtrees are skipped entirely, so a consumer that processes the dirty nodes and
+        then calls `mark_clean()` only ever looks at the parts of the tree that changed.
+
+        Yields:
+            Tree: The dirty nodes.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._dirty:
+                yield node
+                children = [child for child in _child_nodes(node) if child._observable]
+                children.reverse()
+                stack.extend(children)
+
+    def _changed(self):
+        """
+        Increment the generation of this node and of all its ancestors and mark them dirty.
+        """
+        node = self
+        while node is not None:
+            try:
+                version = node._version
+            except AttributeError:  # still being initialized
+                return
+            object.__setattr__(node, "_version", version + 1)
+            object.__setattr__(node, "_dirty", True)
+            node = node._parent
+
+    def _adopt(self, child, group):
+        if child is not None and child._observable:
+            object.__setattr__(child, "_parent", self)
+            object.__setattr__(child, "_group", group)
+
+    def _release(self, child, group):
+        if child is not None and child._observable and child._parent is self and child._group == group:
+            object.__setattr__(child, "_parent", None)
+            object.__setattr__(child, "_group", None)
+
+
+class TrackedList(list):
+    """
+    A list of child nodes that reports changes to the observable node it belongs to.
+
+    The parent of nodes that are added is set to the owner, nodes that are removed lose their parent.
+    """
+
+    __slots__ = ("_owner", "_group", "_positions")
+
+    def __init__(self, owner: Tree, iterable=(), group: str | None = None):
+        super().__init__(iterable)
+        self._owner = owner
+        self._group = group
+        self._positions = None
+        for child in self:
+            owner._adopt(child, group)
+
+    def __reduce__(self):
+        return TrackedList, (self._owner, list(self), self._group)
+
+    def index_of(self, child: Tree) -> int:
+        """
+        The index of a node in this list, compared by identity.
+
+        The indices of all nodes are computed on the first call after a change, so finding
+        the positions of many siblings costs O(1) each.
+
+        Raises:
+            ValueError: If the node is not in the list.
+        """
+        positions = self._positions
+        if positions is None:
+            positions = self._positions = {id(node): index for index, node in enumerate(self)}
+        try:
+            return positions[id(child)]
+        except KeyError:
+            raise ValueError(f"{child!r} is not in the list") from None
+
+    def _replaced(self, removed, added):
+        owner = self._owner
+        self._positions = None
+        for child in removed:
+            owner._release(child, self._group)
+        for child in added:
+            owner._adopt(child, self._group)
+        owner._changed()
+
+    def append(self, child):
+        super().append(child)
+        self._replaced((), (child,))
+
+    def insert(self, index, child):
+        super().insert(index, child)
+        self._replaced((), (child,))
+
+    def extend(self, children):
+        children = list(children)
+        super().extend(children)
+        self._replaced((), children)
+
+    def __iadd__(self, children):
+        self.extend(children)
+        return self
+
+    def __imul__(self, n):
+        removed = list(self) if n <= 0 else ()
+        super().__imul__(n)
+        self._replaced(removed, ())
+        return self
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            removed = self[key]
+            value = list(value)
+            super().__setitem__(key, value)
+            self._replaced(removed, value)
+        else:
+            removed = self[key]
+            super().__setitem__(key, value)
+            self._replaced((removed,), (value,))
+
+    def __delitem__(self, key):
+        removed = self[key] if isinstance(key, slice) else (self[key],)
+        super().__delitem__(key)
+        self._replaced(removed, ())
+
+    def pop(self, index=-1):
+        child = super().pop(index)
+        self._replaced((child,), ())
+        return child
+
+    def remove(self, child):
+        super().remove(child)
+        self._replaced((child,), ())
+
+    def clear(self):
+        removed = list(self)
+        super().clear()
+        self._replaced(removed, ())
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._positions = None
+        self._owner._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._positions = None
+        self._owner._changed()
+
+
+class _TrackedGroups(defaultdict):
+    """
+    The `_children` mapping of an observable node, groups are stored as TrackedLists.
+    """
+
+    def __init__(self, owner: Tree, groups=()):
+        super().__init__(None)
+        self._owner = owner
+        for group, children in dict(groups).items():
+            dict.__setitem__(self, group, TrackedList(owner, children, group))
+
+    def __reduce__(self):
+        return _TrackedGroups, (self._owner, dict(self))
+
+    def __missing__(self, group):
+        children = TrackedList(self._owner, group=group)
+        dict.__setitem__(self, group, children)
+        self._owner._changed()  # a new group is a change even if it is empty, renderers show it
+        return children
+
+    def __setitem__(self, group, children):
+        current = self.get(group)
+        if children is current:  # like `node.left += [child]`, the list itself reported the change
+            return
+        children = TrackedList(self._owner, children, group)  # always a copy owned by this node
+        super().__setitem__(group, children)
+        if current is None or current or children:
+            if current:
+                kept = {id(child) for child in children}
+                for child in current:
+                    if id(child) not in kept:
+                        self._owner._release(child, group)
+            self._owner._changed()
+
+    def __delitem__(self, group):
+        removed = self[group]
+        super().__delitem__(group)
+        for child in removed:
+            self._owner._release(child, group)
+        self._owner._changed()
+
+    def pop(self, group, *default):
+        if group in self:
+            removed = self[group]
+            del self[group]
+            return removed
+        return super().pop(group, *default)
+
+    def popitem(self):
+        group, removed = super().popitem()
+        for child in removed:
+            self._owner._release(child, group)
+        self._owner._changed()
+        return group, removed
+
+    def clear(self):
+        removed = [(group, child) for group, children in self.items() for child in children]
+        super().clear()
+        for group, child in removed:
+            self._owner._release(child, group)
+        self._owner._changed()
+
+    def setdefault(self, group, children=None):
+        if group not in self:
+            self[group] = [] if children is None else children
+        return self[group]
+
+    def update(self, *args, **kwargs):
+        for group, children in dict(*args, **kwargs).items():
+            self[group] = children
+
+
+class TrackedDict(dict):
+    """
+    The properties of an observable node, changes are reported to the node it belongs to.
+    """
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: Tree, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._owner = owner
+
+    def __reduce__(self):
+        return TrackedDict, (self._owner, dict(self))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._owner._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._owner._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *default):
+        present = key in self
+        value = super().pop(key, *default)
+        if present:
+            self._owner._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._owner._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._owner._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._owner._changed()
+
+
+def _child_pairs(node: Tree) -> "Iterator[tuple[str, Tree]]":
+    """
+    An iterator over (group, child) pairs of a node, skipping None children.
+    """
+    return (
+        (group, child)
+        for group, children in node._children.items()
+        for child in children
+        if child is not None
+    )
+
+
+_EXHAUSTED = iter(())
+
+class _MetaVisitor(type):
+    """
+    Gives each visitor class its own dispatch cache and keeps it consistent.
+
+    Resolved visitor methods are cached in the `_dispatch` dict of the visitor class, keyed by
+    (node class, strict), so the cache goes away with the class. When a `_do_` method is added
+    to or removed from a visitor class after it was created, any cached resolution of that class
+    or one of its subclasses might be stale and their caches are cleared.
+    """
+
+    def __init__(cls, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        cls._dispatch: dict[tuple[type, bool], str] = {}
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        if name.startswith("_do_"):
+            cls._clear_dispatch()
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        if name.startswith("_do_"):
+            cls._clear_dispatch()
+
+    def _clear_dispatch(cls):
+        stack = [cls]
+        while stack:
+            klass = stack.pop()
+            klass._dispatch.clear()
+            stack.extend(klass.__subclasses__())
+
+
+def _child_nodes(node: Tree) -> "Iterator[Tree]":
+    """
+    An iterator over all children of a node in all its groups, skipping None children.
+    """
+    return (
+        child for children in node._children.values() for child in children if child is not None
+    )
+
+
+def _visit_nested(
+    tree: Tree,
+    get_visitor: "Callable[[Tree], Callable]",
+    known: "Callable[[Tree], dict | None] | None" = None,
+    store: "Callable[[Tree, dict], None] | None" = None,
+) -> dict:
+    """
+    Build the nested result of `Visitor.visit()` for a tree, children first.
+
+    The traversal uses an explicit stack instead of recursion, so the depth of the tree is not
+    limited by the Python recursion limit. The node that is being worked on is kept in local
+    variables, the stack holds the same state for each of its ancestors.
+
+    Args:
+        tree (Tree): The root of the tree.
+        get_visitor (Callable): Returns the visitor method for a node, called once per node class.
+        known (Callable|None): Optional. Returns a result for a child that is used as is, without
+            descending into the child, or None if the child should be visited.
+        store (Callable|None): Optional. Called with every node that is visited and its result.
+
+    Returns:
+        dict: The result for the root.
+    """
+    visitors = {}  # node class -> bound visitor method, for this traversal only
+    stack = []  # (node, results, groups, group, children) of the ancestors of node
+    push = stack.append
+    pop = stack.pop
+    node = tree
+    results = defaultdict(list)  # group -> results of the children of node
+    groups = iter(node._children.items())  # the groups of node that were not started yet
+    group = None  # the current group and the iterator over its children
+    children = _EXHAUSTED
+    while True:
+        for child in children:  # descend into the next child of the current group
+            if known is not None:
+                result = known(child)
+                if result is not None:
+                    results[group].append(result)
+                    continue
+            if not child._children:  # shortcut for leaves, they don't need to be pushed
+                cls = child.__class__
+                visitor = visitors.get(cls)
+                if visitor is None:
+                    visitor = visitors[cls] = get_visitor(child)
+                result = {cls.__name__: visitor(child), "children": defaultdict(list)}
+                results[group].append(result)
+                if store is not None:
+                    store(child, result)
+                continue
+            push((node, results, groups, group, children))
+            node = child
+            results = defaultdict(list)
+            groups = iter(child._children.items())
+            children = _EXHAUSTED
+            break
+        else:
+            for group, members in groups:  # move on to the next group
+                children = iter(members)
+                break
+            else:  # all children are done, visit the node itself
+                cls = node.__class__
+                visitor = visitors.get(cls)
+                if visitor is None:
+                    visitor = visitors[cls] = get_visitor(node)
+                result = {cls.__name__: visitor(node), "children": results}
+                if store is not None:
+                    store(node, result)
+                if not stack:
+                    return result
+                node, results, groups, group, children = pop()
+                results[group].append(result)
+
+
+class Visitor(metaclass=_MetaVisitor):
+    def __init__(self, root: Tree, strict: bool = False, shared: bool = False) -> None:
         """
         Initialize the Visitor.
 
         Args:
             root (Tree): The root node to start visiting from.
             strict (bool): If True, require exact visitor method matches for each node type.
+            shared (bool): If True, a node that occurs more than once in the tree (like the shared subtrees
+                of a tree converted to a DAG by `gentry.structure.dedupe()`) is visited only once, and
+                its result is reused for the other occurrences.
         """
         self.root = root
         self.strict = strict
+        self.shared = shared
         self.result = None
 
     def visit(self):
@@ -227,6 +1098,10 @@ class Visitor:
         find one in one of the superclassed. So if `Person` was derived from `Entity`, we would
         look for `_do_validator_Entity()` next.
 
+        Visitor methods are looked up on the visitor class, not on the instance. The name of the
+        method that is found is cached per combination of visitor class, node class and strictness,
+        so the search is done only once for each combination.
+
         Args:
             tree (Tree): The node to find a visitor for.
 
@@ -236,39 +1111,454 @@ class Visitor:
         Raises:
             NotImplementedError: If no suitable visitor method is found.
         """
-        typename = tree.__class__.__name__
-        for klass in self.__class__.__mro__:
+        cache = self.__class__._dispatch
+        key = (tree.__class__, self.strict)
+        name = cache.get(key)
+        if name is None:
+            name = cache[key] = self._resolve_visitor(tree.__class__.__name__)
+        return getattr(self, name)
+
+    def _resolve_visitor(self, typename: str) -> str:
+        """
+        Search the method resolution order of the visitor class for a visitor method.
+
+        Args:
+            typename (str): The class name of the node to find a visitor for.
+
+        Returns:
+            str: The name of the visitor method.
+
+        Raises:
+            NotImplementedError: If no suitable visitor method is found.
+        """
+        cls = self.__class__
+        for klass in cls.__mro__:
             generic_visitor = f"_do_{klass.__name__.lower()}"
             visitor = f"{generic_visitor}_{typename}"
-            if hasattr(self, visitor):
-                return getattr(self, visitor)
-            elif not self.strict and hasattr(self, generic_visitor):
-                return getattr(self, generic_visitor)
+            if hasattr(cls, visitor):
+                return visitor
+            elif not self.strict and hasattr(cls, generic_visitor):
+                return generic_visitor
         raise NotImplementedError(
             f"class {self.__class__.__name__} missing {visitor} and {generic_visitor} methods."
         )
 
     def _visit(self, tree: Tree):
         """
-        Recursively visit the tree in a bottom-up (children first) manner.
+        Visit the tree in a bottom-up (children first) manner.
+
+        The traversal uses an explicit stack instead of recursion, so the depth of
+        the tree is not limited by the Python recursion limit.
+
+        Args:
+            tree (Tree): The node to visit.
+
+        Returns:
+            dict: A dictionary containing the results for this node and its children.
+        """
+        if not self.shared:
+            return _visit_nested(tree, self._get_visitor)
+        memo = {}  # id(node) -> result, for nodes that occur more than once
+        return _visit_nested(
+            tree,
+            self._get_visitor,
+            lambda child: memo.get(id(child)),
+            lambda node, result: memo.__setitem__(id(node), result),
+        )
+
+
+class Reducer(Visitor):
+    """
+    A visitor that hands the results of the children of a node directly to its visitor method.
+
+    Where a `Visitor` returns a nested dict that mirrors the whole tree, the visitor methods
+    of a `Reducer` take a second argument: a sequence with the results of the children of the
+    node (in the order of the groups in `_children`, None children are skipped) and return a single
+    value. The result of `visit()` is simply the value returned for the root node, so no
+    dicts are allocated per node.
+
+    For example, to compute the height of a tree:
+
+        class Height(Reducer):
+            def _do_height(self, tree, results):
+                return 1 + max(results, default=0)
+
+        Height(root).visit()
+
+    If the Reducer is instantiated with `discard=True`, the visitor methods are called in the same
+    order but always get an empty sequence, and their return values are thrown away. This is the
+    cheapest way to perform a pass over the tree for side effects only.
+
+    With `shared=True` a node that occurs more than once is reduced only once. For a tree in which
+    many identical subtrees were merged by `gentry.structure.dedupe()`, the cost is then proportional
+    to the number of distinct nodes rather than to the size of the tree they represent.
+    """
+
+    def __init__(self, root: Tree, strict: bool = False, discard: bool = False, shared: bool = False) -> None:
+        """
+        Initialize the Reducer.
+
+        Args:
+            root (Tree): The root node to start visiting from.
+            strict (bool): If True, require exact visitor method matches for each node type.
+            discard (bool): If True, do not collect any results.
+            shared (bool): If True, visit a node that occurs more than once only once and reuse its result.
+        """
+        super().__init__(root, strict, shared)
+        self.discard = discard
+
+    def _visit(self, tree: Tree):
+        """
+        Visit the tree in a bottom-up (children first) manner.
+
+        Args:
+            tree (Tree): The node to visit.
+
+        Returns:
+            The result of the visitor method of the node, or None if results are discarded.
+        """
+        get_visitor = self._get_visitor
+        visitors = {}  # node class -> bound visitor method, for this traversal only
+
+        if self.discard:
+            seen = set() if self.shared else None
+            for node, _, _ in tree.iter_postorder():
+                if seen is not None:
+                    if id(node) in seen:
+                        continue
+                    seen.add(id(node))
+                cls = node.__class__
+                visitor = visitors.get(cls)
+                if visitor is None:
+                    visitor = visitors[cls] = get_visitor(node)
+                visitor(node, ())
+            return None
+
+        memo = {} if self.shared else None  # id(node) -> result, for nodes that occur more than once
+        top = []
+        stack = [[tree, [], _child_nodes(tree)]]  # frames: [node, results of children, children]
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            frame = stack[-1]
+            for child in frame[2]:
+                if memo is not None and id(child) in memo:
+                    frame[1].append(memo[id(child)])
+                    continue
+                cls = child.__class__
+                if not child._children:  # shortcut for leaves, they don't need a frame
+                    visitor = visitors.get(cls)
+                    if visitor is None:
+                        visitor = visitors[cls] = get_visitor(child)
+                    result = visitor(child, ())
+                    frame[1].append(result)
+                    if memo is not None:
+                        memo[id(child)] = result
+                    continue
+                push([child, [], _child_nodes(child)])
+                break
+            else:
+                pop()
+                node, results, _ = frame
+                cls = node.__class__
+                visitor = visitors.get(cls)
+                if visitor is None:
+                    visitor = visitors[cls] = get_visitor(node)
+                result = visitor(node, results)
+                (stack[-1][1] if stack else top).append(result)
+                if memo is not None:
+                    memo[id(node)] = result
+        return top[0]
+
+
+class IncrementalVisitor(Visitor):
+    """
+    A visitor that remembers the result for each node and only visits the parts of a tree that changed.
+
+    Visitor methods are defined and called in exactly the same way as for a `Visitor`, and `visit()`
+    returns the same nested dict. The first call visits every node. On later calls, any node of an
+    observable class (see Tree) whose `generation` did not change since the previous call gets its
+    earlier result, complete with the results of its whole subtree, without visiting it again.
+    So after a single leaf was modified, only the leaf and its ancestors are visited.
+
+    Nodes that are not observable are visited every time.
+
+    Because results are reused, the visitor methods should compute their result from the
+    subtree of the node only, and parts of the result of an earlier call can be shared with later
+    results, so don't modify them. Call `reset()` to forget all results.
+
+    The `visited` attribute holds the number of visitor methods called by the last `visit()`.
+    """
+
+    def __init__(self, root: Tree, strict: bool = False) -> None:
+        """
+        Initialize the IncrementalVisitor.
+
+        Args:
+            root (Tree): The root node to start visiting from.
+            strict (bool): If True, require exact visitor method matches for each node type.
+        """
+        super().__init__(root, strict)
+        self.visited = 0
+        self._memo: dict[int, tuple] = {}  # id(node) -> (node, generation, result, child nodes)
+
+    def reset(self) -> None:
+        """
+        Forget all remembered results, the next `visit()` will visit every node.
+        """
+        self._memo.clear()
+
+    def _visit(self, tree: Tree):
+        """
+        Visit the changed parts of the tree in a bottom-up (children first) manner.
+
+        The traversal is the same as that of `Visitor._visit()`, except that an unchanged observable
+        node is not descended into and its remembered result is used instead.
+
+        Args:
+            tree (Tree): The node to visit.
+
+        Returns:
+            dict: A dictionary containing the results for this node and its children.
+        """
+        memo = self._memo
+        self.visited = 0
+        if tree._observable:
+            entry = memo.get(id(tree))
+            if entry is not None and entry[0] is tree and entry[1] == tree._version:
+                return entry[2]
+        return _visit_nested(tree, self._get_visitor, self._known, self._store)
+
+    def _known(self, node: Tree) -> dict | None:
+        """
+        The remembered result of a node that did not change, if any.
+        """
+        if node._observable:
+            entry = self._memo.get(id(node))
+            if entry is not None and entry[0] is node and entry[1] == node._version:
+                return entry[2]
+        return None
+
+    def _store(self, node: Tree, result: dict) -> None:
+        """
+        Count a visited node and remember its result if it is observable.
+        """
+        self.visited += 1
+        if node._observable:
+            self._remember(node, result)
+
+    def _remember(self, node: Tree, result: dict) -> None:
+        """
+        Store the result for a node, and forget the results of any former children that were removed.
+        """
+        memo = self._memo
+        children = tuple(_child_nodes(node))
+        old = memo.get(id(node))
+        memo[id(node)] = (node, node._version, result, children)
+        if old is not None and old[0] is node and old[3]:
+            current = set(map(id, children))
+            stale = [child for child in old[3] if id(child) not in current]
+            while stale:
+                child = stale.pop()
+                entry = memo.get(id(child))
+                if entry is not None and entry[0] is child:
+                    del memo[id(child)]
+                    stale.extend(entry[3])
+
+
+class AsyncVisitor(Visitor):
+    """
+    A visitor whose visitor methods may be coroutines, for visitors that wait on I/O for each node.
+
+    Visitor methods are found in the same way as for a `Visitor` and may be regular methods or
+    `async def` methods. All children of a node, in all its groups, are visited concurrently, but at
+    most `concurrency` visitor methods are running at the same time. A node is visited after all its
+    children, and the result of `await visit()` is the same nested dict that `Visitor.visit()` returns:
+
+        class Lookup(AsyncVisitor):
+            async def _do_lookup(self, tree):
+                return await service.get(tree.label)
+
+        result = asyncio.run(Lookup(root, concurrency=10).visit())
+
+    Every child is visited in its own asyncio task, so deep trees are not limited by the recursion limit.
+    """
+
+    def __init__(self, root: Tree, strict: bool = False, concurrency: int = 16) -> None:
+        """
+        Initialize the AsyncVisitor.
+
+        Args:
+            root (Tree): The root node to start visiting from.
+            strict (bool): If True, require exact visitor method matches for each node type.
+            concurrency (int): The maximum number of visitor methods that run at the same time.
+
+        Raises:
+            ValueError: If concurrency is not positive.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be positive, not {concurrency}")
+        super().__init__(root, strict)
+        self.concurrency = concurrency
+
+    async def visit(self):
+        """
+        Start the visiting process from the root node.
+
+        Returns:
+            The result of visiting the root node.
+        """
+        self.result = await self._visit(self.root, asyncio.Semaphore(self.concurrency))
+        return self.result
+
+    async def _visit(self, tree: Tree, semaphore: asyncio.Semaphore):
+        """
+        Visit the children of a node concurrently, then the node itself.
 
         Args:
             tree (Tree): The node to visit.
+            semaphore (asyncio.Semaphore): Limits the number of visitor methods running at the same time.
 
         Returns:
             dict: A dictionary containing the results for this node and its children.
         """
-        typename = tree.__class__.__name__
         results: defaultdict[str, list] = defaultdict(list)
-        for group, children in tree._children.items():
-            for child in children:
-                results[group].append(self._visit(child))
+        groups = [(group, children) for group, children in tree._children.items() if children]
+        if groups:
+            childresults = iter(
+                await asyncio.gather(
+                    *(self._visit(child, semaphore) for _, children in groups for child in children)
+                )
+            )
+            for group, children in groups:
+                results[group].extend(islice(childresults, len(children)))
+        visitor = self._get_visitor(tree)
+        async with semaphore:
+            result = visitor(tree)
+            if isawaitable(result):
+                result = await result
+        return {tree.__class__.__name__: result, "children": results}
+
+
+class TopDownVisitor(Visitor):
+    """
+    A visitor that calls the visitor method of a node before visiting its children, and can cut the traversal short.
+
+    Visitor methods are found in the same way as for a `Visitor`. While a visitor method runs it can call:
+
+      prune()   to not visit the children of the current node
+      stop()    to end the whole traversal right after the current node
+
+    so a search only pays for the part of the tree it actually looks at:
 
-        result = self._get_visitor(tree)(tree)
-        return {typename: result, "children": results}
+        class FindLoop(TopDownVisitor):
+            def _do_findloop(self, tree):
+                if tree.properties.get("kind") == "loop":
+                    self.found = tree
+                    self.stop()
+
+    `visit()` returns the same nested dict as `Visitor.visit()`, but only for the nodes that were
+    visited, so a pruned node has no children in the result. If the TopDownVisitor is instantiated
+    with `discard=True`, results are not collected and `visit()` returns None.
+    Children that are None are skipped. After `visit()`, the `stopped` attribute tells whether `stop()` was called.
+    """
+
+    def __init__(self, root: Tree, strict: bool = False, discard: bool = False) -> None:
+        """
+        Initialize the TopDownVisitor.
+
+        Args:
+            root (Tree): The root node to start visiting from.
+            strict (bool): If True, require exact visitor method matches for each node type.
+            discard (bool): If True, do not collect any results.
+        """
+        super().__init__(root, strict)
+        self.discard = discard
+        self.stopped = False
+        self._prune = False
+
+    def prune(self) -> None:
+        """
+        Do not visit the children of the node whose visitor method is running.
+        """
+        self._prune = True
+
+    def stop(self) -> None:
+        """
+        Do not visit any more nodes after the one whose visitor method is running.
+        """
+        self.stopped = True
+
+    def _visit(self, tree: Tree):
+        """
+        Visit the tree in a top-down (parents first) manner, using an explicit stack.
+
+        Args:
+            tree (Tree): The node to visit.
+
+        Returns:
+            dict|None: A dictionary containing the results for this node and the visited children,
+            or None if results are discarded.
+        """
+        get_visitor = self._get_visitor
+        visitors = {}  # node class -> bound visitor method, for this traversal only
+        discard = self.discard
+        self.stopped = False
+        top = None
+        stack = [(tree, None, None)]  # (node, results of the groups of its parent, group)
+        pop = stack.pop
+        while stack:
+            node, parent, group = pop()
+            cls = node.__class__
+            visitor = visitors.get(cls)
+            if visitor is None:
+                visitor = visitors[cls] = get_visitor(node)
+            self._prune = False
+            value = visitor(node)
+            if not discard:
+                results = defaultdict(list)
+                result = {cls.__name__: value, "children": results}
+                if parent is None:
+                    top = result
+                else:
+                    parent[group].append(result)
+            if self.stopped:
+                break
+            if self._prune or not node._children:
+                continue
+            pending = [
+                (child, results if not discard else None, childgroup)
+                for childgroup, children in node._children.items()
+                for child in children
+                if child is not None
+            ]
+            pending.reverse()  # the first child ends up on top of the stack
+            stack.extend(pending)
+        return top
+
+
+class _Finder(TopDownVisitor):
+    """
+    The visitor behind `Tree.find()` and `Tree.find_all()`.
+    """
+
+    def __init__(self, root: Tree, predicate, first: bool) -> None:
+        super().__init__(root, discard=True)
+        self.predicate = predicate
+        self.first = first
+        self.found = []
+
+    def _do__finder(self, tree):
+        if self.predicate(tree):
+            self.found.append(tree)
+            if self.first:
+                self.stop()
 
 
 class Count(Visitor):
+    by_class: dict[str, int] | None = None
+    by_group: dict[str | None, int] | None = None
+
     def _do_count(self, tree: Tree):
         """
         Visitor method for counting a single node.
@@ -302,15 +1592,47 @@ class Count(Visitor):
                 total += value
         return total
 
-    def count(self):
+    def count(self, by_class: bool = False, by_group: bool = False):
         """
         Count the total number of nodes in the tree.
 
+        The tree is walked once and the value returned by the visitor method for each node is
+        added to the total right away, so no nested result is built. Specialized visitor methods
+        like `_do_count_Family()` are used just like with `visit()`. Children that are None are
+        not counted.
+
+        If requested, breakdowns are collected in the same pass and stored in the `by_class`
+        attribute (counts per class name) and the `by_group` attribute (counts per name of the
+        group a node is in, the root node is counted under None).
+
+        Args:
+            by_class (bool): If True, also count per class name.
+            by_group (bool): If True, also count per group name.
+
         Returns:
             int: The total node count.
         """
-        results = self.visit()
-        return self._sum(results)
+        get_visitor = self._get_visitor
+        visitors = {}  # node class -> bound visitor method, for this traversal only
+        classes: defaultdict[str, int] = defaultdict(int)
+        groups: defaultdict[str | None, int] = defaultdict(int)
+        total = 0
+        for node, group, _ in self.root.iter_postorder():
+            cls = node.__class__
+            visitor = visitors.get(cls)
+            if visitor is None:
+                visitor = visitors[cls] = get_visitor(node)
+            value = visitor(node)
+            if type(value) is not int:
+                value = self._sum(value)
+            total += value
+            if by_class:
+                classes[cls.__name__] += value
+            if by_group:
+                groups[group] += value
+        self.by_class = dict(classes) if by_class else None
+        self.by_group = dict(groups) if by_group else None
+        return total
 
 
 if __name__ == "__main__":  # pragma: no cover
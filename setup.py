@@ -17,6 +17,7 @@ setup(
     license="GPLv3",
     packages=["gentry"],
     python_requires=">=3.11",
+    extras_require={"numpy": ["numpy>=1.24"]},  # vectorized aggregations in gentry.aggregate
     zip_safe=False,
     classifiers=[
         "Development Status :: 4 - Beta",
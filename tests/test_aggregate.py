@@ -0,0 +1,91 @@
+import pytest
+from gentry import aggregate
+from gentry.aggregate import (
+    class_counts,
+    depths,
+    flatten,
+    leaves,
+    property_values,
+    subtree_reduce,
+    subtree_sizes,
+)
+from gentry.arena import Arena
+from gentry.tree import Count, Tree
+
+
+class Node(Tree):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+def make_tree():
+    # root
+    # ├── left: a (left: c {w: 2}, right: d {w: 3}), None
+    # └── right: b {w: 5} (left: e)
+    c = Leaf("c", properties={"w": 2})
+    d = Leaf("d", properties={"w": 3})
+    e = Leaf("e")
+    a = Node("a", left=[c], right=[d])
+    b = Node("b", left=[e], properties={"w": 5})
+    return Node("root", left=[a, None], right=[b])
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if aggregate.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(aggregate, "np", None)
+    return request.param
+
+
+def test_flatten_aligns_nodes_with_indices(backend):
+    arena, nodes = flatten(make_tree())
+    assert [n.label for n in nodes] == ["root", "a", "b", "c", "d", "e"]
+    assert [arena.node(i).label for i in range(len(arena))] == [n.label for n in nodes]
+
+
+def test_depths(backend):
+    arena, _ = flatten(make_tree())
+    assert list(depths(arena)) == [0, 1, 1, 2, 2, 2]
+
+
+def test_subtree_sizes(backend):
+    root = make_tree()
+    arena, nodes = flatten(root)
+    sizes = subtree_sizes(arena)
+    assert list(sizes) == [6, 3, 2, 1, 1, 1]
+    assert [sizes[i] for i in range(len(nodes))] == [Count(n).count() for n in nodes]
+
+
+def test_leaves_and_class_counts(backend):
+    arena, _ = flatten(make_tree())
+    assert [bool(v) for v in leaves(arena)] == [False, False, False, True, True, True]
+    assert class_counts(arena) == {"Node": 3, "Leaf": 3}
+
+
+def test_property_reductions(backend):
+    arena, _ = flatten(make_tree())
+    assert list(property_values(arena, "w")) == [0, 0, 5, 2, 3, 0]
+    assert list(subtree_reduce(arena, "w")) == [10, 5, 5, 2, 3, 0]
+    assert list(subtree_reduce(arena, "w", "max")) == [5, 3, 5, 2, 3, float("-inf")]
+    assert list(subtree_reduce(arena, "w", "min", default=100)) == [2, 2, 5, 2, 3, 100]
+    with pytest.raises(ValueError):
+        subtree_reduce(arena, "w", "mean")
+
+
+def test_arena_built_out_of_order(backend):
+    # nodes added depth first instead of breadth first, and a long chain
+    arena = Arena()
+    root = arena.add(Node, "root")
+    node = root
+    for i in range(100):
+        node = arena.add(Node, str(i), node, "left")
+    arena.add(Leaf, "side", root, "right", {"w": 1})
+    assert list(depths(arena)) == list(range(101)) + [1]
+    sizes = subtree_sizes(arena)
+    assert sizes[0] == 102 and sizes[1] == 100 and sizes[101] == 1
+    assert subtree_reduce(arena, "w")[0] == 1
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+from gentry.ancestors import AncestorIndex
+from gentry.tree import Tree
+
+
+class Node(Tree):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+def random_tree(cls, size, rng):
+    nodes = [cls("0")]
+    parents = {}
+    for i in range(1, size):
+        parent = rng.choice(nodes)
+        child = cls(str(i))
+        getattr(parent, rng.choice(["left", "right"])).append(child)
+        parents[child] = parent
+        nodes.append(child)
+    return nodes, parents
+
+
+def ancestors(node, parents):
+    result = [node]
+    while node in parents:
+        node = parents[node]
+        result.append(node)
+    return result
+
+
+@pytest.mark.parametrize("cls", [Node, Observed])
+def test_against_walking_up(cls):
+    rng = random.Random(7)
+    for size in (1, 2, 3, 50, 300):
+        nodes, parents = random_tree(cls, size, rng)
+        index = AncestorIndex(nodes[0])
+        for _ in range(300):
+            a, b = rng.choice(nodes), rng.choice(nodes)
+            up = ancestors(b, parents)
+            expected = next(node for node in ancestors(a, parents) if node in up)
+            assert index.lca(a, b) is expected
+            assert index.is_ancestor(a, b) == (a in up)
+            assert index.depth(a) == len(ancestors(a, parents)) - 1
+
+
+def test_unknown_node():
+    index = AncestorIndex(Node("root", left=[Node("a")]))
+    with pytest.raises(ValueError):
+        index.lca(index.root, Node("elsewhere"))
+
+
+def test_none_children_are_skipped():
+    a, b = Node("a"), Node("b")
+    root = Node("root", left=[None, a], right=[None, Node("c", left=[b])])
+    index = AncestorIndex(root)
+    assert index.lca(a, b) is root
+    assert index.depth(b) == 2
+
+
+def test_rebuilds_for_observable_trees():
+    a, b = Observed("a"), Observed("b")
+    root = Observed("root", left=[a, b])
+    index = AncestorIndex(root)
+    assert index.lca(a, b) is root
+    root.left.remove(b)
+    a.left.append(b)
+    assert index.lca(a, b) is a
+
+
+def test_rebuild():
+    a, b = Node("a"), Node("b")
+    root = Node("root", left=[a], right=[b])
+    index = AncestorIndex(root)
+    assert index.lca(a, b) is root
+    root.right.remove(b)
+    a.left.append(b)
+    index.rebuild()
+    assert index.lca(a, b) is a
@@ -0,0 +1,159 @@
+import pytest
+from gentry.arena import Arena
+from gentry.html import HTMLLayout
+from gentry.mermaid import Mermaid, Shape
+from gentry.tree import Count, Tree, Visitor
+
+
+class Node(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+def make_tree():
+    # root
+    # ├── left: a (right: c), None
+    # └── right: b
+    c = Leaf("c", properties={"x": 1}, shape=Shape.circle)
+    a = Node("a", right=[c])
+    b = Leaf("b")
+    return Node("root", left=[a, None], right=[b])
+
+
+def test_add_and_columns():
+    arena = Arena()
+    root = arena.add(Node, "root")
+    a = arena.add(Node, "a", root, "left")
+    b = arena.add(Leaf, "b", root, "right")
+    c = arena.add(Leaf, None, a, "left", {"x": 1})
+    assert len(arena) == 4
+    assert list(arena.parent) == [-1, root, root, a]
+    assert list(arena.children(root)) == [a, b]
+    assert arena.groups_of(root) == {"left": [a], "right": [b]}
+    assert arena.roots() == [root]
+    assert arena.node(c).label is None
+    assert arena.node(c).properties == {"x": 1}
+    assert [(i, d) for i, d in arena.iter_preorder()] == [(0, 0), (1, 1), (3, 2), (2, 1)]
+
+
+def test_add_invalid_parent():
+    arena = Arena()
+    with pytest.raises(ValueError):
+        arena.add(Node, "root", 0)
+    root = arena.add(Node, "root")
+    with pytest.raises(ValueError):
+        arena.add(Node, "child", root)
+    with pytest.raises(IndexError):
+        arena.node(1)
+
+
+def test_proxy_api():
+    arena = Arena.from_tree(make_tree())
+    root = arena.root
+    assert isinstance(root, Node) and isinstance(root, Tree)
+    assert root.__class__.__name__ == "Node"
+    assert root.label == "root"
+    assert not root.is_leaf()
+    assert [n.label for n in root.left] == ["a"]
+    assert [n.label for n in root.right] == ["b"]
+    c = root.left[0].right[0]
+    assert isinstance(c, Leaf)
+    assert c.is_leaf()
+    assert c.properties == {"x": 1}
+    assert c._ishape is Shape.circle
+    assert root._ishape is None
+    assert root.left[0] == arena.node(1)
+    assert len({root.left[0], arena.node(1)}) == 1
+
+
+def test_proxy_is_read_only():
+    root = Arena.from_tree(make_tree()).root
+    with pytest.raises(AttributeError):
+        root.label = "other"
+    with pytest.raises(AttributeError):
+        root.left = []
+    with pytest.raises(TypeError):
+        root.properties["y"] = 2
+
+
+def test_visitors_and_renderers_on_proxies():
+    tree = make_tree()
+    arena = Arena.from_tree(tree)
+
+    class Labels(Visitor):
+        def _do_labels(self, tree):
+            return tree.label
+
+    # the original tree has a None child that a Visitor can't handle, the arena skips it
+    tree.left.remove(None)
+    assert Labels(arena.root).visit() == Labels(tree).visit()
+    assert Count(arena.root).count() == 4
+
+    expected = str(tree)
+    assert str(arena.root) == expected
+
+
+def test_html_on_proxies():
+    class Box(Tree, HTMLLayout): ...
+
+    tree = Box("root", children={"g": [Box("child", properties={"k": "v"})]})
+    assert str(Arena.from_tree(tree).root) == str(tree)
+
+
+def test_compact_classes():
+    class C(Tree, compact=True):
+        _groups = {"kids"}
+
+    tree = C("root", kids=[C("a"), C("b", properties={"p": 1})])
+    arena = Arena.from_tree(tree)
+    assert tree.kids[0]._props is None  # conversion does not allocate properties
+    root = arena.root
+    assert isinstance(root, C)
+    assert [n.label for n in root.kids] == ["a", "b"]
+    assert root.kids[1].properties == {"p": 1}
+
+
+def test_to_tree_roundtrip():
+    class Custom(Node):
+        def __init__(self, label, extra):
+            super().__init__(label)
+            self.extra = extra
+
+    tree = make_tree()
+    tree.left.remove(None)
+    tree.right.append(Custom("custom", extra=42))
+    copy = Arena.from_tree(tree).to_tree()
+    assert copy is not tree
+    assert type(copy) is Node
+    assert [n.label for n in copy.left] == ["a"]
+    assert copy.left[0].right[0].properties == {"x": 1}
+    assert copy.left[0].right[0]._ishape is Shape.circle
+    assert copy.right[1].extra == 42
+    copy.left.append(Leaf("new"))  # regular nodes can be modified again
+    assert len(copy.left) == 2
+
+    expected = str(tree)
+    copy.left.pop()
+    assert str(copy) == expected
+
+
+def test_empty_groups():
+    tree = Node("r", left=[Node("a", right=[]), Node("b", left=[Leaf("c")], right=[])], right=[])
+    arena = Arena.from_tree(tree)
+    assert arena.groups_of(0) == {"left": [1, 2], "right": []}
+    assert arena.groups_of(2) == {"left": [3], "right": []}
+    assert str(arena.root) == str(tree)
+    assert str(arena.to_tree()) == str(tree)
+    assert arena.to_tree().left[0]._children == {"right": []}
+
+
+def test_add_group():
+    arena = Arena()
+    root = arena.add(Node, "root")
+    arena.add_group(root, "right")
+    a = arena.add(Leaf, "a", root, "left")
+    assert arena.groups_of(root) == {"right": [], "left": [a]}
+    with pytest.raises(IndexError):
+        arena.add_group(5, "left")
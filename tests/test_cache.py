@@ -0,0 +1,162 @@
+import io
+
+import pytest
+from gentry.cache import RenderCache
+from gentry.html import HTMLLayout
+from gentry.mermaid import Mermaid, MermaidContext
+from gentry.tree import Tree
+
+
+class Plain(Tree, Mermaid, HTMLLayout):
+    _groups = {"left", "right"}
+
+
+class Cached(Tree, Mermaid, HTMLLayout, observable=True):
+    _groups = {"left", "right"}
+
+
+class CompactCached(Tree, Mermaid, HTMLLayout, observable=True, compact=True):
+    _groups = {"left", "right"}
+
+
+def build(cls, depth=4, prefix="n"):
+    node = cls(prefix)
+    if depth > 1:
+        node.left = [build(cls, depth - 1, prefix + "l"), cls(prefix + "x")]
+        node.right = [build(cls, depth - 1, prefix + "r")]
+    return node
+
+
+def mermaid(node, **kwargs):
+    stream = io.StringIO()
+    node.write_mermaid(stream, **kwargs)
+    return stream.getvalue().replace(node.__class__.__name__, "N")
+
+
+def find(root, label):
+    return next(node for node, _, _ in root.iter_preorder() if node.label == label)
+
+
+class TestRenderCache:
+    def test_get_and_put(self):
+        cache = RenderCache(maxsize=2)
+        node = Cached("a")
+        assert cache.get(node, "k") is None
+        cache.put(node, "k", "value")
+        assert cache.get(node, "k") == "value"
+        assert cache.get(node, "other") is None
+        assert cache.cache_info() == (1, 2, 2, 1)
+
+    def test_version_change_invalidates(self):
+        cache = RenderCache()
+        node = Cached("a")
+        cache.put(node, "k", "value")
+        node.label = "b"
+        assert cache.get(node, "k") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = RenderCache(maxsize=2)
+        a, b, c = Cached("a"), Cached("b"), Cached("c")
+        cache.put(a, "k", 1)
+        cache.put(b, "k", 2)
+        cache.get(a, "k")  # b is now the least recently used
+        cache.put(c, "k", 3)
+        assert cache.get(b, "k") is None
+        assert cache.get(a, "k") == 1 and cache.get(c, "k") == 3
+        assert len(cache) == 2
+
+    def test_non_observable_nodes_are_not_cached(self):
+        cache = RenderCache()
+        node = Plain("a")
+        cache.put(node, "k", "value")
+        assert cache.get(node, "k") is None
+        assert cache.cache_info() == (0, 0, 4096, 0)
+
+    def test_clear(self):
+        cache = RenderCache()
+        node = Cached("a")
+        cache.put(node, "k", "value")
+        cache.get(node, "k")
+        cache.clear()
+        assert cache.cache_info() == (0, 0, 4096, 0)
+
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            RenderCache(maxsize=0)
+
+
+class TestCachedRendering:
+    @pytest.fixture(autouse=True)
+    def cache(self, monkeypatch):
+        cache = RenderCache()
+        monkeypatch.setattr(Cached, "_render_cache", cache)
+        monkeypatch.setattr(CompactCached, "_render_cache", cache)
+        return cache
+
+    def test_mermaid_output_is_unchanged(self, cache):
+        plain, cached = build(Plain), build(Cached)
+        assert mermaid(cached) == mermaid(plain)
+        assert mermaid(cached) == mermaid(plain)
+        assert cache.hits == 1  # the second time the whole graph comes from the cache
+
+    def test_mermaid_after_leaf_edit(self, cache):
+        plain, cached = build(Plain), build(Cached)
+        mermaid(cached)
+        for root in (plain, cached):
+            find(root, "nlrx").label = "edited"
+        misses = cache.misses
+        assert mermaid(cached) == mermaid(plain)
+        assert cache.misses - misses == 3  # only the ancestors of the edited leaf are rendered again
+        assert cache.hits >= 2
+
+    def test_mermaid_after_structural_edit(self, cache):
+        plain, cached = build(Plain), build(Cached)
+        mermaid(cached)
+        find(plain, "nll").right.append(Plain("new"))
+        find(cached, "nll").right.append(Cached("new"))
+        find(plain, "nr").properties["x"] = 1
+        find(cached, "nr").properties["x"] = 1
+        Plain._include_properties = Cached._include_properties = True
+        cache.clear()  # class variables are not tracked
+        try:
+            assert mermaid(cached) == mermaid(plain)
+        finally:
+            del Plain._include_properties, Cached._include_properties
+
+    def test_mermaid_with_context_and_parent_index(self, cache):
+        plain, cached = build(Plain), build(Cached)
+        for _ in range(2):
+            expected = mermaid(plain, parent_index=2, context=MermaidContext(5))
+            assert mermaid(cached, parent_index=2, context=MermaidContext(5)) == expected
+        assert mermaid(cached) == mermaid(plain)
+
+    def test_mermaid_explicit_cache(self):
+        cache = RenderCache()
+        plain, cached = build(Plain), build(Cached)
+        assert mermaid(cached, cache=cache) == mermaid(plain)
+        assert len(cache) > 0
+
+    def test_html_after_leaf_edit(self, cache):
+        plain, cached = build(Plain), build(Cached)
+        assert cached._box() == plain._box()
+        for root in (plain, cached):
+            find(root, "nrrx").label = "edited"
+        misses = cache.misses
+        assert cached._box() == plain._box()
+        assert cache.misses - misses == 3
+        assert HTMLLayout.__str__(cached) == HTMLLayout.__str__(plain)
+
+    @pytest.mark.parametrize("cls", [Cached, CompactCached])
+    def test_empty_groups_invalidate(self, cls):
+        def make(cls):
+            return cls("root", left=[cls("a", left=[cls("b")]), cls("c", left=[cls("d")])])
+
+        plain, cached = make(Plain), make(cls)
+        before = mermaid(cached), cached._box()
+        for root in (plain, cached):
+            assert root.left[0].right == []  # reading a missing group creates it
+            root.left[1].right = []
+        assert (mermaid(cached), cached._box()) != before  # empty groups are rendered next to non-empty ones
+        assert mermaid(cached) == mermaid(plain)
+        assert cached._box() == plain._box()
@@ -0,0 +1,164 @@
+import copy
+
+import pytest
+from gentry.clone import PersistentTree, clone
+from gentry.mermaid import Mermaid, Shape
+from gentry.structure import StructuralHasher, dedupe
+from gentry.tree import Count, Tree
+
+
+class Node(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+class Compact(Tree, Mermaid, compact=True):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class Slotted(Tree):
+    __slots__ = ("weight",)
+    _groups = {"left", "right"}
+
+
+def make_tree(cls=Node, leaf=Leaf):
+    return cls(
+        "root",
+        left=[cls("a", right=[leaf("c", properties={"x": [1]})]), None],
+        right=[leaf("b"), leaf("d", properties={"y": 2})],
+    )
+
+
+def same(a, b):
+    return StructuralHasher().equal(a, b)
+
+
+def nodes(root):
+    return [node for node, _, _ in root.iter_preorder()]
+
+
+@pytest.mark.parametrize("classes", [(Node, Leaf), (Compact, Compact), (Observed, Observed), (Slotted, Slotted)])
+def test_clone(classes):
+    tree = make_tree(*classes)
+    copied = tree.clone()
+    assert same(copied, tree)
+    assert not {id(node) for node in nodes(copied)} & {id(node) for node in nodes(tree)}
+    assert type(copied.left[0].right[0]) is classes[1] and copied.left[1] is None
+    c = copied.left[0].right[0]
+    assert c.properties == {"x": [1]} and c.properties is not tree.left[0].right[0].properties
+    assert c.properties["x"] is tree.left[0].right[0].properties["x"]  # a shallow copy
+    copied.left[0].label = "changed"
+    copied.right.append(classes[1]("new"))
+    assert tree.left[0].label == "a" and len(tree.right) == 2
+
+
+def test_share_properties():
+    tree = make_tree()
+    copied = clone(tree, share_properties=True)
+    assert copied.left[0].right[0].properties is tree.left[0].right[0].properties
+    assert copied.right is not tree.right
+
+
+def test_attributes():
+    tree = Node("root", left=[Leaf("a", shape=Shape.circle)])
+    assert clone(tree).left[0]._ishape is Shape.circle
+    compact = Compact("root", left=[Compact("a", shape=Shape.circle)])
+    copied = clone(compact)
+    assert copied.left[0]._ishape is Shape.circle and copied.left[0]._props is None
+    slotted = Slotted("root")
+    slotted.weight = 3
+    assert clone(slotted).weight == 3
+
+
+def test_observable():
+    tree = make_tree(Observed, Observed)
+    copied = clone(tree, share_properties=True)
+    c = copied.left[0].right[0]
+    assert c.parent is copied.left[0] and c.position == ("right", 0)
+    assert c.properties is not tree.left[0].right[0].properties  # always their own
+    generation = copied.generation
+    c.label = "changed"
+    assert copied.generation == generation + 1 and tree.left[0].right[0].label == "c"
+
+
+def test_shared_subtrees():
+    tree = Node("root", left=[Node("a", left=[Leaf("b")])], right=[Node("a", left=[Leaf("b")])])
+    dedupe(tree)
+    copied = clone(tree)
+    assert copied.left[0] is copied.right[0] and copied.left[0] is not tree.left[0]
+
+
+def test_deep_tree():
+    node = Leaf("leaf")
+    for i in range(50000):
+        node = Node(str(i), left=[node])
+    assert same(clone(node), node)
+
+
+def test_same_as_deepcopy():
+    tree = make_tree()
+    assert same(clone(tree), copy.deepcopy(tree))
+    assert str(clone(tree)) == str(tree)
+
+
+def test_persistent_edit():
+    tree = make_tree()
+    base = PersistentTree(tree)
+    assert len(base) == 1 and base.root is not tree
+    assert base.root.left[0] is tree.left[0]  # shared
+    version = base.fork()
+    node = version.edit([("left", 0), ("right", 0)])
+    node.label = "changed"
+    node.properties["x"] = "new"
+    assert len(version) == 3
+    assert version.root.left[0].right[0].label == "changed"
+    assert base.root.left[0].right[0].label == "c" and tree.left[0].right[0].properties == {"x": [1]}
+    assert version.root.right[0] is tree.right[0]  # off the path, still shared
+    assert Count(version.root).count() == Count(tree).count()
+
+
+def test_persistent_edit_again():
+    base = PersistentTree(make_tree())
+    version = base.fork()
+    first = version.edit([("left", 0)])
+    assert version.edit([("left", 0)]) is first  # already owned, not copied again
+    version.edit([("left", 0), ("right", 0)])
+    assert version.root.left[0] is first and len(version) == 3
+    first.right.append(Leaf("added"))
+    assert len(base.root.left[0].right) == 1
+
+
+def test_persistent_fork_copies_again():
+    base = PersistentTree(make_tree())
+    base.edit([("right", 1)]).label = "base"
+    version = base.fork()
+    version.edit([("right", 1)]).label = "version"
+    assert base.root.right[1].label == "base"
+    base.edit().properties["root"] = True  # the roots share their properties until edited
+    assert "root" not in version.root.properties
+    base.edit([("right", 1)]).label = "again"
+    assert version.root.right[1].label == "version"
+
+
+def test_persistent_compact():
+    tree = make_tree(Compact, Compact)
+    version = PersistentTree(tree)
+    version.edit([("left", 0), ("right", 0)]).properties["x"] = 2
+    assert tree.left[0].right[0].properties == {"x": [1]}
+    version.edit([("right", 0)]).properties["y"] = 1
+    assert tree.right[0]._props is None
+
+
+def test_persistent_errors():
+    version = PersistentTree(make_tree())
+    for path in ([("left", 1)], [("left", 5)], [("other", 0)]):
+        with pytest.raises(IndexError):
+            version.edit(path)
+    with pytest.raises(TypeError):
+        PersistentTree(make_tree(Observed, Observed))
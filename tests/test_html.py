@@ -27,3 +27,12 @@ def test_html_str_with_children():
     assert '<div class="parent"><div class="nodename">parent</div></div>' in result
     assert '<div class="groupname">group</div>' in result
     assert '<div class="leaf"><div class="nodename">child</div></div>' in result
+
+
+def test_html_compact_node():
+    class CompactNode(Tree, HTMLLayout, compact=True): ...
+
+    child = CompactNode(label="child")
+    node = CompactNode(label="parent", children={"group": [child]})
+    assert not hasattr(node, "__dict__")
+    assert '<div class="leaf"><div class="nodename">child</div></div>' in str(node)
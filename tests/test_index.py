@@ -0,0 +1,175 @@
+import random
+
+import pytest
+from gentry.index import TreeIndex
+from gentry.tree import Tree
+
+
+class Node(Tree):
+    _groups = {"left", "right"}
+
+
+class Child(Node):
+    pass
+
+
+class Grandchild(Child):
+    pass
+
+
+class Compact(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class ObservedChild(Observed):
+    pass
+
+
+class ObservedCompact(Tree, compact=True, observable=True):
+    _groups = {"left", "right"}
+
+
+def build(cls, depth=4, prefix="n", leaf=None):
+    node = cls(prefix, properties={"kind": "loop" if depth % 2 else "block", "depth": depth})
+    if depth > 1:
+        node.left = [build(cls, depth - 1, prefix + "l", leaf), (leaf or cls)(prefix + "x")]
+        node.right = [build(cls, depth - 1, prefix + "r", leaf)]
+    return node
+
+
+def walk(root, predicate):
+    return [node for node, _, _ in root.iter_preorder() if predicate(node)]
+
+
+def same(nodes, expected):
+    return sorted(map(id, nodes)) == sorted(map(id, expected))
+
+
+class TestTreeIndex:
+    @pytest.mark.parametrize("cls", [Node, Compact, Observed])
+    def test_lookups(self, cls):
+        root = build(cls)
+        index = TreeIndex(root, properties=("kind", "depth"))
+        assert len(index) == len(walk(root, lambda node: True))
+        assert index.by_label("nlr") == walk(root, lambda node: node.label == "nlr")
+        assert index.by_label("missing") == []
+        assert index.by_property("kind", "loop") == walk(root, lambda node: node.properties.get("kind") == "loop")
+        assert index.by_property("depth", 2) == walk(root, lambda node: node.properties.get("depth") == 2)
+        assert index.by_class(cls) == walk(root, lambda node: True)
+
+    def test_by_class_includes_subclasses(self):
+        root = Node("root", left=[Child("c", left=[Grandchild("g")]), Node("n")], right=[Grandchild("h")])
+        index = TreeIndex(root)
+        assert [node.label for node in index.by_class(Node)] == ["root", "n", "c", "g", "h"]
+        assert sorted(node.label for node in index.by_class(Child)) == ["c", "g", "h"]
+        assert [node.label for node in index.by_class(Child, subclasses=False)] == ["c"]
+        assert sorted(node.label for node in index.by_class("Child")) == ["c", "g", "h"]
+        assert [node.label for node in index.by_class("Grandchild", subclasses=False)] == ["g", "h"]
+        assert index.by_class(Observed) == []
+
+    def test_property_not_indexed(self):
+        index = TreeIndex(build(Node), properties=("kind",))
+        with pytest.raises(KeyError):
+            index.by_property("depth", 2)
+
+    def test_unhashable_values_are_skipped(self):
+        root = Node("root", left=[Node("a", properties={"kind": ["list"]})])
+        index = TreeIndex(root, properties=("kind",))
+        assert index.by_property("kind", ["list"]) == []
+        assert len(index) == 2
+
+    def test_compact_properties_are_not_allocated(self):
+        root = Compact("root", left=[Compact("a")])
+        TreeIndex(root, properties=("kind",))
+        assert root.left[0]._props is None
+
+    def test_rebuild(self):
+        root = build(Node)
+        index = TreeIndex(root, properties=("kind",))
+        root.left[0].label = "changed"
+        assert index.by_label("changed") == []
+        index.rebuild()
+        assert index.by_label("changed") == [root.left[0]]
+
+    def test_incremental_needs_observable_nodes(self):
+        with pytest.raises(ValueError):
+            TreeIndex(build(Node), incremental=True)
+
+
+class TestIncrementalIndex:
+    @pytest.fixture(params=[Observed, ObservedCompact], ids=["regular", "compact"])
+    def cls(self, request):
+        return request.param
+
+    def test_follows_changes(self, cls):
+        root = build(cls)
+        index = TreeIndex(root, properties=("kind",), incremental=True)
+        node = root.left[0].right[0]
+        node.label = "renamed"
+        node.properties["kind"] = "switch"
+        assert index.by_label("renamed") == [node]
+        assert index.by_label("nlr") == []
+        assert index.by_property("kind", "switch") == [node]
+        removed = root.right.pop()
+        assert index.by_label(removed.label) == []
+        assert all(found is not removed for found in index.by_class(cls))
+        root.right = [cls("new", left=[cls("newer", properties={"kind": "loop"})])]
+        assert index.by_label("newer") == root.right[0].left
+        assert len(index) == len(walk(root, lambda node: True))
+
+    def test_moved_subtree_stays_indexed(self, cls):
+        root = build(cls)
+        index = TreeIndex(root, incremental=True)
+        subtree = root.left.pop(0)
+        root.right[0].right.append(subtree)
+        assert index.by_label("nll") == walk(root, lambda node: node.label == "nll")
+        assert len(index) == len(walk(root, lambda node: True))
+
+    def test_subclasses(self):
+        root = build(Observed, leaf=ObservedChild)
+        index = TreeIndex(root, incremental=True)
+        children = index.by_class(ObservedChild)
+        assert children and all(type(node) is ObservedChild for node in children)
+        root.left.append(ObservedChild("extra"))
+        assert index.by_class(ObservedChild) == children + [root.left[-1]]
+
+    def test_untouched_subtrees_are_skipped(self, cls):
+        root = build(cls, depth=8)
+        index = TreeIndex(root, incremental=True)
+        seen = []
+        values = index._values
+        index._values = lambda node: seen.append(node) or values(node)
+        root.left[0].left[0].label = "changed"
+        assert index.by_label("changed") == [root.left[0].left[0]]
+        assert seen == [root, root.left[0], root.left[0].left[0]]  # the changed node and its ancestors
+
+    def test_random_edits(self, cls):
+        rng = random.Random(42)
+        root = build(cls, depth=6)
+        index = TreeIndex(root, properties=("kind",), incremental=True)
+        for step in range(200):
+            nodes = walk(root, lambda node: True)
+            node = rng.choice(nodes)
+            action = rng.randrange(4)
+            if action == 0:
+                node.label = f"label{rng.randrange(10)}"
+            elif action == 1:
+                node.properties["kind"] = rng.choice(["loop", "block", "switch"])
+            elif action == 2 and node is not root:
+                parent = next(n for n in nodes if any(c is node for c in n.left + n.right))
+                group = parent.left if any(c is node for c in parent.left) else parent.right
+                group.remove(node)
+            else:
+                node.right.append(cls(f"label{rng.randrange(10)}", properties={"kind": "loop"}))
+            for label in (f"label{i}" for i in range(10)):
+                assert same(index.by_label(label), walk(root, lambda n, label=label: n.label == label))
+            for kind in ("loop", "block", "switch"):
+                assert same(
+                    index.by_property("kind", kind), walk(root, lambda n, kind=kind: n.properties.get("kind") == kind)
+                )
+            assert len(index) == len(walk(root, lambda node: True))
+            assert len(index._memo) == len(index)
@@ -0,0 +1,189 @@
+import io
+import json
+
+import pytest
+from gentry import jsonstream
+from gentry.jsonstream import dump, dumps, load, loads, schema
+from gentry.mermaid import Mermaid
+from gentry.structure import StructuralHasher
+from gentry.tree import Tree
+
+
+class Node(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+class Compact(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class Family(Tree):
+    def __init__(self, label, kids: list[Tree] | None = None, **kwargs):
+        super().__init__(label, kids=kids or [], **kwargs)
+
+
+CLASSES = [Node, Leaf, Compact, Observed, Family]
+
+
+def make_tree(cls=Node, leaf=Leaf):
+    return cls(
+        "root",
+        left=[cls("a", right=[leaf("c", properties={"x": 1, "y": [1.5, None, "ü"]})]), None],
+        right=[leaf(None), leaf(42, properties={"nested": {"z": True}})],
+    )
+
+
+def same(a, b):
+    return StructuralHasher().equal(a, b)
+
+
+@pytest.mark.parametrize("classes", [(Node, Leaf), (Compact, Compact), (Observed, Observed)])
+def test_roundtrip(classes):
+    tree = make_tree(*classes)
+    copy = loads(dumps(tree), CLASSES)
+    assert copy is not tree and same(copy, tree)
+    assert type(copy.left[0].right[0]) is classes[1]
+    assert copy.left[1] is None
+    assert copy.right[0].label is None and copy.right[1].label == 42
+
+
+def test_format():
+    document = json.loads(dumps(make_tree()))
+    assert document["class"] == "Node" and document["label"] == "root"
+    assert "properties" not in document
+    assert document["left"][1] is None
+    assert document["right"][1] == {"class": "Leaf", "label": 42, "properties": {"nested": {"z": True}}}
+
+
+def test_any_key_order_and_whitespace():
+    text = """
+        { "left" : [ { "label" : "a" , "class" : "Leaf" } , null ] ,
+          "properties" : { "p" : [ 1 , 2 ] } , "class" : "Node" }
+    """
+    tree = loads(text, CLASSES)
+    assert tree.label is None and tree.properties == {"p": [1, 2]}
+    assert tree.left[0].label == "a" and tree.left[1] is None
+
+
+def test_annotated_groups():
+    tree = Family("root", kids=[Family("a"), Family("b", kids=[Family("c")])])
+    copy = loads(dumps(tree), CLASSES, strict=True)
+    assert same(copy, tree) and copy.kids[1].kids[0].label == "c"
+
+
+@pytest.mark.parametrize("cls", [Node, Compact, Observed])
+def test_empty_groups(cls):
+    tree = cls("root", left=[cls("a")], right=[])
+    assert json.loads(dumps(tree))["right"] == []
+    copy = loads(dumps(tree), CLASSES)
+    assert dict(copy._children) == {"left": [copy.left[0]], "right": []}
+
+
+def test_observable_tree():
+    copy = loads(dumps(make_tree(Observed, Observed)), CLASSES)
+    assert copy.left[0].right[0].parent is copy.left[0]
+    assert copy.right[1].position == ("right", 1)
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 11, 64])
+def test_chunk_boundaries(monkeypatch, chunk):
+    monkeypatch.setattr(jsonstream, "_CHUNK", chunk)
+    tree = make_tree()
+    tree.properties["long"] = "x" * 50
+    tree.properties["number"] = 1234567.125
+    tree.left[0].label = 'say "hi"\n'
+    tree.left[0].right[0].properties['key "quoted"'] = None
+    text = dumps(tree)
+    assert same(load(io.StringIO(text), CLASSES), tree)
+    assert same(load(io.BytesIO(text.encode()), CLASSES), tree)
+
+
+@pytest.mark.parametrize("chunk", [2, 5, 13, 64])
+def test_numbers_at_chunk_boundaries(monkeypatch, chunk):
+    # numbers that are cut after their integer part, exponent or sign look complete to the JSON decoder
+    monkeypatch.setattr(jsonstream, "_CHUNK", chunk)
+    values = [1.25, -1, -12.5, 1e-07, 2.5e300, -0.0, 10, 123456789.5]
+    for padding in range(chunk):
+        tree = Node("x" * padding, left=[Leaf(value, properties={"value": value, "list": [value, -value]}) for value in values])
+        text = dumps(tree)
+        assert same(load(io.StringIO(text), CLASSES), tree)
+
+
+def test_file(tmp_path):
+    path = tmp_path / "tree.json"
+    with open(path, "w", encoding="utf-8") as f:
+        dump(make_tree(), f, chunk=10)
+    with open(path, "rb") as f:
+        assert same(load(f, CLASSES), make_tree())
+
+
+def test_deep_tree():
+    node = Leaf("leaf")
+    for i in range(50000):
+        node = Node(str(i), left=[node])
+    assert same(loads(dumps(node), CLASSES), node)
+
+
+def test_classes():
+    text = dumps(make_tree())
+    with pytest.raises(ValueError, match="Leaf is not available"):
+        loads(text, [Node])
+    assert type(loads(text, {"Node": Compact, "Leaf": Compact})) is Compact
+
+    other = type("Node", (Tree,), {"_groups": {"left", "right"}})
+    with pytest.raises(ValueError, match="Node is ambiguous"):
+        loads(text, CLASSES + [other])
+
+
+def test_strict():
+    text = '{"class": "Family", "other": []}'
+    assert loads(text, CLASSES).label is None
+    with pytest.raises(ValueError, match="Family has no group other"):
+        loads(text, CLASSES, strict=True)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "[]",
+        "{}",
+        '{"label": "a"}',
+        '{"class": "Node",}',
+        '{"class": "Node" "label": "a"}',
+        '{"class": "Node", "left": {}}',
+        '{"class": "Node", "left": [1]}',
+        '{"class": "Node", "left": [null,]}',
+        '{"class": "Node", "properties": []}',
+        '{"class": ["Node"]}',
+        '{"class": "Node", "label": "a"} {}',
+        '{"class": "Node", "label": "a',
+        '{"class": "Node", "left": [{"class": "Leaf"}',
+    ],
+)
+def test_invalid(text):
+    with pytest.raises(ValueError):
+        loads(text, CLASSES)
+
+
+def test_unsupported_value():
+    with pytest.raises(TypeError):
+        dumps(Node("root", properties={"x": object()}))
+
+
+def test_schema():
+    result = schema([Node, Family])
+    assert result["$defs"]["Node"]["properties"]["left"]["type"] == "array"
+    assert set(result["$defs"]["Family"]["properties"]) == {"class", "label", "properties", "kids"}
+    assert result["$defs"]["node"] == {"oneOf": [{"$ref": "#/$defs/Node"}, {"$ref": "#/$defs/Family"}]}
+    jsonschema = pytest.importorskip("jsonschema")
+    jsonschema.validate(json.loads(dumps(make_tree(Node, Node))), result)
+    with pytest.raises(jsonschema.ValidationError):
+        jsonschema.validate({"class": "Node", "kids": []}, result)
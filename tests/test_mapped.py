@@ -0,0 +1,182 @@
+import io
+
+import pytest
+from gentry.arena import Arena
+from gentry.mapped import MappedTree, write
+from gentry.mermaid import Mermaid, Shape
+from gentry.structure import StructuralHasher
+from gentry.tree import Count, Tree, Visitor
+
+
+class Node(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+class Compact(Tree, compact=True):
+    _groups = {"kids"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"kids"}
+
+
+def make_tree():
+    # root
+    # ├── left: a (right: c), None
+    # └── right: b, ü
+    c = Leaf("c", properties={"x": 1, "y": [1.5, None]}, shape=Shape.circle)
+    a = Node("a", right=[c])
+    return Node("root", left=[a, None], right=[Leaf("b"), Leaf("ü")])
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    path = tmp_path / "tree.gmap"
+    assert write(make_tree(), path) == 5
+    with MappedTree(path) as tree:
+        yield tree
+
+
+def test_proxy_api(mapped):
+    root = mapped.root
+    assert len(mapped) == 5
+    assert isinstance(root, Node) and root.__class__.__name__ == "Node"
+    assert root.label == "root" and not root.is_leaf()
+    assert [n.label for n in root.left] == ["a"]
+    assert [n.label for n in root.right] == ["b", "ü"]
+    c = root.left[0].right[0]
+    assert isinstance(c, Leaf) and c.is_leaf()
+    assert c.properties == {"x": 1, "y": [1.5, None]}
+    assert c._ishape is Shape.circle and root._ishape is None
+    assert root.properties == {}
+    assert root.left[0] == mapped.node(1)
+
+
+def test_same_as_arena(mapped):
+    tree = make_tree()
+    tree.left.remove(None)
+    arena = Arena.from_tree(tree)
+    assert str(mapped.root) == str(arena.root) == str(tree)
+
+    class Labels(Visitor):
+        def _do_labels(self, tree):
+            return tree.label
+
+    assert Labels(mapped.root).visit() == Labels(arena.root).visit()
+    assert Count(mapped.root).count() == 5
+
+
+def test_read_only(mapped):
+    with pytest.raises(AttributeError):
+        mapped.root.label = "other"
+    with pytest.raises(TypeError):
+        mapped.root.properties["y"] = 2
+
+
+def test_indices(mapped):
+    # nodes are numbered level by level
+    assert [mapped.node(i).label for i in range(5)] == ["root", "a", "b", "ü", "c"]
+    assert mapped.children(0) == [1, 2, 3]
+    assert mapped.groups_of(0) == {"left": [1], "right": [2, 3]}
+    assert list(mapped.iter_preorder()) == [(0, 0), (1, 1), (4, 2), (2, 1), (3, 1)]
+    with pytest.raises(IndexError):
+        mapped.node(5)
+
+
+def test_label_bytes(mapped):
+    view = mapped.label_bytes(mapped.node(3))
+    assert isinstance(view, memoryview) and bytes(view) == "ü".encode()
+    assert bytes(mapped.label_bytes(0)) == b"root"
+
+
+def test_to_tree(mapped):
+    copy = mapped.to_tree()
+    expected = make_tree()
+    expected.left.remove(None)
+    assert StructuralHasher().equal(copy, expected)
+    assert copy.left[0].right[0]._ishape is Shape.circle
+    assert type(mapped.to_tree(1)) is Node and mapped.to_tree(1).right[0].label == "c"
+
+
+def test_empty_groups(tmp_path):
+    path = tmp_path / "tree.gmap"
+    tree = Node("r", left=[Node("a", right=[]), Node("b", right=[Leaf("c", properties={"x": 1})], left=[])], right=[])
+    write(tree, path)
+    with MappedTree(path) as mapped:
+        assert mapped.groups_of(0) == {"left": [1, 2], "right": []}
+        assert mapped.groups_of(2) == {"right": [3], "left": []}
+        assert mapped.root.left[0].right == () and mapped.root.left[1].right[0].properties == {"x": 1}
+        assert str(mapped.root) == str(tree)
+        copy = mapped.to_tree()
+    assert StructuralHasher().equal(copy, tree)
+    assert str(copy) == str(tree)
+
+
+@pytest.mark.parametrize("cls", [Compact, Observed])
+def test_compact_and_observable(tmp_path, cls):
+    path = tmp_path / "tree.gmap"
+    write(cls("root", kids=[cls("a", kids=[cls("b")], properties={"p": 1})]), path)
+    with MappedTree(path) as tree:
+        assert tree.root.kids[0].kids[0].label == "b"
+        copy = tree.to_tree()
+    assert type(copy) is cls and copy.kids[0].properties == {"p": 1}
+    if cls is Observed:
+        assert copy.kids[0].kids[0].parent is copy.kids[0]
+
+
+def test_file_object():
+    buffer = io.BytesIO()
+    assert write(make_tree(), buffer) == 5
+    assert buffer.getvalue().startswith(b"GNTM")
+
+
+def test_deep_tree(tmp_path):
+    node = Leaf("leaf")
+    for i in range(20000):
+        node = Node(str(i), left=[node])
+    write(node, tmp_path / "deep.gmap")
+    with MappedTree(tmp_path / "deep.gmap") as tree:
+        assert max(depth for _, depth in tree.iter_preorder()) == 20000
+        assert StructuralHasher().equal(tree.to_tree(), node)
+
+
+def test_labels_must_be_strings(tmp_path):
+    with pytest.raises(TypeError):
+        write(Node(42), tmp_path / "tree.gmap")
+
+
+def test_invalid_files(tmp_path):
+    path = tmp_path / "tree.gmap"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        MappedTree(path)
+    path.write_bytes(b"x" * 1000)
+    with pytest.raises(ValueError):
+        MappedTree(path)
+    write(make_tree(), path)
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+    with pytest.raises(ValueError):
+        MappedTree(path)
+
+
+def test_classes(tmp_path):
+    path = tmp_path / "tree.gmap"
+    write(make_tree(), path)
+    with pytest.raises(ValueError, match="not available"):
+        MappedTree(path, classes=[Node])
+    with MappedTree(path, classes=[Node, Leaf, Shape]) as tree:
+        assert tree.root.left[0].right[0]._ishape is Shape.circle
+
+
+def test_closed(tmp_path):
+    path = tmp_path / "tree.gmap"
+    write(make_tree(), path)
+    tree = MappedTree(path)
+    root = tree.root
+    tree.close()
+    with pytest.raises(ValueError):
+        assert root.label == "root"
@@ -1,5 +1,7 @@
+import io
+
 import pytest  # noqa: F401 
-from gentry.mermaid import Mermaid, Shape, Style
+from gentry.mermaid import Mermaid, MermaidContext, Shape, Style
 from gentry.tree import Tree
 
 
@@ -40,3 +42,108 @@ def test_mermaid_str_with_styles_and_shapes():
     result = str(node)
     assert "shape: circle" in result
     assert "function" in result
+
+
+def test_mermaid_compact_node():
+    class CompactNode(Tree, Mermaid, compact=True): ...
+
+    child = CompactNode(label="child", shape=Shape.circle)
+    node = CompactNode(label="parent", children={"group": [child]})
+    assert not hasattr(node, "__dict__")
+    result = str(node)
+    assert "parent" in result
+    assert 'shape: circle, label: "child"' in result
+
+
+def make_nested_tree():
+    leaf = DummyNode(label="leaf", properties={"x": 1}, include_properties=True)
+    mid = DummyNode(label="mid", children={"inner": [leaf]}, style=Style.loop)
+    return DummyNode(label="root", children={"a": [mid, DummyNode(label="-other")], "b": [None]})
+
+
+EXPECTED_NESTED = (
+    "```mermaid\ngraph TD\n\tclassDef keyword fill:#dFd\n"
+    "\tclassDef function fill:#bff,font-size:20px,stroke-width:2px,font-weight:bold\n"
+    "\tclassDef loop fill:#fdd\n\tclassDef operator font-weight:bold,font-size:20px\n"
+    "\tclassDef constant color:#3a3\n\tclassDef variable color:#a33\n"
+    "\tclassDef subgraph_even fill:#eff\n\tclassDef subgraph_odd fill:#eee\n\n"
+    "    subgraph0:::subgraph_odd\n"
+    '    DummyNode0@{shape: rounded, label: "root"} --> subgraph0\n'
+    "    subgraph subgraph0[a]\n"
+    "            direction TB\n\n"
+    "        subgraph2:::subgraph_even\n"
+    '        DummyNode1:::loop@{shape: rounded, label: "mid"} --> subgraph2\n'
+    "        subgraph subgraph2[inner]\n"
+    "                direction TB\n\n"
+    '        DummyNode4@{shape: rounded, label: "leaf\\n(x=1)"}\n'
+    "        end\n"
+    '    DummyNode5@{shape: rounded, label: "\\\\-other"}\n'
+    "    end\n"
+    "    subgraph5:::subgraph_odd\n"
+    '    DummyNode0@{shape: rounded, label: "root"} --> subgraph5\n'
+    "    subgraph subgraph5[b]\n"
+    "            direction TB\n\n"
+    "    end\n"
+    "```"
+)
+
+
+def test_mermaid_str_nested_output():
+    assert str(make_nested_tree()) == EXPECTED_NESTED
+
+
+def test_write_mermaid_matches_str():
+    root = make_nested_tree()
+    stream = io.StringIO()
+    root.write_mermaid(stream)
+    assert stream.getvalue() == EXPECTED_NESTED
+
+
+def test_write_mermaid_deep_tree():
+    depth = 5000
+    node = DummyNode(label="leaf")
+    for i in range(depth):
+        node = DummyNode(label=f"n{i}", children={"g": [node]})
+    stream = io.StringIO()
+    node.write_mermaid(stream)
+    output = stream.getvalue()
+    assert output.count("direction TB") == depth
+    assert output.count("end\n") == depth
+    assert "leaf" in output
+
+
+def test_mermaid_rendering_is_deterministic():
+    first, second = make_nested_tree(), make_nested_tree()
+    assert str(first) == EXPECTED_NESTED
+    str(DummyNode(label="other", children={"g": [DummyNode(label="x")]}))  # advances any shared numbering
+    assert str(second) == EXPECTED_NESTED
+    assert str(first) == EXPECTED_NESTED
+
+
+def test_write_mermaid_with_context():
+    root = make_nested_tree()
+    context = MermaidContext()
+    root.write_mermaid(io.StringIO(), context=context)
+    assert context.index == 6
+
+    stream = io.StringIO()
+    root.write_mermaid(stream, context=context)
+    assert "subgraph6:::subgraph_odd" in stream.getvalue()
+    assert context.index == 12
+
+
+def test_mermaid_concurrent_rendering():
+    from concurrent.futures import ThreadPoolExecutor
+
+    def build(n):
+        node = DummyNode(label=f"leaf{n}")
+        for i in range(n % 7 + 1):
+            children = {"a": [node, DummyNode(label="x")], "b": [DummyNode(label="y")]}
+            node = DummyNode(label=f"n{i}", children=children)
+        return node
+
+    trees = [build(n) for n in range(300)]
+    expected = [str(tree) for tree in trees]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for _ in range(3):
+            assert list(pool.map(str, trees)) == expected
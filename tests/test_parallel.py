@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from gentry.parallel import _partition, _subtree_info, visit_parallel, visit_threaded
+from gentry.tree import Reducer, Tree, Visitor
+
+
+# nodes and visitors are defined at module level, so worker processes can unpickle them
+class Node(Tree):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class Describe(Visitor):
+    def _do_describe(self, tree):
+        return f"{tree.label}:{len(tree.properties)}"
+
+    def _do_describe_Observed(self, tree):
+        return tree.label.upper()
+
+
+class Height(Reducer):
+    def _do_height(self, tree, results):
+        return 1 + max(results, default=0)
+
+
+def build(cls, depth, label="n"):
+    node = cls(label, properties={"depth": depth})
+    if depth > 1:
+        node.left = [build(cls, depth - 1, label + "l"), cls(label + "x")]
+        node.right = [build(cls, depth - 1, label + "r")]
+    return node
+
+
+@pytest.mark.parametrize("cls", [Node, Observed])
+def test_parallel_visit_equals_sequential(cls):
+    root = build(cls, 10)
+    expected = Describe(root).visit()
+    visitor = Describe(root)
+    assert visit_parallel(visitor, max_workers=3, min_size=100) == expected
+    assert visitor.result == expected
+
+
+def test_parallel_visit_deep_tree():
+    node = Node("leaf")
+    for i in range(500):
+        node = Node(f"n{i}", left=[node], right=[build(Node, 3)])
+    expected = Describe(node).visit()
+    result = visit_parallel(Describe(node), max_workers=2, min_size=100)
+    for _ in range(500):  # compare level by level, == on the whole result would recurse too deep
+        assert result["Node"] == expected["Node"]
+        assert result["children"]["right"] == expected["children"]["right"]
+        result, expected = result["children"]["left"][0], expected["children"]["left"][0]
+    assert result == expected
+
+
+def test_parallel_visit_with_executor():
+    root = build(Node, 9)
+    with ProcessPoolExecutor(2) as executor:
+        for _ in range(2):
+            assert visit_parallel(Describe(root), 2, min_size=100, executor=executor) == Describe(root).visit()
+        with pytest.raises(ValueError):
+            visit_parallel(Describe(root), min_size=100, executor=executor)
+
+
+def test_small_trees_are_visited_sequentially(monkeypatch):
+    import gentry.parallel
+
+    monkeypatch.setattr(gentry.parallel, "ProcessPoolExecutor", None)  # would fail if used
+    root = build(Node, 5)
+    assert visit_parallel(Describe(root), max_workers=4) == Describe(root).visit()
+    assert visit_parallel(Describe(root), max_workers=1, min_size=1) == Describe(root).visit()
+
+
+def test_partition_covers_tree():
+    root = build(Node, 8)
+    info = _subtree_info(root)
+    assert info[id(root)] == (sum(1 for _ in root.iter_preorder()), 8)
+    tasks = _partition(root, info, 20)
+    assert all(info[id(task)][0] <= 20 for task in tasks)
+    covered = sum(info[id(task)][0] for task in tasks)
+    assert covered < info[id(root)][0]  # the rest is visited at the top
+
+
+def test_parallel_visit_rejects_reducers():
+    with pytest.raises(TypeError):
+        visit_parallel(Height(build(Node, 3)))
+
+
+class Slow(Visitor):
+    """Yields to other threads at every node, to provoke races."""
+
+    def _do_slow(self, tree):
+        time.sleep(0)
+        return (tree.label, sorted(tree.properties.items()))
+
+
+@pytest.mark.parametrize("cls", [Node, Observed])
+def test_threaded_visit_equals_sequential(cls):
+    root = build(cls, 10)
+    expected = Describe(root).visit()
+    visitor = Describe(root)
+    assert visit_threaded(visitor, max_workers=4, min_size=100) == expected
+    assert visitor.result == expected
+
+
+def test_threaded_visit_is_deterministic():
+    roots = [build(Node, depth) for depth in (6, 8, 9)]
+    expected = [Slow(root).visit() for root in roots]
+    with ThreadPoolExecutor(8) as executor:
+        for _ in range(10):
+            for root, result in zip(roots, expected):
+                assert visit_threaded(Slow(root), max_workers=8, min_size=10, executor=executor) == result
+        with pytest.raises(ValueError):
+            visit_threaded(Slow(roots[0]), min_size=10, executor=executor)
+
+
+def test_threaded_visits_run_concurrently():
+    root = build(Node, 8)
+    expected = Slow(root).visit()
+    with ThreadPoolExecutor(4) as outer:
+        futures = [outer.submit(visit_threaded, Slow(root), max_workers=3, min_size=10) for _ in range(8)]
+        assert all(future.result() == expected for future in futures)
+
+
+def test_threaded_visit_deep_tree():
+    node = Node("leaf")
+    for i in range(5000):
+        node = Node(f"n{i}", left=[node], right=[Node("x")])
+    visitor = Describe(node)
+    visit_threaded(visitor, max_workers=4, min_size=100)
+    result = visitor.result
+    for _ in range(5000):
+        result = result["children"]["left"][0]
+    assert result["Node"] == "leaf:0"
+
+
+def test_threaded_visit_propagates_exceptions():
+    class Failing(Visitor):
+        def _do_failing(self, tree):
+            if tree.label == "nlll":
+                raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        visit_threaded(Failing(build(Node, 8)), max_workers=4, min_size=10)
+
+
+def test_threaded_visit_rejects_reducers():
+    with pytest.raises(TypeError):
+        visit_threaded(Height(build(Node, 3)))
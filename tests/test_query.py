@@ -0,0 +1,139 @@
+import pytest
+from gentry.query import Query, compile_query
+from gentry.tree import Tree
+
+
+class Family(Tree): ...
+
+
+class Person(Tree):
+    _groups = {"children"}
+
+
+class GrandMother(Person): ...
+
+
+class Mother(Person):
+    _groups = {"girls", "boys"}
+
+
+class Child(Person): ...
+
+
+class Compact(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+def person(cls, label, children=(), **kwargs):
+    node = cls(label, **kwargs)
+    node.children = list(children)  # the children keyword of Tree is the mapping of all groups
+    return node
+
+
+def family():
+    anna = Mother(
+        "Anna",
+        girls=[Child("Alice"), Child("Cherryl", properties={"chess master": "ELO 2235"})],
+        boys=[Child("Bob"), Child("Dick")],
+    )
+    beatrice = Mother(
+        "Beatrice",
+        girls=[Child("Ellen"), Child("Gladys", properties={"drivers license": 2023, "age": 19})],
+        boys=[Child("Fergal", properties={"age": 12}), Child("Hank")],
+    )
+    return Family("The Andersons", children={"matriarch": [person(GrandMother, "Granny", [anna, beatrice])]})
+
+
+def labels(nodes):
+    return [node.label for node in nodes]
+
+
+class Unreachable(dict):
+    """Children that fail the test when a query looks at them."""
+
+    def values(self):
+        raise AssertionError("the query walked too far")
+
+    def get(self, key, default=None):
+        raise AssertionError("the query walked too far")
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("matriarch/*/children/Mother[label='Anna']/girls/*", ["Alice", "Cherryl"]),
+        ("matriarch/*/children/*/girls", ["Alice", "Cherryl", "Ellen", "Gladys"]),
+        ("matriarch", ["Granny"]),
+        ("*", ["Granny"]),
+        ("matriarch/GrandMother/children", ["Anna", "Beatrice"]),
+        ("matriarch/Mother", []),
+        ("matriarch/*/children/*[1]/boys/*[-1]", ["Hank"]),
+        ("matriarch/*/children/*/*/*[0]", ["Alice", "Bob", "Ellen", "Fergal"]),
+        ("//Mother", ["Anna", "Beatrice"]),
+        ("//Person", ["Granny", "Anna", "Alice", "Cherryl", "Bob", "Dick", "Beatrice", "Ellen", "Gladys", "Fergal", "Hank"]),
+        ("matriarch//Child[@age]", ["Gladys", "Fergal"]),
+        ("//Child[@age>=18]", ["Gladys"]),
+        ("//Child[@age<18]", ["Fergal"]),
+        ("//Child[@age!=12]", ["Gladys"]),
+        ("//Child[@'chess master'='ELO 2235']", ["Cherryl"]),
+        ('//*[@"drivers license"=2023]', ["Gladys"]),
+        ("//*[label>='F'][label<'H']", ["Granny", "Gladys", "Fergal"]),
+        ("//Mother/boys/*[0]", ["Bob", "Fergal"]),
+        ("//Mother[1]/girls/Child[label='Gladys']", ["Gladys"]),
+        ("//*//Child", ["Alice", "Cherryl", "Bob", "Dick", "Ellen", "Gladys", "Fergal", "Hank"]),
+        ("//Child[@age='12']", []),
+        ("//Child[@age>'a']", []),
+    ],
+)
+def test_select(path, expected):
+    assert labels(family().select(path)) == expected
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["", "/matriarch", "matriarch/", "matriarch[0]", "matriarch//", "a/b[x=y]", "a/b[label=Anna]", "a///b", "a/b c", "a/b[@]"],
+)
+def test_invalid_paths(path):
+    with pytest.raises(ValueError):
+        compile_query(path)
+
+
+def test_compiled_queries_are_cached_and_reusable():
+    query = compile_query("//Child[@age]")
+    assert compile_query("//Child[@age]") is query
+    assert isinstance(query, Query) and repr(query) == "Query('//Child[@age]')"
+    first, second = family(), family()
+    assert labels(query.select(first)) == labels(query.select(second)) == ["Gladys", "Fergal"]
+    assert query.first(second).label == "Gladys"
+    assert compile_query("//Mother[label='Nobody']").first(first) is None
+
+
+def test_select_is_lazy():
+    root = family()
+    granny = root._children["matriarch"][0]
+    beatrice = granny.children[1]
+    beatrice._children = Unreachable(beatrice._children)
+    assert next(root.select("//Child")).label == "Alice"
+    assert next(root.select("matriarch/*/children/*/girls/*")).label == "Alice"
+    with pytest.raises(AssertionError):
+        list(root.select("//Child"))
+
+
+def test_nested_matches_are_yielded_once():
+    root = person(Person, "a", [person(Person, "b", [person(Person, "c", [Person("d")])])])
+    assert labels(root.select("//Person//Person")) == ["c", "d"]
+    assert labels(root.select("//*//*//*")) == ["d"]
+
+
+def test_none_children_are_skipped():
+    root = person(Person, "root", [None, Person("a")])
+    assert labels(root.select("children/*")) == ["a"]
+    assert labels(root.select("children/*[1]")) == ["a"]
+    assert labels(root.select("//*")) == ["a"]
+
+
+def test_compact_nodes():
+    root = Compact("root", left=[Compact("a", properties={"kind": "loop"}), Compact("b")], right=[Compact("c")])
+    assert labels(root.select("left/*[@kind='loop']")) == ["a"]
+    assert labels(root.select("//Compact[@kind]")) == ["a"]
+    assert root.left[1]._props is None  # properties are not allocated by queries
@@ -0,0 +1,173 @@
+import gc
+import pickle
+from enum import Enum
+
+import pytest
+from gentry.mermaid import Mermaid, Shape, Style
+from gentry.serialize import dump, dumps, load, loads
+from gentry.structure import StructuralHasher, dedupe
+from gentry.tree import Tree
+
+
+class Node(Tree, Mermaid):
+    _groups = {"left", "right"}
+
+
+class Leaf(Node): ...
+
+
+class Compact(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class Color(Enum):
+    red = 1
+    blue = 2
+
+
+def make_tree(cls=Node, leaf=Leaf):
+    return cls(
+        "root",
+        left=[cls("a", right=[leaf("c", properties={"x": 1})]), None],
+        right=[leaf(None), leaf(42, properties={"y": "z"})],
+    )
+
+
+def same(a, b):
+    return StructuralHasher().equal(a, b)
+
+
+@pytest.mark.parametrize("classes", [(Node, Leaf), (Compact, Compact), (Observed, Observed)])
+def test_roundtrip(classes):
+    tree = make_tree(*classes)
+    copy = loads(dumps(tree))
+    assert copy is not tree and same(copy, tree)
+    assert type(copy.left[0].right[0]) is classes[1]
+    assert copy.left[1] is None
+    assert copy.right[0].label is None and copy.right[1].label == 42
+
+
+def test_property_values():
+    values = {
+        "none": None,
+        "bools": [True, False],
+        "ints": (0, 1, -1, 127, 128, -129, 2**70, -(2**70)),
+        "floats": [0.5, -1e300, float("inf")],
+        "text": "ünïcode ✓",
+        "bytes": b"\x00\xff",
+        "nested": {"a": [{"b": (1, frozenset({2}))}], 3: {4, 5}},
+        "empty": [[], (), {}, set()],
+        "enum": Color.blue,
+        7: "non-string key",
+    }
+    copy = loads(dumps(Node("root", properties=values)))
+    assert copy.properties == values
+    assert copy.properties["enum"] is Color.blue
+    assert type(copy.properties["nested"]["a"][0]["b"]) is tuple
+
+
+def test_unsupported_value():
+    with pytest.raises(TypeError):
+        dumps(Node("root", properties={"x": object()}))
+
+
+def test_mixin_attributes():
+    tree = Node("root", left=[Leaf("a", shape=Shape.circle, style=Style.keyword)], include_properties=True)
+    copy = loads(dumps(tree))
+    assert copy.left[0]._ishape is Shape.circle and copy.left[0]._istyle is Style.keyword
+    assert copy._iinclude_properties is True and copy._ishape is None
+    assert str(copy) == str(tree)
+
+
+def test_compact_properties_are_not_allocated():
+    tree = Compact("root", left=[Compact("a")])
+    copy = loads(dumps(tree))
+    assert tree.left[0]._props is None and copy.left[0]._props is None
+
+
+def test_observable_tree():
+    copy = loads(dumps(make_tree(Observed, Observed)))
+    assert copy.left[0].right[0].parent is copy.left[0]
+    assert copy.right[1].position == ("right", 1)
+    generation = copy.generation
+    copy.left[0].right[0].label = "changed"
+    assert copy.generation == generation + 1
+
+
+@pytest.mark.parametrize("cls", [Node, Compact, Observed])
+def test_empty_groups(cls):
+    tree = cls("root", left=[cls("a")], right=[])
+    copy = loads(dumps(tree))
+    assert dict(copy._children) == {"left": [copy.left[0]], "right": []}
+
+
+def test_deep_tree():
+    node = Leaf("leaf")
+    for i in range(50000):
+        node = Node(str(i), left=[node])
+    copy = loads(dumps(node))
+    assert same(copy, node)
+
+
+def test_shared_subtrees_are_expanded():
+    tree = Node("root", left=[Node("a", left=[Leaf("b")]), Node("a", left=[Leaf("b")])])
+    dedupe(tree)
+    copy = loads(dumps(tree))
+    assert same(copy, tree) and copy.left[0] is not copy.left[1]
+
+
+def test_smaller_than_pickle():
+    tree = Node("root", left=[Leaf(f"leaf{i % 10}", properties={"i": i}) for i in range(1000)])
+    assert len(dumps(tree)) * 3 < len(pickle.dumps(tree))
+
+
+def test_file(tmp_path):
+    path = tmp_path / "tree.bin"
+    with open(path, "wb") as f:
+        dump(make_tree(), f)
+    with open(path, "rb") as f:
+        assert same(load(f), make_tree())
+
+
+def test_classes():
+    data = dumps(make_tree())
+    with pytest.raises(ValueError, match="not available"):
+        loads(data, classes=[Node])
+    assert type(loads(data, classes=[Node, Leaf])) is Node
+
+
+@pytest.mark.parametrize("data", [b"", b"GNTR", b"XXXX\x01", b"GNTR\x02"])
+def test_invalid_header(data):
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_truncated():
+    data = dumps(make_tree())
+    for end in range(len(data) - 1, 4, -7):
+        with pytest.raises(ValueError):
+            loads(data[:end])
+
+
+def test_gc_is_left_alone(monkeypatch, tmp_path):
+    # the collector is a process-wide setting, other threads might depend on it
+    from gentry import jsonstream, mapped
+    from gentry.clone import clone
+
+    def fail():
+        raise AssertionError("the garbage collector was switched")
+
+    monkeypatch.setattr(gc, "disable", fail)
+    monkeypatch.setattr(gc, "enable", fail)
+    tree = make_tree()
+    loads(dumps(tree))
+    jsonstream.loads(jsonstream.dumps(tree), [Node, Leaf])
+    clone(tree)
+    tree.right[1].label = "42"  # mapped files only store string labels
+    mapped.write(tree, tmp_path / "tree.gmap")
+    with mapped.MappedTree(tmp_path / "tree.gmap") as view:
+        view.to_tree()
@@ -0,0 +1,203 @@
+import pytest
+from gentry.html import HTMLLayout
+from gentry.structure import StructuralHasher, dedupe
+from gentry.tree import Reducer, Tree, Visitor
+
+
+class Node(Tree, HTMLLayout):
+    _groups = {"left", "right"}
+
+
+class Other(Node): ...
+
+
+class Compact(Tree, compact=True):
+    _groups = {"left", "right"}
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+def build(cls, depth, label="n"):
+    """A complete binary tree in which all subtrees of the same depth are equal."""
+    if depth == 1:
+        return cls(label, properties={"depth": 1})
+    return cls(label, left=[build(cls, depth - 1)], right=[build(cls, depth - 1)], properties={"depth": depth})
+
+
+def nodes(root):
+    return [node for node, _, _ in root.iter_preorder()]
+
+
+class Labels(Visitor):
+    calls = 0
+
+    def _do_labels(self, tree):
+        self.calls += 1
+        return tree.label
+
+
+class Size(Reducer):
+    calls = 0
+
+    def _do_size(self, tree, results):
+        self.calls += 1
+        return 1 + sum(results)
+
+
+class TestStructuralHasher:
+    @pytest.mark.parametrize("cls", [Node, Compact, Observed])
+    def test_equal_trees(self, cls):
+        hasher = StructuralHasher()
+        a, b = build(cls, 5), build(cls, 5)
+        assert hasher.hash(a) == hasher.hash(b)
+        assert hasher.equal(a, b)
+        assert len(hasher) == 2 * 31
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda t: setattr(t.left[0], "label", "x"),
+            lambda t: t.left[0].properties.__setitem__("depth", 0),
+            lambda t: t.left[0].properties.__setitem__("new", [1]),
+            lambda t: t.left[0].left.append(None),
+            lambda t: t.left.pop(),
+            lambda t: t._children.update(left=t._children.pop("left")),  # group order
+            lambda t: t.right[0].right.__setitem__(0, Other("n", properties={"depth": 1})),
+        ],
+    )
+    def test_different_trees(self, change):
+        a, b = build(Node, 4), build(Node, 4)
+        change(b)
+        hasher = StructuralHasher()
+        assert not hasher.equal(a, b)
+
+    def test_empty_groups_count(self):
+        a, b = Node("a", left=[Node("b")]), Node("a", left=[Node("b")])
+        assert b.right == []  # creates an empty group, which is rendered
+        hasher = StructuralHasher()
+        assert str(a) != str(b)
+        assert hasher.hash(a) != hasher.hash(b) and not hasher.equal(a, b)
+        assert a.right == []
+        hasher.clear()
+        assert hasher.equal(a, b)
+
+    @pytest.mark.parametrize(
+        "values",
+        [
+            (1, True, 1.0),
+            ([1], [True], (1,)),
+            ({"k": 0}, {"k": False}, {"k": 0.0}),
+            ({1: "k"}, {True: "k"}, {1.0: "k"}),
+            ({1, 2}, frozenset({1, 2}), {True, 2}),
+        ],
+    )
+    def test_value_types_count(self, values):
+        hasher = StructuralHasher()
+        for x in values:
+            for y in values:
+                a, b = Node("a", properties={"v": x}), Node("a", properties={"v": y})
+                assert hasher.equal(a, b) == (x is y)
+                assert hasher.equal(Node(x), Node(y)) == (x is y)
+                hasher.clear()
+
+    def test_unhashable_values_ignore_repr(self):
+        class Value:
+            __hash__ = None
+
+            def __init__(self, x):
+                self.x = x
+
+            def __eq__(self, other):
+                return isinstance(other, Value) and self.x == other.x
+
+        a, b = Node("a", properties={"v": Value(1)}), Node("a", properties={"v": Value(1)})
+        assert repr(a.properties["v"]) != repr(b.properties["v"])
+        hasher = StructuralHasher()
+        assert hasher.hash(a) == hasher.hash(b) and hasher.equal(a, b)
+        assert not hasher.equal(a, Node("a", properties={"v": Value(2)}))
+
+    def test_unhashable_properties(self):
+        a, b = Node("a", properties={"x": [1, 2]}), Node("a", properties={"x": [1, 2]})
+        hasher = StructuralHasher()
+        assert hasher.equal(a, b)
+        b.properties["x"].append(3)
+        hasher.clear()
+        assert not hasher.equal(a, b)
+
+    def test_observable_changes_invalidate(self):
+        a, b = build(Observed, 4), build(Observed, 4)
+        hasher = StructuralHasher()
+        assert hasher.equal(a, b)
+        b.left[0].left[0].label = "changed"
+        assert not hasher.equal(a, b)
+        b.left[0].left[0].label = "n"
+        assert hasher.equal(a, b)
+
+    def test_deep_trees(self):
+        def chain(n):
+            node = Node("leaf")
+            for _ in range(n):
+                node = Node("node", left=[node])
+            return node
+
+        hasher = StructuralHasher()
+        assert hasher.equal(chain(5000), chain(5000))
+        assert not hasher.equal(chain(5000), chain(5001))
+
+
+class TestDedupe:
+    @pytest.mark.parametrize("cls", [Node, Compact, Observed])
+    def test_shares_equal_subtrees(self, cls):
+        root = build(cls, 6)
+        expected = Labels(build(cls, 6)).visit()
+        assert dedupe(root) == 62 - 5  # all but one subtree of every depth below the root
+        assert len({id(node) for node in nodes(root)}) == 6
+        assert root.left[0] is root.right[0]
+        assert Labels(root).visit() == expected
+
+    def test_distinct_subtrees_are_kept(self):
+        root = Node("root", left=[Node("a"), Node("b"), Node("a", properties={"x": 1})], right=[Node("a")])
+        assert dedupe(root) == 1
+        assert root.right[0] is root.left[0] and root.left[2] is not root.left[0]
+        assert dedupe(root) == 0
+
+    def test_values_of_different_types_are_kept(self):
+        root = Node("root", left=[Node("x", properties={"v": v}) for v in (1, True, 1.0, 1)])
+        assert dedupe(root) == 1
+        assert [child.properties["v"] for child in root.left] == [1, True, 1.0, 1]
+        assert [type(child.properties["v"]) for child in root.left] == [int, bool, float, int]
+        assert root.left[3] is root.left[0]
+
+    def test_empty_groups_are_kept(self):
+        empty = Node("a", left=[Node("b")])
+        assert empty.right == []
+        root = Node("root", left=[Node("a", left=[Node("b")]), empty])
+        expected = str(root)
+        assert dedupe(root) == 1  # only the b nodes
+        assert root.left[0] is not root.left[1]
+        assert str(root) == expected
+
+    def test_shared_visitor(self):
+        root = build(Node, 8)
+        dedupe(root)
+        plain, shared = Labels(root), Labels(root, shared=True)
+        assert shared.visit() == plain.visit()
+        assert plain.calls == 255 and shared.calls == 8
+
+    def test_shared_reducer(self):
+        root = build(Node, 10)
+        dedupe(root)
+        plain, shared = Size(root), Size(root, shared=True)
+        assert plain.visit() == shared.visit() == 1023
+        assert plain.calls == 1023 and shared.calls == 10
+        discard = Size(root, discard=True, shared=True)
+        discard.visit()
+        assert discard.calls == 10
+
+    def test_html(self):
+        root = build(Node, 6)
+        expected = str(root)
+        dedupe(root)
+        assert str(root) == expected
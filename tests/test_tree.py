@@ -215,3 +215,353 @@ class TestTree:
         assert a4.group2 == [a2]
         with pytest.raises(AttributeError):
             b = a4.group3  # noqa
+
+
+class TestTreeIterators:
+    class Node(Tree):
+        _groups = {"left", "right"}
+
+    def make_tree(self):
+        # root
+        # ├── left: a (left: c, None), b
+        # └── right: d
+        Node = self.Node
+        c = Node("c")
+        a = Node("a", left=[c, None])
+        b = Node("b")
+        d = Node("d")
+        root = Node("root", left=[a, b], right=[d])
+        return root
+
+    def labels(self, iterator):
+        return [(node.label, group, depth) for node, group, depth in iterator]
+
+    def test_iter_preorder(self):
+        root = self.make_tree()
+        assert self.labels(root.iter_preorder()) == [
+            ("root", None, 0),
+            ("a", "left", 1),
+            ("c", "left", 2),
+            ("b", "left", 1),
+            ("d", "right", 1),
+        ]
+
+    def test_iter_postorder(self):
+        root = self.make_tree()
+        assert self.labels(root.iter_postorder()) == [
+            ("c", "left", 2),
+            ("a", "left", 1),
+            ("b", "left", 1),
+            ("d", "right", 1),
+            ("root", None, 0),
+        ]
+
+    def test_iter_bfs(self):
+        root = self.make_tree()
+        assert self.labels(root.iter_bfs()) == [
+            ("root", None, 0),
+            ("a", "left", 1),
+            ("b", "left", 1),
+            ("d", "right", 1),
+            ("c", "left", 2),
+        ]
+
+    def test_iter_single_node(self):
+        t = Tree("root")
+        for iterator in (t.iter_preorder, t.iter_postorder, t.iter_bfs):
+            assert self.labels(iterator()) == [("root", None, 0)]
+
+    def test_iter_is_lazy_and_not_recursive(self):
+        Node = self.Node
+        depth = 50_000
+        node = Node("0")
+        for i in range(1, depth):
+            node = Node(str(i), right=[node])
+
+        it = node.iter_preorder()
+        assert next(it)[0] is node
+        assert sum(1 for _ in node.iter_postorder()) == depth
+        assert max(d for _, _, d in node.iter_preorder()) == depth - 1
+
+
+class TestCompactTree:
+    def test_compact_has_no_instance_dict(self):
+        class C(Tree, compact=True):
+            _groups = {"kids"}
+
+        c = C("root")
+        assert not hasattr(c, "__dict__")
+        assert isinstance(c, Tree)
+        assert issubclass(C, Tree)
+        with pytest.raises(AttributeError):
+            c.foo = 123
+
+    def test_compact_lazy_allocation(self):
+        class C(Tree, compact=True):
+            _groups = {"kids"}
+
+        c = C("root")
+        assert c._kids is None and c._props is None
+        assert c.is_leaf()
+        assert dict(c._children) == {}
+        assert c._kids is None
+
+        c.properties["x"] = 1
+        assert c.properties == {"x": 1}
+
+        child = C("child")
+        c.kids.append(child)
+        assert c._children["kids"] == [child]
+        assert not c.is_leaf()
+
+    def test_compact_groups_and_constructor(self):
+        class C(Tree, compact=True):
+            _groups = {"left", "right"}
+
+        a = C("a")
+        b = C("b")
+        root = C("root", left=[a], children={"other": [b]}, properties={"p": 2})
+        root.right = [b]
+        assert root.left == [a]
+        assert root.right == [b]
+        assert root._children["other"] == [b]
+        assert root.properties == {"p": 2}
+        with pytest.raises(AttributeError):
+            root.left = "notalist"
+        with pytest.raises(ValueError):
+            C("x", left=[a], children={"left": [b]})
+
+    def test_compact_subclasses_are_compact(self):
+        class C(Tree, compact=True):
+            _groups = {"kids"}
+
+        class D(C):
+            __slots__ = ("extra",)
+
+            def __init__(self, label, extra=None):
+                super().__init__(label)
+                self.extra = extra
+
+        d = D("d", extra=42)
+        assert d.extra == 42
+        assert not hasattr(d, "__dict__")
+        d.kids.append(D("e"))
+        assert len(d.kids) == 1
+
+        with pytest.raises(TypeError):
+
+            class E(C, compact=False): ...
+
+    def test_compact_requires_compact_bases(self):
+        class Regular(Tree): ...
+
+        with pytest.raises(TypeError):
+
+            class C(Regular, compact=True): ...
+
+    def test_compact_visitor_and_count(self):
+        from gentry.tree import Count, Visitor
+
+        class C(Tree, compact=True):
+            _groups = {"kids"}
+
+        root = C("root", kids=[C("a"), C("b", kids=[C("c")])])
+
+        class Labels(Visitor):
+            def _do_labels(self, tree):
+                return tree.label
+
+        result = Labels(root).visit()
+        assert result["C"] == "root"
+        assert result["children"]["kids"][1]["children"]["kids"][0]["C"] == "c"
+        assert Count(root).count() == 4
+
+
+class TestObservableTree:
+    @pytest.fixture(params=[False, True], ids=["regular", "compact"])
+    def cls(self, request):
+        class O(Tree, observable=True, compact=request.param):
+            _groups = {"left", "right"}
+
+        return O
+
+    def test_parents_and_versions(self, cls):
+        leaf = cls("leaf")
+        mid = cls("mid", left=[leaf])
+        root = cls("root", right=[mid])
+        assert leaf._parent is mid and mid._parent is root and root._parent is None
+        before = (root._version, mid._version, leaf._version)
+        leaf.label = "changed"
+        assert root._version > before[0] and mid._version > before[1]
+
+    @pytest.mark.parametrize(
+        "mutate",
+        [
+            lambda n, c: n.left.append(c),
+            lambda n, c: n.left.extend([c]),
+            lambda n, c: n.left.insert(0, c),
+            lambda n, c: n.left.__iadd__([c]),
+            lambda n, c: setattr(n, "left", [c]),
+            lambda n, c: n.left.__setitem__(0, c),
+            lambda n, c: n.left.__setitem__(slice(0, 1), [c]),
+            lambda n, c: n.left.pop(),
+            lambda n, c: n.left.remove(n.left[0]),
+            lambda n, c: n.left.clear(),
+            lambda n, c: n.left.__delitem__(0),
+            lambda n, c: n.left.reverse(),
+            lambda n, c: n._children.pop("left"),
+            lambda n, c: n.properties.__setitem__("x", 1),
+            lambda n, c: n.properties.update(x=1),
+            lambda n, c: setattr(n, "properties", {"x": 1}),
+            lambda n, c: setattr(n, "label", "new"),
+        ],
+    )
+    def test_mutations_change_ancestor_versions(self, cls, mutate):
+        node = cls("node", left=[cls("first")])
+        root = cls("root", left=[node])
+        versions = (root._version, node._version)
+        mutate(node, cls("new"))
+        assert root._version > versions[0] and node._version > versions[1]
+
+    def test_removed_children_lose_their_parent(self, cls):
+        a, b = cls("a"), cls("b")
+        root = cls("root", left=[a, b])
+        root.left.remove(a)
+        assert a._parent is None and b._parent is root
+        root.left = [a]
+        assert a._parent is root and b._parent is None
+
+    def test_reading_does_not_change_versions(self, cls):
+        root = cls("root", left=[cls("a")])
+        version = root._version
+        assert [child.label for child in root.left] == ["a"]
+        assert root.properties == {}
+        assert len(list(root.iter_preorder())) == 2
+        assert not root.is_leaf()
+        assert root._version == version
+
+    def test_augmented_assignment_changes_version_once(self, cls):
+        a, b = cls("a"), cls("b")
+        root = cls("root", left=[a])
+        children = root.left
+        version = root._version
+        root.left += [b]
+        assert root._version == version + 1
+        assert root.left is children and b._parent is root
+
+    def test_reassigning_group_releases_only_removed_children(self, cls):
+        children = [cls(str(i)) for i in range(20000)]
+        root = cls("root", left=children)
+        root.left = children[::2]
+        assert all(child._parent is root for child in children[::2])
+        assert all(child._parent is None for child in children[1::2])
+
+    def test_empty_groups_change_versions(self, cls):
+        root = cls("root", left=[cls("a")])
+        version = root._version
+        assert root.left[0].right == []  # reading a missing group creates it, and it is rendered
+        assert root._version == version + 1
+        root.left[0].right = []
+        assert root._version == version + 1  # still the same groups
+        root.left[0].left = []
+        assert root._version == version + 2
+
+    def test_siblings_are_not_affected(self, cls):
+        a, b = cls("a"), cls("b")
+        root = cls("root", left=[a], right=[b])
+        version, root_version = b._version, root._version
+        a.properties["x"] = 1
+        assert b._version == version
+        assert root._version == root_version + 1
+
+    def test_observable_is_inherited(self, cls):
+        class Sub(cls): ...
+
+        assert Sub._observable
+        assert isinstance(Sub("s"), Tree)
+        with pytest.raises(TypeError):
+
+            class NotObservable(cls, observable=False): ...
+
+    def test_regular_trees_are_not_tracked(self):
+        t = Tree("root", children={"g": [Tree("a")]})
+        assert not t._observable
+        assert type(t._children) is defaultdict
+        assert not hasattr(t, "_version")
+
+    def test_dirty_flags(self, cls):
+        a, b = cls("a"), cls("b")
+        mid = cls("mid", left=[a])
+        root = cls("root", left=[mid], right=[b])
+        assert root.dirty and a.dirty  # new nodes are dirty
+        root.mark_clean()
+        assert not any(node.dirty for node, _, _ in root.iter_preorder())
+        a.properties["x"] = 1
+        assert a.dirty and mid.dirty and root.dirty and not b.dirty
+        assert list(root.iter_dirty()) == [root, mid, a]
+        mid.mark_clean()
+        assert root.dirty and not mid.dirty and not a.dirty
+        assert list(root.iter_dirty()) == [root]
+
+    def test_generation(self, cls):
+        leaf = cls("leaf")
+        root = cls("root", left=[leaf])
+        generation = root.generation
+        leaf.label = "x"
+        assert root.generation > generation
+        generation = root.generation
+        root.mark_clean()
+        assert root.generation == generation  # cleaning is not a change
+
+    def test_reserved_group_names(self):
+        with pytest.raises(AttributeError):
+
+            class O(Tree, observable=True):
+                _groups = {"dirty"}
+
+    def test_copying_a_subtree_does_not_include_ancestors(self, cls):
+        import copy as copymodule
+
+        leaf = cls("leaf")
+        mid = cls("mid", left=[leaf])
+        cls("root", left=[mid])
+        copy = copymodule.deepcopy(mid)  # uses the same state as pickle
+        assert copy._parent is None
+        assert copy.left[0]._parent is copy
+        assert copy.left[0].label == "leaf"
+        assert copy.position is None and copy.left[0].position == ("left", 0)
+
+    def test_locations(self, cls):
+        c = cls("c")
+        b = cls("b", right=[cls("x"), c])
+        root = cls("root", left=[cls("a"), b])
+        assert c.parent is b and b.parent is root and root.parent is None
+        assert c.position == ("right", 1) and b.position == ("left", 1) and root.position is None
+        assert list(c.ancestors()) == [b, root] and list(root.ancestors()) == []
+        assert c.depth == 2 and root.depth == 0
+        assert c.path() == [("left", 1), ("right", 1)] and root.path() == []
+        assert root.left[1].right[1] is c
+
+    def test_locations_follow_changes(self, cls):
+        a, b, c = cls("a"), cls("b"), cls("c")
+        root = cls("root", left=[a, b])
+        root.left.insert(0, c)
+        assert b.position == ("left", 2) and c.position == ("left", 0)
+        root.left.reverse()
+        assert b.position == ("left", 0)
+        root.left.remove(b)
+        root.right.append(b)  # moved to another group
+        assert b.position == ("right", 0) and b.parent is root
+        root.left.remove(a)
+        a.left = [b]  # moved to another parent
+        assert b.parent is a and b.path() == [("left", 0)] and b.depth == 1
+        root.right.clear()  # b is not in root.right anymore, but it is in a.left
+        assert b.parent is a
+        root._children["left"] = [a]
+        assert c.parent is None and c.position is None and a.position == ("left", 0)
+        assert list(b.ancestors()) == [a, root]
+
+    def test_constructor_children_have_locations(self, cls):
+        a = cls("a")
+        root = cls("root", {"left": [a]})
+        assert a.parent is root and a.position == ("left", 0)
@@ -1,5 +1,19 @@
+import asyncio
+import gc
+import time
+import weakref
+
 import pytest
-from gentry.tree import Tree, Visitor, Count
+from collections import defaultdict
+from gentry.tree import (
+    AsyncVisitor,
+    Count,
+    IncrementalVisitor,
+    Reducer,
+    TopDownVisitor,
+    Tree,
+    Visitor,
+)
 
 
 class DummyTree(Tree):
@@ -125,3 +139,525 @@ def test_count_sum_handles_various_types():
     assert Count._sum({"a": 1, "b": 2}) == 3
     nested = {"a": [1, 2], "b": {"c": 3}}
     assert Count._sum(nested) == 6
+
+
+def test_visitor_dispatch_cache_invalidated_by_new_method():
+    root, _, _ = make_simple_tree()
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            return "generic"
+
+    assert MyVisitor(root).visit()["MyTree"] == "generic"
+
+    MyVisitor._do_myvisitor_MyTree = lambda self, tree: "specific"
+    assert MyVisitor(root).visit()["MyTree"] == "specific"
+
+    del MyVisitor._do_myvisitor_MyTree
+    assert MyVisitor(root).visit()["MyTree"] == "generic"
+
+
+def test_visitor_dispatch_cache_respects_strict():
+    root, _, _ = make_simple_tree()
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            return "generic"
+
+    assert MyVisitor(root).visit()["MyTree"] == "generic"
+    with pytest.raises(NotImplementedError):
+        MyVisitor(root, strict=True).visit()
+
+
+def test_visitor_dispatch_cache_follows_base_class_changes():
+    root, _, _ = make_simple_tree()
+
+    class BaseVisitor(Visitor):
+        def _do_basevisitor(self, tree):
+            return "base"
+
+    class SubVisitor(BaseVisitor): ...
+
+    assert SubVisitor(root).visit()["MyTree"] == "base"
+
+    BaseVisitor._do_basevisitor_MyTree = lambda self, tree: "specific"
+    assert SubVisitor(root).visit()["MyTree"] == "specific"
+
+
+def test_visitor_dispatch_ignores_instance_attributes():
+    root, _, _ = make_simple_tree()
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            return "generic"
+
+    patched = MyVisitor(root)
+    patched._do_myvisitor_MyTree = lambda tree: "instance"
+    assert patched.visit()["MyTree"] == "generic"
+    assert MyVisitor(root).visit()["MyTree"] == "generic"
+
+
+def test_visitor_dispatch_cache_does_not_keep_classes_alive():
+    root, _, _ = make_simple_tree()
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            return "generic"
+
+    MyVisitor(root).visit()
+    assert MyVisitor._dispatch and not Visitor._dispatch
+    ref = weakref.ref(MyVisitor)
+    del MyVisitor
+    gc.collect()
+    assert ref() is None
+
+
+def recursive_visit(visitor, tree):
+    # the original recursive implementation of Visitor._visit, used as a reference
+    results = defaultdict(list)
+    for group, children in tree._children.items():
+        for child in children:
+            results[group].append(recursive_visit(visitor, child))
+    return {tree.__class__.__name__: visitor._get_visitor(tree)(tree), "children": results}
+
+
+def test_visit_matches_recursive_visit():
+    class A(Tree):
+        _groups = {"left", "right"}
+
+    class B(A): ...
+
+    root = A(
+        "root",
+        left=[B("l1", right=[A("l1r")]), A("l2")],
+        right=[A("r1", left=[B("r1l", left=[A("deep")])], right=[])],
+    )
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            return tree.label
+
+        def _do_myvisitor_B(self, tree):
+            return tree.label.upper()
+
+    v = MyVisitor(root)
+    assert v.visit() == recursive_visit(v, root)
+    assert "right" not in v.result["children"]["right"][0]["children"]
+
+
+def test_visit_calls_visitors_in_post_order():
+    root, left, right = make_simple_tree()
+    order = []
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            order.append(tree.label)
+
+    MyVisitor(root).visit()
+    assert order == ["left", "right", "root"]
+
+
+def test_visit_very_deep_chain():
+    class Link(Tree):
+        _groups = {"next"}
+
+    depth = 100_000
+    node = Link("0")
+    for i in range(1, depth):
+        node = Link(str(i), next=[node])
+
+    class MyVisitor(Visitor):
+        def _do_myvisitor(self, tree):
+            return int(tree.label)
+
+    result = MyVisitor(node).visit()
+    seen = 0
+    while True:
+        assert result["Link"] == depth - 1 - seen
+        seen += 1
+        if not result["children"]:
+            break
+        result = result["children"]["next"][0]
+    assert seen == depth
+
+
+def test_reducer_passes_child_results():
+    root, _, _ = make_simple_tree()
+    root.left[0].right.append(type(root)(label="leftright"))
+
+    class Labels(Reducer):
+        def _do_labels(self, tree, results):
+            return f"{tree.label}({','.join(results)})"
+
+    assert Labels(root).visit() == "root(left(leftright()),right())"
+
+
+def test_reducer_dispatch_and_none_children():
+    class A(Tree):
+        _groups = {"kids"}
+
+    class B(A): ...
+
+    root = A("root", kids=[B("b1"), None, A("a1", kids=[B("b2")])])
+
+    class CountB(Reducer):
+        def _do_countb(self, tree, results):
+            return sum(results)
+
+        def _do_countb_B(self, tree, results):
+            return 1 + sum(results)
+
+    assert CountB(root).visit() == 2
+    with pytest.raises(NotImplementedError):
+        CountB(root, strict=True).visit()
+
+
+def test_reducer_discard():
+    root, _, _ = make_simple_tree()
+    calls = []
+
+    class Collect(Reducer):
+        def _do_collect(self, tree, results):
+            calls.append((tree.label, tuple(results)))
+            return tree.label
+
+    v = Collect(root, discard=True)
+    assert v.visit() is None
+    assert calls == [("left", ()), ("right", ()), ("root", ())]
+
+
+def test_reducer_very_deep_chain():
+    class Link(Tree):
+        _groups = {"next"}
+
+    depth = 100_000
+    node = Link("0")
+    for i in range(1, depth):
+        node = Link(str(i), next=[node])
+
+    class Depth(Reducer):
+        def _do_depth(self, tree, results):
+            return 1 + max(results, default=0)
+
+    assert Depth(node).visit() == depth
+
+
+def test_count_breakdowns():
+    class Person(Tree):
+        _groups = {"children"}
+
+    class Family(Tree): ...
+
+    class Child(Person): ...
+
+    class FamilyCount(Count):
+        def _do_count_Family(self, tree):
+            return 0
+
+    mother = Person("mother")
+    mother.children = [Child("a"), Child("b")]
+    granny = Person("granny")
+    granny.children = [mother]
+    family = Family("family", children={"matriarch": [granny]})
+
+    c = FamilyCount(family)
+    assert c.count() == 4
+    assert c.by_class is None and c.by_group is None
+
+    assert c.count(by_class=True, by_group=True) == 4
+    assert c.by_class == {"Child": 2, "Person": 2, "Family": 0}
+    assert c.by_group == {"children": 3, "matriarch": 1, None: 0}
+
+
+def test_count_does_not_build_nested_result():
+    root, _, _ = make_simple_tree()
+
+    c = Count(root)
+    assert c.count() == 3
+    assert c.result is None
+
+
+def test_count_very_deep_chain():
+    class Link(Tree):
+        _groups = {"next"}
+
+    depth = 100_000
+    node = Link("0")
+    for i in range(1, depth):
+        node = Link(str(i), next=[node])
+
+    assert Count(node).count() == depth
+
+
+class Observed(Tree, observable=True):
+    _groups = {"left", "right"}
+
+
+class Labels(IncrementalVisitor):
+    def _do_labels(self, tree):
+        return tree.label.upper()
+
+
+def make_observed_tree():
+    leaf = Observed("leaf")
+    mid = Observed("mid", left=[leaf, Observed("other")])
+    root = Observed("root", left=[mid], right=[Observed("right", left=[Observed("deep")])])
+    return root, mid, leaf
+
+
+def plain_result(root):
+    class Plain(Visitor):
+        def _do_plain(self, tree):
+            return tree.label.upper()
+
+    return Plain(root).visit()
+
+
+def strip_names(result):
+    (value,) = [v for k, v in result.items() if k != "children"]
+    return value, {g: [strip_names(c) for c in cs] for g, cs in result["children"].items()}
+
+
+def test_incremental_visit_matches_visit():
+    root, _, _ = make_observed_tree()
+    visitor = Labels(root)
+    assert strip_names(visitor.visit()) == strip_names(plain_result(root))
+    assert visitor.visited == 6
+
+
+def test_incremental_visit_only_visits_changed_nodes():
+    root, mid, leaf = make_observed_tree()
+    visitor = Labels(root)
+    visitor.visit()
+    assert visitor.visit() is visitor.result
+    assert visitor.visited == 0
+    leaf.label = "changed"
+    result = visitor.visit()
+    assert visitor.visited == 3  # leaf, mid and root
+    assert result["children"]["left"][0]["children"]["left"][0]["Observed"] == "CHANGED"
+    assert strip_names(result) == strip_names(plain_result(root))
+
+
+def test_incremental_visit_structural_changes():
+    root, mid, leaf = make_observed_tree()
+    visitor = Labels(root)
+    visitor.visit()
+    mid.left.remove(leaf)
+    root.right.append(leaf)
+    mid.properties["x"] = 1
+    result = visitor.visit()
+    assert strip_names(result) == strip_names(plain_result(root))
+    assert set(visitor._memo) == {id(node) for node, _, _ in root.iter_preorder()}
+
+
+def test_incremental_visit_forgets_removed_subtrees():
+    root, _, _ = make_observed_tree()
+    visitor = Labels(root)
+    visitor.visit()
+    root.right.clear()
+    visitor.visit()
+    assert len(visitor._memo) == 4
+
+
+def test_incremental_visit_non_observable_and_reset():
+    root, _, _ = make_simple_tree()
+
+    class Simple(IncrementalVisitor):
+        def _do_simple(self, tree):
+            return tree.label
+
+    visitor = Simple(root)
+    visitor.visit()
+    visitor.visit()
+    assert visitor.visited == 3  # nodes that are not observable are always visited
+
+    observed, _, _ = make_observed_tree()
+    visitor = Labels(observed)
+    visitor.visit()
+    visitor.reset()
+    visitor.visit()
+    assert visitor.visited == 6
+
+
+def test_incremental_visit_very_deep_chain():
+    node = Observed("leaf")
+    leaf = node
+    for i in range(50_000):
+        node = Observed(f"n{i}", left=[node])
+    visitor = Labels(node)
+    visitor.visit()
+    leaf.label = "x"
+    result = visitor.visit()
+    assert visitor.visited == 50_001
+    for _ in range(50_000):
+        result = result["children"]["left"][0]
+    assert result["Observed"] == "X"
+
+
+class FakeService:
+    """A local stand-in for a lookup service with a fixed latency per request."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+
+    async def lookup(self, label):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+        return label.upper()
+
+
+class Lookup(AsyncVisitor):
+    def __init__(self, root, service, concurrency=16):
+        super().__init__(root, concurrency=concurrency)
+        self.service = service
+
+    async def _do_lookup(self, tree):
+        return await self.service.lookup(tree.label)
+
+    def _do_lookup_Leaf(self, tree):  # visitor methods may be regular methods too
+        return tree.label
+
+
+class Branch(Tree):
+    _groups = {"left", "right"}
+
+
+class Leaf(Branch): ...
+
+
+def make_wide_tree(branches=4, leaves=5):
+    return Branch(
+        "root",
+        left=[Branch(f"b{i}", right=[Leaf(f"l{i}{j}") for j in range(leaves)]) for i in range(branches)],
+        right=[Leaf("single")],
+    )
+
+
+def test_async_visitor_result_matches_visitor():
+    class Sync(Visitor):
+        def _do_sync(self, tree):
+            return tree.label.upper()
+
+        def _do_sync_Leaf(self, tree):
+            return tree.label
+
+    root = make_wide_tree()
+    visitor = Lookup(root, FakeService(latency=0))
+    result = asyncio.run(visitor.visit())
+    assert result == Sync(root).visit()
+    assert visitor.result is result
+
+
+def test_async_visitor_runs_concurrently():
+    root = Branch("root", left=[Branch(f"n{i}") for i in range(20)])
+    service = FakeService(latency=0.05)
+    start = time.perf_counter()
+    asyncio.run(Lookup(root, service, concurrency=10).visit())
+    elapsed = time.perf_counter() - start
+    assert service.peak == 10
+    assert elapsed < 0.5  # sequentially this would take 21 * 0.05 seconds
+
+
+def test_async_visitor_respects_concurrency_limit():
+    root = Branch("root", left=[Branch(f"n{i}") for i in range(12)])
+    service = FakeService(latency=0.01)
+    asyncio.run(Lookup(root, service, concurrency=3).visit())
+    assert service.peak == 3
+    with pytest.raises(ValueError):
+        Lookup(root, service, concurrency=0)
+
+
+def test_async_visitor_deep_chain():
+    node = Branch("leaf")
+    for i in range(3000):
+        node = Branch(f"n{i}", left=[node])
+    result = asyncio.run(Lookup(node, FakeService(latency=0)).visit())
+    for _ in range(3000):
+        result = result["children"]["left"][0]
+    assert result == {"Branch": "LEAF", "children": {}}
+
+
+class Trace(TopDownVisitor):
+    def __init__(self, root, prune=(), stop=None, discard=False):
+        super().__init__(root, discard=discard)
+        self.order = []
+        self.prune_at = prune
+        self.stop_at = stop
+
+    def _do_trace(self, tree):
+        self.order.append(tree.label)
+        if tree.label in self.prune_at:
+            self.prune()
+        if tree.label == self.stop_at:
+            self.stop()
+        return tree.label
+
+
+def make_search_tree():
+    return Branch(
+        "root",
+        left=[Branch("a", left=[Leaf("a1"), Leaf("a2")]), Branch("b", right=[Leaf("b1")])],
+        right=[Leaf("c"), None],
+    )
+
+
+def test_top_down_visit_order_and_result():
+    visitor = Trace(make_search_tree())
+    result = visitor.visit()
+    assert visitor.order == ["root", "a", "a1", "a2", "b", "b1", "c"]
+    assert result["Branch"] == "root"
+    assert [r["Branch"] for r in result["children"]["left"]] == ["a", "b"]
+    assert result["children"]["left"][0]["children"]["left"][1] == {"Leaf": "a2", "children": {}}
+    assert not visitor.stopped
+
+
+def test_top_down_prune():
+    visitor = Trace(make_search_tree(), prune={"a"})
+    result = visitor.visit()
+    assert visitor.order == ["root", "a", "b", "b1", "c"]
+    assert result["children"]["left"][0]["children"] == {}
+
+
+def test_top_down_stop():
+    visitor = Trace(make_search_tree(), stop="a2")
+    result = visitor.visit()
+    assert visitor.order == ["root", "a", "a1", "a2"]
+    assert visitor.stopped
+    assert "right" not in result["children"]
+
+
+def test_top_down_discard():
+    visitor = Trace(make_search_tree(), discard=True)
+    assert visitor.visit() is None
+    assert len(visitor.order) == 7
+
+
+def test_find_and_find_all():
+    root = make_search_tree()
+    assert root.find(lambda node: node.label.startswith("b")).label == "b"
+    assert root.find(lambda node: node.label == "missing") is None
+    assert [node.label for node in root.find_all(lambda node: isinstance(node, Leaf))] == ["a1", "a2", "b1", "c"]
+    assert root.find_all(lambda node: False) == []
+
+
+def test_find_stops_early():
+    calls = []
+    root = make_search_tree()
+
+    def predicate(node):
+        calls.append(node.label)
+        return node.label == "a1"
+
+    assert root.find(predicate).label == "a1"
+    assert calls == ["root", "a", "a1"]
+
+
+def test_find_very_deep_chain():
+    node = Branch("target")
+    for i in range(100_000):
+        node = Branch(f"n{i}", left=[node])
+    assert node.find(lambda n: n.label == "target").label == "target"